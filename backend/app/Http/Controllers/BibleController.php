@@ -10,12 +10,18 @@
 
 class BibleController extends Controller
 {
+    /**
+     * Payload version of the chapter_cache rows written by tools/build_chapter_cache.py.
+     * Must match CACHE_FORMAT there.
+     */
+    const CHAPTER_CACHE_FORMAT = 3;
+
     public function getChapter(Request $request)
     {
         $bookName = $request->get('book', 'Genesis');
         $chapter = (int)$request->get('chapter', 1);
         $version = $request->get('version', 'KJV');
-        $interlinear = $request->get('interlinear', 'false');
+        $interlinear = $request->get('interlinear', 'false') === 'true';
 
         $book = Book::where('name', $bookName)->first();
 
@@ -23,31 +29,95 @@ public function getChapter(Request $request)
             return response()->json(['error' => 'Book not found'], 404);
         }
 
+        // One primary-key read when the shard has the chapter pre-built
+        $verses = $this->cachedChapter($book, $chapter, $version, $interlinear)
+            ?? $this->queriedChapter($book, $chapter, $version, $interlinear);
+
+        return response()->json([
+            'book' => $bookName,
+            'chapter' => $chapter,
+            'version' => $version,
+            'verses' => $verses
+        ]);
+    }
+
+    /**
+     * The chapter from its chapter_cache row (zlib JSON), or null when there is none.
+     */
+    private function cachedChapter($book, $chapter, $version, $interlinear)
+    {
+        $row = Verse::onVersion($version)->getConnection()
+            ->table('chapter_cache')
+            ->where('version', $version)
+            ->where('book_id', $book->id)
+            ->where('chapter', $chapter)
+            ->where('format', self::CHAPTER_CACHE_FORMAT)
+            ->first(['payload']);
+
+        if (!$row) return null;
+        $payload = json_decode(gzuncompress($row->payload));
+
+        // Transliterations for every tagged word of the chapter in one query
+        $lexicon = collect();
+        if ($interlinear) {
+            $ids = collect($payload->verses)->flatMap(fn($v) => array_column($v->words, 1))->filter()->unique()->values();
+            if ($ids->isNotEmpty()) {
+                $lexicon = DB::connection('extras')->table('lexicon')->whereIn('id', $ids)->pluck('transliteration', 'id');
+            }
+        }
+
+        $verses = [];
+        foreach ($payload->verses as $cached) {
+            $text = TextService::sanitizeHTML($cached->text);
+            if ($interlinear && $cached->words) {
+                $text = $this->interlinearHtml(array_map(fn($w) => (object)[
+                    'word' => $w[0],
+                    'strongs_id' => $w[1],
+                    'transliteration' => $w[1] ? ($lexicon[$w[1]] ?? null) : null,
+                ], $cached->words));
+            }
+
+            $verses[] = [
+                'id' => $cached->id,
+                'book_id' => $book->id,
+                'chapter' => $chapter,
+                'verse' => $cached->verse,
+                'text' => $text,
+                'version' => $version,
+                'modules' => strtolower(implode(',', $cached->modules)),
+            ];
+        }
+        return $verses;
+    }
+
+    /**
+     * The chapter from the verses table, for shards built without chapter_cache.
+     */
+    private function queriedChapter($book, $chapter, $version, $interlinear)
+    {
         $verses = Verse::onVersion($version)
             ->where('book_id', $book->id)
             ->where('chapter', $chapter)
             ->where('version', $version)
             ->get();
 
+        // Study tools key on the KJV counterpart ID: one lookup for the whole chapter
+        $kjvIds = ($version === 'KJV') ? $verses->pluck('id', 'verse') : Verse::onVersion('KJV')
+            ->where('book_id', $book->id)
+            ->where('chapter', $chapter)
+            ->where('version', 'KJV')
+            ->pluck('id', 'verse');
+        $modules = $this->chapterModules($kjvIds->values()->all());
+
         // Add commentary availability (available modules)
         foreach ($verses as &$v) {
-            // Find the KJV counterpart ID for study tools
-            $kjvId = ($version === 'KJV') ? $v->id : Verse::onVersion('KJV')
-                ->where('book_id', $book->id)
-                ->where('chapter', $chapter)
-                ->where('verse', $v->verse)
-                ->value('id');
+            $kjvId = $kjvIds[$v->verse] ?? null;
 
             if ($kjvId) {
-                $v->modules = DB::connection('commentaries')
-                    ->table('commentary_entries as ce')
-                    ->join('commentaries as c', 'ce.commentary_id', '=', 'c.id')
-                    ->where('ce.verse_id', $kjvId)
-                    ->pluck('c.abbreviation')
-                    ->implode(',');
+                $v->modules = $modules[$kjvId] ?? '';
             }
 
-            if ($interlinear === 'true') {
+            if ($interlinear) {
                 $words = DB::connection('extras')
                     ->table('verse_words as vw')
                     ->leftJoin('lexicon as l', 'vw.strongs_id', '=', 'l.id')
@@ -56,30 +126,55 @@ public function getChapter(Request $request)
                     ->get();
 
                 if ($words->isNotEmpty()) {
-                    $html = "";
-                    foreach($words as $w) {
-                        $wordText = TextService::sanitizeHTML($w->word);
-                        if ($w->strongs_id) {
-                            $tag = $w->transliteration ?: $w->strongs_id;
-                            $lexType = (strpos($w->strongs_id, 'G') === 0) ? 'strong_greek' : 'strong_hebrew';
-                            $html .= "$wordText <span class='strongs-tag' onclick=\"event.stopPropagation(); showDef('{$w->strongs_id}', '$lexType')\">&lt;$tag&gt;</span> ";
-                        } else {
-                            $html .= "$wordText ";
-                        }
-                    }
-                    $v->text = trim($html);
+                    $v->text = $this->interlinearHtml($words);
                 }
             } else {
                 $v->text = TextService::sanitizeHTML($v->text);
             }
         }
+        return $verses;
+    }
 
-        return response()->json([
-            'book' => $bookName,
-            'chapter' => $chapter,
-            'version' => $version,
-            'verses' => $verses
-        ]);
+    /**
+     * Words followed by their clickable Strong's tags (transliteration when known).
+     */
+    private function interlinearHtml($words)
+    {
+        $html = "";
+        foreach($words as $w) {
+            $wordText = TextService::sanitizeHTML($w->word);
+            if ($w->strongs_id) {
+                $tag = $w->transliteration ?: $w->strongs_id;
+                $lexType = (strpos($w->strongs_id, 'G') === 0) ? 'strong_greek' : 'strong_hebrew';
+                $html .= "$wordText <span class='strongs-tag' onclick=\"event.stopPropagation(); showDef('{$w->strongs_id}', '$lexType')\">&lt;$tag&gt;</span> ";
+            } else {
+                $html .= "$wordText ";
+            }
+        }
+        return trim($html);
+    }
+
+    /**
+     * Comma-separated commentary abbreviations per KJV verse ID, decoded from the
+     * verse_modules masks (bit = commentaries.id - 1) written by tools/build_shards.py.
+     */
+    private function chapterModules(array $kjvIds)
+    {
+        if (empty($kjvIds)) return [];
+
+        $db = DB::connection('commentaries');
+        $names = $db->table('commentaries')->orderBy('id')->pluck('abbreviation', 'id');
+        $masks = $db->table('verse_modules')->whereIn('verse_id', $kjvIds)->pluck('mask', 'verse_id');
+
+        $modules = [];
+        foreach ($masks as $verseId => $mask) {
+            $found = [];
+            foreach ($names as $id => $abbreviation) {
+                if ($mask & (1 << ($id - 1))) $found[] = $abbreviation;
+            }
+            $modules[$verseId] = implode(',', $found);
+        }
+        return $modules;
     }
 
         public function getVersions()
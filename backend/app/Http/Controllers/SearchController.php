@@ -8,41 +8,68 @@
 
 class SearchController extends Controller
 {
+    /**
+     * Page size, and the rowid layout of verses_fts_keys (tools/search_pages.py):
+     * slot << 24 | book_id << 16 | chapter << 8 | verse, one slot per version.
+     */
+    const PAGE_SIZE = 200;
+    const SLOT_SHIFT = 24;
+    const FTS_KEYWORDS = ['AND', 'OR', 'NOT', 'NEAR'];
+
     public function search(Request $request)
     {
         $query = $request->get('q');
         $version = $request->get('version', 'KJV');
         $offset = (int)$request->get('offset', 0);
+        $after = $request->get('after'); // "next" of the previous page
 
         // Sanitize search query
-        $cleanQuery = preg_replace('/[^a-zA-Z0-9 ]/', '', $query);
+        $cleanQuery = trim(preg_replace('/[^a-zA-Z0-9 ]/', '', $query));
         if (!$cleanQuery) {
-            return response()->json(['results' => [], 'count' => 0]);
+            return response()->json(['results' => [], 'count' => 0, 'next' => null]);
         }
 
         // Determine which database alias to use
         $dbAlias = ($version === 'KJV') ? 'main' : 'versions';
+        $db = DB::connection('core');
+
+        // The version's rowid range in verses_fts_keys
+        $slot = $db->selectOne("SELECT slot FROM $dbAlias.search_key_versions WHERE version = ?", [$version]);
+        if (!$slot) {
+            return response()->json(['results' => [], 'count' => 0, 'next' => null]);
+        }
+        $low = ($slot->slot << self::SLOT_SHIFT) - 1;
+        $high = (($slot->slot + 1) << self::SLOT_SHIFT) - 1;
+
+        // 1. Get Total Count: a key lookup for one plain word, a count otherwise
+        $total = null;
+        if (strpos($cleanQuery, ' ') === false && !in_array($cleanQuery, self::FTS_KEYWORDS)) {
+            $total = $db->selectOne("SELECT docs FROM $dbAlias.search_terms WHERE version = ? AND term = ?",
+                [$version, strtolower($cleanQuery)])->docs ?? null;
+        }
+        if ($total === null) {
+            $total = $db->selectOne("
+                SELECT COUNT(*) as total
+                FROM $dbAlias.verses_fts_keys
+                WHERE verses_fts_keys MATCH ? AND rowid > ? AND rowid <= ?
+            ", [$cleanQuery, $low, $high])->total;
+        }
 
-        // 1. Get Total Count
-        $total = DB::connection('core')->selectOne("
-            SELECT COUNT(*) as total 
-            FROM $dbAlias.verses_fts 
-            WHERE verses_fts MATCH ? AND version = ?
-        ", [$cleanQuery, $version])->total;
-
-        // 2. Fetch Paginated Results
-        $results = DB::connection('core')->select("
-            SELECT 
-                b.name as book_name, 
-                v.chapter, 
-                v.verse, 
-                highlight(verses_fts, 0, '[[MARK]]', '[[/MARK]]') as text 
-            FROM $dbAlias.verses_fts v 
-            JOIN main.books b ON v.book_id = b.id 
-            WHERE v.verses_fts MATCH ? AND v.version = ?
-            ORDER BY v.book_id, v.chapter, v.verse 
-            LIMIT 200 OFFSET ?
-        ", [$cleanQuery, $version, $offset]);
+        // 2. Fetch the page in Bible order: after the cursor, or by offset for older clients
+        $from = $after !== null ? max((int)$after, $low) : $low;
+        $results = $db->select("
+            SELECT
+                v.rowid as search_key,
+                b.name as book_name,
+                v.chapter,
+                v.verse,
+                highlight(verses_fts_keys, 0, '[[MARK]]', '[[/MARK]]') as text
+            FROM $dbAlias.verses_fts_keys v
+            JOIN main.books b ON v.book_id = b.id
+            WHERE v.verses_fts_keys MATCH ? AND v.rowid > ? AND v.rowid <= ?
+            ORDER BY v.rowid
+            LIMIT " . self::PAGE_SIZE . " OFFSET ?
+        ", [$cleanQuery, $from, $high, $after !== null ? 0 : $offset]);
 
         // 3. Format results
         $formattedResults = collect($results)->map(function($r) {
@@ -56,7 +83,8 @@ public function search(Request $request)
 
         return response()->json([
             'results' => $formattedResults,
-            'count' => $total
+            'count' => $total,
+            'next' => count($results) === self::PAGE_SIZE ? end($results)->search_key : null
         ]);
     }
-}
\ No newline at end of file
+}
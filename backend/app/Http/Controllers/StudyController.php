@@ -41,7 +41,7 @@ public function getCommentary(Request $request)
             ->first();
 
         return response()->json([
-            'text' => $entry ? TextService::formatCommentary($entry->text) : "No commentary found for this verse."
+            'text' => $entry ? TextService::commentaryHtml($entry) : "No commentary found for this verse."
         ]);
     }
 
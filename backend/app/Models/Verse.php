@@ -11,6 +11,9 @@ class Verse extends Model
     protected $table = 'verses';
     public $timestamps = false;
 
+    // Search ordering key added by tools/build_shards.py; not part of the API
+    protected $hidden = ['search_key'];
+
     public function book()
     {
         return $this->belongsTo(Book::class, 'book_id', 'id');
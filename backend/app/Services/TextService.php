@@ -5,6 +5,12 @@
 use App\Models\Verse;
 
 class TextService {
+    /**
+     * Version of the pre-rendered commentary HTML written by tools/commentary_html.py.
+     * Must match RENDER_FORMAT there.
+     */
+    const COMMENTARY_FORMAT = 2;
+
     /**
      * Sanitizes raw text from DB/User to prevent XSS while allowing specific study tags.
      */
@@ -25,6 +31,16 @@ public static function sanitizeHTML($text) {
         return $text;
     }
 
+    /**
+     * Returns the HTML stored at import time when it is current, otherwise formats the raw text.
+     */
+    public static function commentaryHtml($entry) {
+        if (isset($entry->html) && (int)$entry->format === self::COMMENTARY_FORMAT) {
+            return $entry->html;
+        }
+        return self::formatCommentary($entry->text);
+    }
+
     public static function formatCommentary($text) {
         if (!$text) return "";
         
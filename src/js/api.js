@@ -200,9 +200,11 @@ function updatePaneContent(paneId) {
             return;
         }
         
-        fetch(`${API_BASE}/api/search?q=${encodeURIComponent(state.searchQuery)}&version=${state.version}&scope=${encodeURIComponent(state.searchScope)}&offset=${state.searchOffset}`)
+        const page = state.searchAfter !== null ? `after=${state.searchAfter}` : `offset=${state.searchOffset}`;
+        fetch(`${API_BASE}/api/search?q=${encodeURIComponent(state.searchQuery)}&version=${state.version}&scope=${encodeURIComponent(state.searchScope)}&${page}`)
             .then(r => r.json())
             .then(data => {
+                state.searchNext = data.next ?? null;
                 const currentShowing = Math.min(state.searchOffset + 200, data.count);
                 document.getElementById(`${paneId}-title`).innerText = `Search: ${state.searchQuery} (${currentShowing} of ${data.count})`;
                 
@@ -248,6 +250,7 @@ function updatePaneContent(paneId) {
 
 function loadMoreResults(paneId) {
     state.searchOffset += 200;
+    state.searchAfter = state.searchNext;
     updatePaneContent(paneId);
 }
 
@@ -10,6 +10,8 @@ const state = {
     searchQuery: "",
     searchScope: "ALL",
     searchOffset: 0,
+    searchAfter: null, // keyset cursor of the page being loaded
+    searchNext: null,
     lookupTerm: "",
     lookupType: "dictionary",
     interlinear: false,
@@ -305,6 +305,7 @@ function searchLex() {
 function searchBible() {
     state.searchQuery = document.getElementById('inp-bible-search').value;
     state.searchOffset = 0;
+    state.searchAfter = null;
     
     // Secret Debug Trigger
     if (state.searchQuery === 'DEBUG') {
@@ -0,0 +1,27 @@
+<?php
+/**
+ * Test 2: Sanitize Parity
+ * TextService::sanitizeHTML against the cases tools/commentary_html.py is tested with.
+ */
+require_once __DIR__ . '/../../backend/app/Services/TextService.php';
+
+use App\Services\TextService;
+
+echo "🧪 Running Sanitize Parity...
+";
+$cases = json_decode(file_get_contents(__DIR__ . '/../fixtures/sanitize_cases.json'), true);
+
+foreach ($cases as $case) {
+    $actual = TextService::sanitizeHTML($case['input']);
+
+    if ($actual === $case['expected']) {
+        echo "✅ {$case['name']}
+";
+    } else {
+        echo "❌ FAIL: {$case['name']} expected " . json_encode($case['expected']) . ", got " . json_encode($actual) . "
+";
+        exit(1);
+    }
+}
+echo "✨ Sanitize Parity Verified.
+";
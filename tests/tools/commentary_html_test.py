@@ -0,0 +1,39 @@
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'tools'))
+
+from commentary_html import sanitize, strip_tags
+
+# Test: import-time sanitize matches TextService::sanitizeHTML (tools/commentary_html.py)
+#
+# The cases are shared with tests/api/sanitize_parity_test.php, which runs
+# them through the PHP side.
+#
+#   python tests/tools/commentary_html_test.py     (or pytest tests/tools)
+
+with open(os.path.join(HERE, '..', 'fixtures', 'sanitize_cases.json'), encoding='utf-8') as f:
+    CASES = json.load(f)
+
+def test_sanitize_matches_shared_cases():
+    for case in CASES:
+        actual = sanitize(case['input'])
+        assert actual == case['expected'], f"{case['name']}: expected {case['expected']!r}, got {actual!r}"
+
+def test_strip_tags_without_allowed_tags():
+    # With no allowlist, "<" followed by whitespace is plain text
+    assert strip_tags('1 < 2 <b>bold</b></p>') == '1 < 2 bold'
+
+if __name__ == "__main__":
+    print("🧪 Running Commentary Sanitize Parity Tests...")
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            try:
+                test()
+            except AssertionError as e:
+                print(f"❌ FAIL: {name} {e}")
+                sys.exit(1)
+            print(f"✅ {name}")
+    print("✨ Sanitize Parity Verified.")
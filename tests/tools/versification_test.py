@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+
+from versification import KJV
+
+# Test: verse-ID ranges cut at chapter boundaries (tools/versification.py)
+#
+#   python tests/tools/versification_test.py     (or pytest tests/tools)
+
+def test_split_range_within_chapter():
+    assert KJV.split_range(1, 3) == [(1, 1, 1, 3)]
+
+def test_split_range_across_chapters():
+    # Genesis 1:31 - 2:2
+    assert KJV.split_range(31, 33) == [(1, 1, 31, 31), (1, 2, 1, 2)]
+
+def test_split_range_reversed():
+    assert KJV.split_range(33, 31) == KJV.split_range(31, 33)
+
+def test_split_range_last_verse():
+    assert KJV.split_range(KJV.total, KJV.total) == [(66, 22, 21, 21)]
+
+def test_split_range_rejects_ids_out_of_range():
+    for start_id, end_id in ((0, 3), (-5, 2), (KJV.total, KJV.total + 1)):
+        try:
+            KJV.split_range(start_id, end_id)
+        except ValueError:
+            continue
+        raise AssertionError(f"split_range({start_id}, {end_id}) did not raise")
+
+if __name__ == "__main__":
+    print("🧪 Running Versification Range Tests...")
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            try:
+                test()
+            except AssertionError as e:
+                print(f"❌ FAIL: {name} {e}")
+                sys.exit(1)
+            print(f"✅ {name}")
+    print("✨ Versification Ranges Verified.")
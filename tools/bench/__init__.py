@@ -0,0 +1,75 @@
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError: # Windows: timings only, peak memory is reported as null
+    resource = None
+
+# Benchmarks for the import pipeline and the app's read queries.
+#
+#   python -m bench                                   (synthetic modules, results in bench_<commit>.json)
+#   python -m bench --modules ../ --shards ../assets/data
+#   python -m bench --compare bench_1a2b3c4.json bench_5d6e7f8.json
+#
+# imports.py runs each import stage in a fresh process against a scratch
+# bible_app.db and records its time, throughput and peak RSS (the shard workers'
+# too), then re-runs the importers to time the manifest's skip paths. queries.py times
+# the controllers' hot queries on the shards (p50/p99). Results are plain JSON
+# with the commit they were taken on, so two runs can be compared with
+# --compare. synthetic.py writes KJV-shaped modules for trees without the
+# shipped ones.
+
+RESULTS_FORMAT = 1
+
+def percentile(samples, pct):
+    # Nearest-rank percentile of a list of numbers (pct in 0..100)
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[min(int(rank), len(ordered)) - 1]
+
+def peak_rss_mb():
+    # High-water RSS of this process and its finished children, in MB
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+def environment():
+    return {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+    }
+
+def write_results(path, results):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(path + '.tmp', path)
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        results = json.load(f)
+    if results.get('format') != RESULTS_FORMAT:
+        raise ValueError(f"{path}: results format {results.get('format')}, expected {RESULTS_FORMAT}")
+    return results
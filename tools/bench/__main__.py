@@ -0,0 +1,102 @@
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+
+from bench import RESULTS_FORMAT, environment, write_results, load_results
+from bench import imports, queries, synthetic
+
+# --- CONFIG ---
+MODULES_DIR = '../' # Where the importers look for .bt4/.ct4/.dt4/.xr4
+RUNS = 500 # Timed runs per query
+THRESHOLD = 10.0 # Percent change --compare flags
+
+# --- Run ---
+
+def run(args):
+    results = {'format': RESULTS_FORMAT, 'environment': environment(), 'imports': {}, 'queries': {}}
+    workdir = tempfile.mkdtemp(prefix='lumina_bench_')
+    try:
+        shard_dir = args.shards
+        if not args.skip_imports:
+            if args.modules:
+                print(f"Copying modules from {args.modules}...")
+                sizes = imports.copy_modules(args.modules, workdir)
+                results['source'] = {'modules': args.modules, 'files': sizes}
+            else:
+                print(f"Writing synthetic modules (scale {args.scale}, seed {args.seed})...")
+                sizes = synthetic.write_modules(workdir, args.scale, args.seed)
+                results['source'] = {'synthetic': {'scale': args.scale, 'seed': args.seed}, 'files': sizes}
+            print(f"Import stages ({args.jobs} job{'s' if args.jobs > 1 else ''}):")
+            results['imports'] = imports.run_imports(workdir, args.jobs, args.verbose)
+            shard_dir = shard_dir or imports.shard_dir(workdir)
+        if not args.skip_queries:
+            if not shard_dir:
+                raise SystemExit("--skip-imports needs --shards to time queries")
+            print(f"Queries on {shard_dir} ({args.runs} runs each):")
+            results['queries'] = queries.run_queries(shard_dir, args.runs, args.seed)
+            results['shards'] = shard_dir if args.shards else 'built by this run'
+    finally:
+        if args.keep:
+            print(f"Work directory kept: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    out = args.out or f"bench_{results['environment']['commit'] or time.strftime('%Y%m%d_%H%M%S')}.json"
+    write_results(out, results)
+    print(f"Results written to {out}. ⏱️")
+
+# --- Compare ---
+
+# (section, metric, True when higher is better)
+COMPARED = [
+    ('imports', 'seconds', False),
+    ('imports', 'records_per_s', True),
+    ('imports', 'peak_rss_mb', False),
+    ('imports', 'workers_rss_mb', False),
+    ('queries', 'p50_ms', False),
+    ('queries', 'p99_ms', False),
+]
+
+def compare(old_path, new_path, threshold=THRESHOLD):
+    # Prints every compared metric; returns how many got worse by more than threshold percent
+    old, new = load_results(old_path), load_results(new_path)
+    print(f"{old['environment']['commit'] or old_path} -> {new['environment']['commit'] or new_path}")
+    if old.get('source', {}).get('files') != new.get('source', {}).get('files'):
+        print("  Note: the runs read different module files.")
+    regressions = 0
+    for section, metric, higher_is_better in COMPARED:
+        for name in old.get(section, {}):
+            before = old[section][name].get(metric)
+            after = new.get(section, {}).get(name, {}).get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) * 100 / before
+            worse = change < -threshold if higher_is_better else change > threshold
+            regressions += worse
+            flag = '  <-- worse' if worse else ''
+            print(f"  {section}.{name}.{metric}: {before} -> {after} ({change:+.1f}%){flag}")
+    print(f"{regressions} metrics worse by more than {threshold}%." if regressions else f"Nothing worse by more than {threshold}%.")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='python -m bench', description="Benchmark the import stages and the app's read queries")
+    parser.add_argument('--modules', help=f"Benchmark the modules in this directory, e.g. {MODULES_DIR} (default: synthetic ones)")
+    parser.add_argument('--scale', type=float, default=1.0, help="Synthetic commentary/dictionary size")
+    parser.add_argument('--seed', type=int, default=1, help="Seed for synthetic modules and query parameters")
+    parser.add_argument('--shards', help="Time queries on these shards instead of the ones this run builds")
+    parser.add_argument('--skip-imports', action='store_true', help="Only time queries (needs --shards)")
+    parser.add_argument('--skip-queries', action='store_true', help="Only time the import stages")
+    parser.add_argument('--runs', type=int, default=RUNS, help=f"Timed runs per query (default {RUNS})")
+    parser.add_argument('--jobs', type=int, default=1, help="Worker processes for the stages that take --jobs")
+    parser.add_argument('--out', help="Results file (default bench_<commit>.json)")
+    parser.add_argument('--keep', action='store_true', help="Keep the work directory")
+    parser.add_argument('--verbose', action='store_true', help="Show the importers' own output")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="Compare two results files instead of running")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help=f"Percent change --compare flags (default {THRESHOLD})")
+    parser.add_argument('--strict', action='store_true', help="With --compare, exit non-zero when something got worse")
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) and args.strict else 0)
+    run(args)
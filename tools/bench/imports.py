@@ -0,0 +1,247 @@
+import sqlite3
+import contextlib
+import glob
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import time
+import traceback
+
+import robust_parser
+import import_all
+import parse_cross_refs
+import setup_search
+import build_shards
+from bulkload import BulkWriter
+from manifest import Manifest, MANIFEST_TABLE
+from bench import peak_rss_mb
+
+# Import stages, timed one at a time.
+#
+# The modules are copied into <workdir>/ and every stage runs with
+# <workdir>/tools/ as its working directory, so the importers find them under
+# their usual SOURCE_DIR ('../') and write their usual DB_PATH. That holds in
+# --jobs worker processes too. Each stage gets a fresh spawned process, so
+# ru_maxrss is that stage's own high-water mark and not the run's so far.
+# Stages build on each other (FTS needs verses, shards need everything), so
+# they always run in this order.
+#
+# The Bible, commentary and dictionary stages record the build manifest like
+# the importers' own main()s do. "warm" then runs them again over the same
+# files, so every module takes the unchanged-source skip (stat only), and
+# "touched" does it once more after bumping the files' mtime, which forces the
+# content-hash check. Shards are built by one worker process per shard, each
+# reporting its own peak RSS; the stage's peak_rss_mb only sees the largest
+# process, workers_rss_mb adds them up.
+
+DB_PATH = 'bible_app.db' # Inside <workdir>/tools, the importers' default
+MODULE_EXTENSIONS = ('.bt4', '.ct4', '.dt4', '.xr4')
+SOURCE_VERSION = 'KJV' # Parsed first, like robust_parser does
+SHARD_DIR = 'shards' # Inside <workdir>/tools
+
+def _files(ext):
+    return sorted(glob.glob(os.path.join('..', f"*{ext}")))
+
+def _size(paths):
+    return sum(os.path.getsize(p) for p in paths)
+
+def _count(c, table):
+    return c.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+# --- Stages ---
+# Each returns (records, input bytes, extra fields)
+
+def _bibles():
+    return sorted(_files('.bt4'), key=lambda p: os.path.basename(p).upper() != f"{SOURCE_VERSION}.BT4")
+
+def _version(path):
+    return os.path.splitext(os.path.basename(path))[0].upper()
+
+def stage_bibles(jobs):
+    files = _bibles()
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    robust_parser.init_db(c)
+    robust_parser.populate_books(c)
+    conn.commit()
+    with BulkWriter(conn) as bulk:
+        manifest = Manifest(c)
+        for path in files:
+            robust_parser.parse_bible(path, _version(path), bulk, manifest)
+    records = _count(c, 'verses')
+    conn.close()
+    return records, _size(files), {'versions': len(files)}
+
+def stage_commentaries(jobs):
+    files = _files('.ct4')
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    with BulkWriter(conn) as bulk:
+        names = import_all.import_commentaries([os.path.splitext(os.path.basename(p))[0] for p in files], bulk, jobs, Manifest(c))
+    records = sum(_count(c, f"commentary_{name.lower()}") for name in names)
+    conn.close()
+    return records, _size(files), {'modules': len(names)}
+
+def stage_xrefs(jobs):
+    # Decode, store ranges, expand them into the verse-level graph
+    files = _files('.xr4')[:1]
+    if not files:
+        return 0, 0, {}
+    parse_cross_refs.parse_cross_refs(files[0], DB_PATH)
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    records = _count(c, 'cross_references')
+    links = c.execute("SELECT verse_links FROM cross_reference_stats").fetchone()[0]
+    conn.close()
+    return records, _size(files), {'verse_links': links}
+
+def stage_dictionaries(jobs):
+    files = _files('.dt4')
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    with BulkWriter(conn) as bulk:
+        bulk.defer_indexes('dictionaries')
+        manifest = Manifest(c)
+        for path in files:
+            robust_parser.parse_dictionary(path, bulk, manifest)
+    records = _count(c, 'dictionaries')
+    conn.close()
+    return records, _size(files), {'modules': len(files)}
+
+def stage_fts(jobs):
+    setup_search.setup_search_index(DB_PATH, full=True)
+    conn = sqlite3.connect(DB_PATH)
+    records = _count(conn.cursor(), 'verses')
+    conn.close()
+    return records, None, {}
+
+def _shard_worker(name):
+    # -> (name, this worker's peak RSS); one fresh process per shard
+    build_shards.build_shard(name, SHARD_DIR)
+    return name, peak_rss_mb()
+
+def stage_shards(jobs):
+    # build_shards' parallel step, with every worker reporting its own RSS
+    names = list(build_shards.SHARDS)
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    with mp.Pool(min(jobs, len(names)), maxtasksperchild=1) as pool:
+        workers = dict(pool.imap_unordered(_shard_worker, names))
+    paths = [build_shards.shard_path(name, SHARD_DIR) for name in names]
+    extra = {'output_mb': round(_size(paths) / 1024 / 1024, 1), 'worker_peak_rss_mb': workers}
+    if None not in workers.values():
+        extra['workers_rss_mb'] = round(sum(workers.values()), 1)
+    return None, None, extra
+
+def _rerun():
+    # The manifest-aware imports again; -> (sources checked, input bytes, extra)
+    bibles, commentaries, dictionaries = _bibles(), _files('.ct4'), _files('.dt4')
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    before = c.execute(f"SELECT source, target, sha256, built_at FROM {MANIFEST_TABLE}").fetchall()
+    with BulkWriter(conn) as bulk:
+        manifest = Manifest(c)
+        for path in bibles:
+            robust_parser.parse_bible(path, _version(path), bulk, manifest)
+        import_all.import_commentaries([os.path.splitext(os.path.basename(p))[0] for p in commentaries], bulk, 1, manifest)
+        for path in dictionaries:
+            robust_parser.parse_dictionary(path, bulk, manifest)
+    after = c.execute(f"SELECT source, target, sha256, built_at FROM {MANIFEST_TABLE}").fetchall()
+    conn.close()
+    files = bibles + commentaries + dictionaries
+    # Rows whose built_at moved were imported again instead of skipped (a
+    # touched-but-identical file only has its size/mtime refreshed)
+    return len(after), _size(files), {'reimported': len(set(after) - set(before))}
+
+def stage_warm(jobs):
+    return _rerun()
+
+def stage_touched(jobs):
+    now = time.time()
+    for path in _bibles() + _files('.ct4') + _files('.dt4'):
+        os.utime(path, (now, now))
+    return _rerun()
+
+STAGES = {
+    'bibles': stage_bibles,
+    'commentaries': stage_commentaries,
+    'xrefs': stage_xrefs,
+    'dictionaries': stage_dictionaries,
+    'fts': stage_fts,
+    'shards': stage_shards,
+    'warm': stage_warm,
+    'touched': stage_touched,
+}
+
+def run_stage(name, tools_dir, jobs=1, verbose=False):
+    # Runs in its own spawned process; -> result dict
+    os.chdir(tools_dir)
+    start_rss = peak_rss_mb()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stdout if verbose else devnull):
+        start = time.perf_counter()
+        records, input_bytes, extra = STAGES[name](jobs)
+        seconds = time.perf_counter() - start
+    result = {
+        'seconds': round(seconds, 3),
+        'records': records,
+        'records_per_s': round(records / seconds) if records and seconds else None,
+        'input_mb': round(input_bytes / 1024 / 1024, 2) if input_bytes else None,
+        'mb_per_s': round(input_bytes / 1024 / 1024 / seconds, 2) if input_bytes and seconds else None,
+        'start_rss_mb': start_rss,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    result.update(extra)
+    return result
+
+# --- Run ---
+
+def copy_modules(modules_dir, workdir):
+    # -> {file name: bytes} of the modules copied
+    sizes = {}
+    for ext in MODULE_EXTENSIONS:
+        for path in sorted(glob.glob(os.path.join(modules_dir, f"*{ext}"))):
+            shutil.copy(path, workdir)
+            sizes[os.path.basename(path)] = os.path.getsize(path)
+    if not any(name.lower().endswith('.bt4') for name in sizes):
+        raise SystemExit(f"No .bt4 Bible modules in {modules_dir}")
+    return sizes
+
+def tools_dir(workdir):
+    path = os.path.join(workdir, 'tools')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _stage_process(conn, name, tools_dir, jobs, verbose):
+    # Not a Pool worker: those are daemonic and the stages start their own --jobs workers
+    try:
+        conn.send((True, run_stage(name, tools_dir, jobs, verbose)))
+    except BaseException:
+        conn.send((False, traceback.format_exc()))
+    finally:
+        conn.close()
+
+def run_imports(workdir, jobs=1, verbose=False):
+    # -> {stage: result}, in stage order
+    ctx = mp.get_context('spawn')
+    results = {}
+    for name in STAGES:
+        print(f"  {name}...", end=' ', flush=True)
+        receiver, sender = ctx.Pipe(duplex=False)
+        process = ctx.Process(target=_stage_process, args=(sender, name, tools_dir(workdir), jobs, verbose))
+        process.start()
+        sender.close()
+        try:
+            ok, result = receiver.recv()
+        except EOFError:
+            ok, result = False, f"exit code {process.exitcode}"
+        process.join()
+        if not ok:
+            raise RuntimeError(f"Stage {name} failed:\n{result}")
+        results[name] = result
+        rate = f", {result['records_per_s']:,} rows/s" if result['records_per_s'] else ''
+        workers = f", workers {result['workers_rss_mb']} MB" if result.get('workers_rss_mb') else ''
+        print(f"{result['seconds']:.2f}s{rate}, peak {result['peak_rss_mb']} MB{workers}")
+    return results
+
+def shard_dir(workdir):
+    return os.path.join(workdir, 'tools', SHARD_DIR)
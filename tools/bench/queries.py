@@ -0,0 +1,137 @@
+import sqlite3
+import os
+import random
+import time
+
+from setup_search import SAMPLE_TERMS
+from search_pages import slot_bounds
+from verify_plans import SHARD_QUERIES
+from bench import percentile
+
+# Hot read queries, timed on the shards the app opens (read-only).
+#
+# The SQL is taken from verify_plans.SHARD_QUERIES, so the shapes timed here
+# are the ones checked for index use there. Parameters are drawn at random
+# from the shard itself (same seed, same draws): a chapter, a verse ID, a
+# search term and page. Each query runs WARMUP times untimed, then `runs`
+# times; rows are fetched like the app fetches them.
+
+WARMUP = 20
+PAGE_SIZE = 200 # SearchController's LIMIT
+SEARCH_PAGES = 3 # First page and the two after it, by keyset cursor
+
+# name -> (shard, verify_plans label)
+QUERIES = {
+    'chapter': ('core', 'KJV chapter'),
+    'version_chapter': ('versions', 'Version chapter'),
+    'commentary': ('commentaries', 'Commentary entry'),
+    'commentary_modules': ('commentaries', 'Modules for a verse'),
+    'xrefs': ('extras', 'Cross-references'),
+    'search_terms': ('core', 'KJV search term count'),
+    'search_count': ('core', 'KJV search count'),
+    'search_page': ('core', 'KJV search page'),
+}
+
+def query_sql(shard, label):
+    for name, sql, params, expect in SHARD_QUERIES[shard]:
+        if name == label:
+            return sql
+    raise KeyError(f"{shard}: no query labelled {label!r} in verify_plans")
+
+def open_shard(shard_dir, name):
+    path = os.path.join(shard_dir, f"{name}.db")
+    if not os.path.exists(path):
+        return None
+    return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+
+# --- Parameters ---
+
+def param_source(conns, name, rng):
+    # -> function returning the next parameter tuple, or None when the shard has no data for it
+    if name == 'chapter':
+        chapters = conns['core'].execute("SELECT DISTINCT book_id, chapter FROM verses").fetchall()
+        return chapters and (lambda: rng.choice(chapters) + ('KJV',))
+    if name == 'version_chapter':
+        chapters = conns['versions'].execute("SELECT DISTINCT book_id, chapter, version FROM verses").fetchall()
+        return chapters and (lambda: rng.choice(chapters))
+    if name in ('commentary', 'commentary_modules'):
+        abbreviations = [a for (a,) in conns['commentaries'].execute("SELECT abbreviation FROM commentaries")]
+        total = conns['commentaries'].execute("SELECT max(verse_id) FROM commentary_entries").fetchone()[0]
+        if not abbreviations or not total:
+            return None
+        if name == 'commentary':
+            return lambda: (rng.randint(1, total), rng.choice(abbreviations))
+        return lambda: (rng.randint(1, total),)
+    if name == 'xrefs':
+        total = conns['extras'].execute("SELECT max(from_verse_id) FROM cross_references").fetchone()[0]
+        return total and (lambda: (rng.randint(1, total),))
+    if name == 'search_terms':
+        return lambda: ('KJV', rng.choice(SAMPLE_TERMS))
+    if name in ('search_count', 'search_page'):
+        slot = conns['core'].execute("SELECT slot FROM search_key_versions WHERE version = 'KJV'").fetchone()
+        if not slot:
+            return None
+        low, high = slot_bounds(slot[0])
+        if name == 'search_count':
+            return lambda: (rng.choice(SAMPLE_TERMS), low, high)
+        # The cursors SearchController hands out: the last key of each page
+        sql = query_sql('core', 'KJV search page')
+        cursors = []
+        for term in SAMPLE_TERMS:
+            after = low
+            for _ in range(SEARCH_PAGES):
+                cursors.append((term, after, high, 0))
+                rows = conns['core'].execute(sql, (term, after, high, 0)).fetchall()
+                if len(rows) < PAGE_SIZE:
+                    break
+                after = rows[-1][0]
+        return lambda: rng.choice(cursors)
+    raise KeyError(name)
+
+# --- Timing ---
+
+def time_query(conn, sql, next_params, runs):
+    c = conn.cursor()
+    for _ in range(WARMUP):
+        c.execute(sql, next_params()).fetchall()
+    timings = []
+    rows = 0
+    for _ in range(runs):
+        params = next_params()
+        start = time.perf_counter()
+        rows += len(c.execute(sql, params).fetchall())
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'runs': runs,
+        'p50_ms': round(percentile(timings, 50), 4),
+        'p99_ms': round(percentile(timings, 99), 4),
+        'mean_ms': round(sum(timings) / runs, 4),
+        'max_ms': round(max(timings), 4),
+        'rows_per_query': round(rows / runs, 1),
+    }
+
+def run_queries(shard_dir, runs=500, seed=1):
+    # -> {query: result}; queries whose shard is missing or empty are left out
+    conns = {}
+    for shard, _ in QUERIES.values():
+        if shard not in conns:
+            conns[shard] = open_shard(shard_dir, shard)
+    results = {}
+    try:
+        for name, (shard, label) in QUERIES.items():
+            if conns[shard] is None:
+                print(f"  {name}: no {shard}.db, skipped")
+                continue
+            rng = random.Random(seed)
+            next_params = param_source(conns, name, rng)
+            if not next_params:
+                print(f"  {name}: {shard}.db has no rows for it, skipped")
+                continue
+            result = time_query(conns[shard], query_sql(shard, label), next_params, runs)
+            results[name] = result
+            print(f"  {name}: p50 {result['p50_ms']:.3f} ms, p99 {result['p99_ms']:.3f} ms ({result['rows_per_query']} rows)")
+    finally:
+        for conn in conns.values():
+            if conn is not None:
+                conn.close()
+    return results
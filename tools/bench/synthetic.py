@@ -0,0 +1,119 @@
+import os
+import random
+
+from versification import KJV
+
+# KJV-shaped stand-ins for the shipped modules, in the same NUL-delimited
+# formats modreader decodes:
+#
+#   KJV.bt4, ASV.bt4   one record per verse of the KJV versification
+#   MHC.ct4, ...       hex verse ID / text pairs with \x07bold\x07, \x06italic\x06
+#                      and \x03HEX\x03 reference markup
+#   Easton.dt4         topic / definition pairs
+#   bcdxrefs.xr4       hex verse ID / \x03HEX\x03 and \x03HEX-HEX\x03 refs
+#
+# Word frequencies follow a Zipf curve over a fixed vocabulary, and the words
+# search benchmarks look for are in it. The same seed and scale give the same
+# bytes, so runs on different commits read identical input.
+
+ENCODING = 'cp1252'
+COMMON_WORDS = ['the', 'and', 'of', 'to', 'that', 'in', 'he', 'shall', 'unto', 'for', 'i', 'his', 'a', 'lord',
+                'they', 'be', 'is', 'him', 'not', 'them', 'it', 'with', 'all', 'thou', 'thy', 'was', 'god',
+                'which', 'my', 'me', 'said', 'but', 'ye', 'their', 'have', 'will', 'thee', 'from', 'as', 'are']
+SEARCH_WORDS = ['beginning', 'love', 'faith', 'hope', 'shepherd', 'righteousness', 'light', 'mercy', 'grace', 'peace']
+VOCABULARY_SIZE = 6000
+SEARCH_RANK = 300 # Zipf rank of the first search word
+
+COMMENTARIES = ('MHC', 'Barnes')
+COMMENTARY_ENTRIES = 12000 # Per module at scale 1
+DICTIONARY_TOPICS = 4000
+XREF_EVERY = 2 # One xref key per N verses
+XREF_MAX_REFS = 6
+XREF_RANGE_SHARE = 0.2 # Refs written as HEX-HEX
+
+def vocabulary(rng, size=VOCABULARY_SIZE):
+    letters = 'abcdefghiklmnoprstuvwy'
+    words = list(COMMON_WORDS)
+    seen = set(words) | set(SEARCH_WORDS)
+    while len(words) < size - len(SEARCH_WORDS):
+        word = ''.join(rng.choice(letters) for _ in range(rng.randint(3, 10)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    # Far enough down the curve to match a few hundred verses each, like 'love' in the KJV
+    for i, word in enumerate(SEARCH_WORDS):
+        words.insert(SEARCH_RANK + i * 40, word)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    return words, weights
+
+def sentence(rng, words, weights, low, high):
+    text = ' '.join(rng.choices(words, weights, k=rng.randint(low, high)))
+    return text[0].upper() + text[1:] + '.'
+
+def write_records(path, records):
+    with open(path, 'wb') as f:
+        f.write(b'\x00'.join(r.encode(ENCODING, 'replace') for r in records))
+    return os.path.getsize(path)
+
+def write_bible(path, rng, words, weights, marked=False):
+    # marked: paragraph marks and control bytes TextCleaner has to strip
+    def verses():
+        for _ in range(KJV.total):
+            text = sentence(rng, words, weights, 8, 40)
+            if marked and rng.random() < 0.05:
+                text = '\xb6 ' + text
+            if marked and rng.random() < 0.02:
+                text = '\x06' + text
+            yield text
+    return write_records(path, verses())
+
+def ref_code(rng):
+    start = rng.randint(1, KJV.total - 8)
+    if rng.random() < XREF_RANGE_SHARE:
+        return f"{start:X}-{start + rng.randint(1, 7):X}"
+    return f"{start:X}"
+
+def write_commentary(path, rng, words, weights, entries):
+    def records():
+        for verse_id in sorted(rng.sample(range(1, KJV.total + 1), min(entries, KJV.total))):
+            parts = []
+            for _ in range(rng.randint(1, 6)):
+                parts.append(sentence(rng, words, weights, 10, 60))
+                roll = rng.random()
+                if roll < 0.3:
+                    parts.append(f"\x03{ref_code(rng)}\x03")
+                elif roll < 0.4:
+                    parts.append(f"\x07{sentence(rng, words, weights, 1, 4)}\x07")
+                elif roll < 0.5:
+                    parts.append(f"\x06{sentence(rng, words, weights, 1, 4)}\x06")
+            yield f"{verse_id:X}"
+            yield ' '.join(parts)
+    return write_records(path, records())
+
+def write_dictionary(path, rng, words, weights, topics):
+    def records():
+        for n in range(topics):
+            yield f"{rng.choice(words).title()} {n}"
+            yield ' '.join(sentence(rng, words, weights, 10, 40) for _ in range(rng.randint(1, 8)))
+    return write_records(path, records())
+
+def write_xrefs(path, rng):
+    def records():
+        for verse_id in range(1, KJV.total + 1, XREF_EVERY):
+            yield f"{verse_id:X}"
+            yield ''.join(f"\x03{ref_code(rng)}\x03" for _ in range(rng.randint(1, XREF_MAX_REFS)))
+    return write_records(path, records())
+
+def write_modules(out_dir, scale=1.0, seed=1):
+    # -> {file name: bytes written}
+    rng = random.Random(seed)
+    words, weights = vocabulary(rng)
+    os.makedirs(out_dir, exist_ok=True)
+    sizes = {}
+    sizes['KJV.bt4'] = write_bible(os.path.join(out_dir, 'KJV.bt4'), rng, words, weights)
+    sizes['ASV.bt4'] = write_bible(os.path.join(out_dir, 'ASV.bt4'), rng, words, weights, marked=True)
+    for name in COMMENTARIES:
+        sizes[f"{name}.ct4"] = write_commentary(os.path.join(out_dir, f"{name}.ct4"), rng, words, weights, int(COMMENTARY_ENTRIES * scale))
+    sizes['Easton.dt4'] = write_dictionary(os.path.join(out_dir, 'Easton.dt4'), rng, words, weights, int(DICTIONARY_TOPICS * scale))
+    sizes['bcdxrefs.xr4'] = write_xrefs(os.path.join(out_dir, 'bcdxrefs.xr4'), rng)
+    return sizes
@@ -0,0 +1,203 @@
+import sqlite3
+import argparse
+import json
+import zlib
+from itertools import chain, groupby
+
+from manifest import MANIFEST_TABLE
+from bulkload import BulkWriter
+from interlinear import ALIGNED_TABLE, TOKEN_TABLE, read_tokens
+from versification import KJV
+
+# Per-chapter render cache: one compressed JSON payload per (version, book, chapter)
+# holding the verse text, interlinear tokens and commentary availability, so a
+# chapter load is a single primary-key read instead of one query per verse.
+#
+# Verse IDs in the payload are the ones the app sees: KJV verses carry their
+# global verse ID (as in core.db), other versions keep their bible_app.db IDs
+# (as in versions.db). build_shards.py copies the rows into those two shards.
+#
+# Only chapters touched since the last run are rebuilt. What changed is read off
+# the build manifest: a re-imported Bible dirties its version, a re-imported
+# commentary dirties the chapters it has entries for (before and after).
+
+# --- CONFIG ---
+DB_PATH = 'bible_app.db'
+CACHE_FORMAT = 3 # Bump when the payload layout changes; older rows are rebuilt
+BASE_VERSION = 'KJV' # Commentary availability is keyed on KJV verse IDs
+
+def init_cache(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS chapter_cache (
+                    version TEXT,
+                    book_id INTEGER,
+                    chapter INTEGER,
+                    format INTEGER,
+                    modules_mask INTEGER,
+                    payload BLOB,
+                    PRIMARY KEY (version, book_id, chapter)
+                ) WITHOUT ROWID''')
+    # Manifest rows as they were when the cache was last built
+    c.execute('''CREATE TABLE IF NOT EXISTS chapter_cache_sources (
+                    source TEXT,
+                    target TEXT,
+                    sha256 TEXT,
+                    PRIMARY KEY (source, target)
+                )''')
+
+def _kjv_verse_id(book_id, chapter, verse):
+    try:
+        return KJV.verse_id(book_id, chapter, verse)
+    except ValueError:
+        return None
+
+def table_exists(c, name):
+    return c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+def encode_payload(version, book_id, chapter, verses):
+    doc = {'format': CACHE_FORMAT, 'version': version, 'book_id': book_id, 'chapter': chapter, 'verses': verses}
+    return zlib.compress(json.dumps(doc, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+def read_chapter(c, version, book_id, chapter):
+    # The read side: one primary-key lookup
+    row = c.execute("SELECT payload FROM chapter_cache WHERE version = ? AND book_id = ? AND chapter = ? AND format = ?",
+                    (version, book_id, chapter, CACHE_FORMAT)).fetchone()
+    return json.loads(zlib.decompress(row[0])) if row else None
+
+# --- Dirty tracking ---
+
+def changed_targets(c):
+    # Manifest targets whose source was (re)built, added or removed since last run
+    if not table_exists(c, MANIFEST_TABLE):
+        return set()
+    current = dict(((s, t), h) for s, t, h in c.execute(f"SELECT source, target, sha256 FROM {MANIFEST_TABLE}"))
+    previous = dict(((s, t), h) for s, t, h in c.execute("SELECT source, target, sha256 FROM chapter_cache_sources"))
+    return {key[1] for key in set(current) | set(previous) if current.get(key) != previous.get(key)}
+
+def module_chapters(c, module):
+    # (book_id, chapter) pairs with entries in the module now, or flagged for it in the cache
+    chapters = set()
+    table_name = f"commentary_{module.lower()}"
+    if table_exists(c, table_name):
+        # Entries are keyed on global KJV verse IDs
+        chapters.update(KJV.reference(verse_id)[:2] for (verse_id,) in c.execute(f"SELECT verse_id FROM {table_name}")
+                        if KJV.is_valid_id(verse_id))
+    if table_exists(c, 'verse_module_bits'):
+        row = c.execute("SELECT bit FROM verse_module_bits WHERE name = ?", (module.upper(),)).fetchone()
+        if row:
+            flag = 1 << row[0]
+            chapters.update(c.execute("SELECT DISTINCT book_id, chapter FROM chapter_cache WHERE modules_mask & ?", (flag,)).fetchall())
+    return chapters
+
+def plan_rebuild(c, full=False):
+    # {version: None (every chapter) or set of (book_id, chapter)}
+    versions = [v for (v,) in c.execute("SELECT DISTINCT version FROM verses")]
+    if full:
+        return {v: None for v in versions}
+    cached = {v for (v,) in c.execute("SELECT DISTINCT version FROM chapter_cache WHERE format = ?", (CACHE_FORMAT,))}
+    plan = {v: None for v in versions if v not in cached}
+    touched = set()
+    for target in changed_targets(c):
+        if target.startswith('verses:'):
+            version = target.split(':', 1)[1]
+            if version in versions: plan[version] = None
+            if version == BASE_VERSION: # Other versions take availability from KJV IDs
+                plan.update({v: None for v in versions})
+        elif target.startswith('commentary_'):
+            touched |= module_chapters(c, target[len('commentary_'):])
+        elif target == TOKEN_TABLE:
+            # Interlinear re-import: verse_tokens is KJV only
+            if BASE_VERSION in versions: plan[BASE_VERSION] = None
+        elif target.startswith(f"{ALIGNED_TABLE}:"):
+            # Tags re-aligned onto another version (heuristic_mapper.py)
+            version = target.split(':', 1)[1]
+            if version in versions: plan[version] = None
+    if touched:
+        for v in versions:
+            if v in plan and plan[v] is None: continue
+            plan[v] = plan.get(v, set()) | touched
+    return plan
+
+# --- Build ---
+
+def chapter_rows(c, version, modules, chapters=None):
+    # Yields ((book_id, chapter), mask, [verse dicts]) in order, for every chapter
+    # of the version or only those in `chapters`
+    # KJV tokens are imported, other versions' are aligned onto their wording
+    tokens_table = TOKEN_TABLE if version == BASE_VERSION else ALIGNED_TABLE
+    has_tokens = table_exists(c, tokens_table)
+    tc = c.connection.cursor() # c is busy streaming the verses
+    has_index = table_exists(c, 'verse_modules')
+    # Availability is keyed on the global ID of the same reference in KJV
+    mask = "coalesce(vm.mask, 0)" if has_index else "0"
+    join = "LEFT JOIN verse_modules vm ON vm.verse_id = kjv_verse_id(v.book_id, v.chapter, v.verse)" if has_index else ""
+    where = "v.version = ?" if chapters is None else "v.version = ? AND v.book_id = ? AND v.chapter = ?"
+    sql = f"""SELECT v.id, v.book_id, v.chapter, v.verse, v.text, {mask},
+                     CASE WHEN v.version = ? THEN kjv_verse_id(v.book_id, v.chapter, v.verse) ELSE v.id END
+              FROM verses v
+              {join}
+              WHERE {where}
+              ORDER BY v.book_id, v.chapter, v.verse"""
+    if chapters is None:
+        rows = c.execute(sql, (BASE_VERSION, version))
+    else:
+        # Dirty chapters only: one idx_version_loc range read each, not a pass over the version
+        rows = chain.from_iterable(c.execute(sql, (BASE_VERSION, version, book_id, chapter))
+                                   for book_id, chapter in sorted(chapters))
+    for key, group in groupby(rows, key=lambda r: (r[1], r[2])):
+        group = list(group)
+        # One range read per chapter (a chapter's verse IDs are contiguous)
+        ids = [row[0] for row in group]
+        tokens = read_tokens(tc, min(ids), max(ids), tokens_table) if has_tokens else {}
+        verses = []
+        chapter_mask = 0
+        for verse_id, _, _, verse, text, verse_mask, app_id in group:
+            if app_id is None:
+                continue # Outside the KJV versification; build_shards leaves it out of core.db
+            chapter_mask |= verse_mask
+            verses.append({
+                'id': app_id,
+                'verse': verse,
+                'text': text,
+                'modules': [name for bit, name in modules if verse_mask >> bit & 1],
+                'words': [list(t) for t in tokens.get(verse_id, ())],
+            })
+        yield key, chapter_mask, verses
+
+def build_chapter_cache(full=False):
+    conn = sqlite3.connect(DB_PATH)
+    conn.create_function('kjv_verse_id', 3, _kjv_verse_id, deterministic=True)
+    c = conn.cursor()
+    init_cache(c)
+
+    plan = plan_rebuild(c, full)
+    modules = c.execute("SELECT bit, name FROM verse_module_bits ORDER BY bit").fetchall() if table_exists(c, 'verse_module_bits') else []
+
+    # Versions that are gone from verses
+    c.execute("DELETE FROM chapter_cache WHERE version NOT IN (SELECT DISTINCT version FROM verses)")
+    conn.commit()
+
+    with BulkWriter(conn) as bulk:
+        for version, chapters in sorted(plan.items()):
+            if chapters is not None and not chapters: continue
+            scope = "all chapters" if chapters is None else f"{len(chapters)} chapter(s)"
+            print(f"Caching {version}: {scope}...")
+            if chapters is None:
+                c.execute("DELETE FROM chapter_cache WHERE version = ?", (version,))
+            rows = ((version, book_id, chapter, CACHE_FORMAT, chapter_mask, encode_payload(version, book_id, chapter, verses))
+                    for (book_id, chapter), chapter_mask, verses in chapter_rows(c, version, modules, chapters))
+            bulk.insert('chapter_cache', ('version', 'book_id', 'chapter', 'format', 'modules_mask', 'payload'), rows, verb='INSERT OR REPLACE')
+
+        # Remember what the cache was built from
+        c.execute("DELETE FROM chapter_cache_sources")
+        if table_exists(c, MANIFEST_TABLE):
+            c.execute(f"INSERT INTO chapter_cache_sources (source, target, sha256) SELECT source, target, sha256 FROM {MANIFEST_TABLE}")
+
+    total = c.execute("SELECT count(*), coalesce(sum(length(payload)), 0) FROM chapter_cache").fetchone()
+    conn.close()
+    print(f"Chapter cache ready: {total[0]} chapters, {total[1] / 1024 / 1024:.1f} MB compressed. 📦")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute per-chapter payloads into chapter_cache")
+    parser.add_argument('--full', action='store_true', help="Rebuild every chapter (e.g. after an interlinear import)")
+    args = parser.parse_args()
+    build_chapter_cache(args.full)
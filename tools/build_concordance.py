@@ -0,0 +1,196 @@
+import sqlite3
+import argparse
+import json
+import re
+import time
+from collections import Counter
+from itertools import groupby
+
+from manifest import MANIFEST_TABLE
+from bulkload import BulkWriter
+from interlinear import TOKEN_TABLE, format_strongs, parse_strongs
+
+# Strong's concordance built from the interlinear tokens.
+#
+# strongs_postings has one row per Strong's number:
+#
+#   verses, occurrences  -- how many verses / words carry the number
+#   forms                -- JSON [[word, count], ...], most frequent rendering first
+#   postings             -- the verse list: (verse_id - previous verse_id, count)
+#                           pairs as unsigned LEB128 varints, verse_ids ascending
+#
+# A concordance entry, its frequency stats and the verse list for "show all
+# occurrences" are therefore one primary-key read. H3068 (~6,000 verses) packs
+# into about 12 KB; most numbers need a few bytes.
+
+# --- CONFIG ---
+DB_PATH = 'bible_app.db'
+POSTINGS_TABLE = 'strongs_postings'
+SOURCES_TABLE = 'strongs_postings_sources'
+MAX_FORMS = 50 # Renderings kept per number
+SOURCE_VERSION = 'KJV' # Only this version's tokens are counted; verse IDs are its own
+
+WORD_EDGES = re.compile(r"^[^\w']+|[^\w']+$")
+
+# --- Encoding ---
+
+def _varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+def encode_postings(pairs):
+    # [(verse_id, count), ...] sorted by verse_id -> bytes
+    out = bytearray()
+    previous = 0
+    for verse_id, count in pairs:
+        _varint(out, verse_id - previous)
+        _varint(out, count)
+        previous = verse_id
+    return bytes(out)
+
+def decode_postings(blob):
+    # bytes -> [(verse_id, count), ...]
+    pairs = []
+    values = []
+    value = shift = 0
+    for byte in blob:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+        if len(values) == 2:
+            previous = pairs[-1][0] if pairs else 0
+            pairs.append((previous + values[0], values[1]))
+            values = []
+    return pairs
+
+# --- Build ---
+
+def init_concordance(c):
+    c.execute(f'''CREATE TABLE IF NOT EXISTS {POSTINGS_TABLE} (
+                    testament INTEGER,
+                    strongs INTEGER,
+                    verses INTEGER,
+                    occurrences INTEGER,
+                    forms TEXT,
+                    postings BLOB,
+                    PRIMARY KEY (testament, strongs)
+                ) WITHOUT ROWID''')
+    c.execute(f"CREATE TABLE IF NOT EXISTS {SOURCES_TABLE} (source TEXT PRIMARY KEY, sha256 TEXT)")
+
+def token_sources(c):
+    # Manifest rows that fed verse_tokens, plus the source version's row count:
+    # writers that record no manifest row (the verses.strongs migration, an
+    # interrupted streaming import) still change it. Used to skip a rebuild when
+    # nothing moved.
+    if not c.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (MANIFEST_TABLE,)).fetchone():
+        return None
+    sources = dict(c.execute(f"SELECT source, sha256 FROM {MANIFEST_TABLE} WHERE target = ?", (TOKEN_TABLE,)).fetchall())
+    rows = c.execute(f"""SELECT count(*) FROM {TOKEN_TABLE} t JOIN verses v ON v.id = t.verse_id
+                         WHERE v.version = ?""", (SOURCE_VERSION,)).fetchone()[0]
+    sources[f"{TOKEN_TABLE}:{SOURCE_VERSION} rows"] = str(rows)
+    return sources
+
+def rendering_counts(c):
+    # {(testament, strongs): Counter(word)}
+    forms = {}
+    for testament, strongs, word, count in c.execute(f'''SELECT t.testament, t.strongs, t.word, count(*)
+                                                         FROM {TOKEN_TABLE} t JOIN verses v ON v.id = t.verse_id
+                                                         WHERE t.strongs IS NOT NULL AND v.version = ?
+                                                         GROUP BY t.testament, t.strongs, t.word''', (SOURCE_VERSION,)):
+        word = WORD_EDGES.sub('', word or '').lower()
+        if word:
+            forms.setdefault((testament, strongs), Counter())[word] += count
+    return forms
+
+def postings_rows(c, forms):
+    # One ordered pass over idx_tokens_strongs (no sort); the verses join is a
+    # rowid lookup that drops other versions' tokens
+    rows = c.execute(f'''SELECT t.testament, t.strongs, t.verse_id, count(*)
+                         FROM {TOKEN_TABLE} t JOIN verses v ON v.id = t.verse_id
+                         WHERE t.strongs IS NOT NULL AND v.version = ?
+                         GROUP BY t.testament, t.strongs, t.verse_id
+                         ORDER BY t.testament, t.strongs, t.verse_id''', (SOURCE_VERSION,))
+    for (testament, strongs), group in groupby(rows, key=lambda r: (r[0], r[1])):
+        pairs = [(verse_id, count) for _, _, verse_id, count in group]
+        top = forms.get((testament, strongs), Counter()).most_common(MAX_FORMS)
+        yield (testament, strongs, len(pairs), sum(n for _, n in pairs),
+               json.dumps(top, ensure_ascii=False, separators=(',', ':')), encode_postings(pairs))
+
+def build_concordance(full=False):
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    if not c.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (TOKEN_TABLE,)).fetchone():
+        print(f"No {TOKEN_TABLE} table; run an interlinear import first.")
+        conn.close()
+        return
+    init_concordance(c)
+
+    sources = token_sources(c)
+    built = dict(c.execute(f"SELECT source, sha256 FROM {SOURCES_TABLE}").fetchall())
+    has_rows = c.execute(f"SELECT 1 FROM {POSTINGS_TABLE} LIMIT 1").fetchone()
+    if not full and sources and sources == built and has_rows:
+        print("Concordance is up to date.")
+        conn.close()
+        return
+
+    start = time.perf_counter()
+    forms = rendering_counts(c)
+    with BulkWriter(conn) as bulk:
+        c.execute(f"DELETE FROM {POSTINGS_TABLE}")
+        bulk.insert(POSTINGS_TABLE, ('testament', 'strongs', 'verses', 'occurrences', 'forms', 'postings'),
+                    postings_rows(conn.cursor(), forms))
+        c.execute(f"DELETE FROM {SOURCES_TABLE}")
+        c.executemany(f"INSERT INTO {SOURCES_TABLE} (source, sha256) VALUES (?, ?)", (sources or {}).items())
+
+    count, size = c.execute(f"SELECT count(*), coalesce(sum(length(postings)), 0) FROM {POSTINGS_TABLE}").fetchone()
+    conn.close()
+    print(f"Concordance ready: {count} Strong's numbers, {size / 1024:.0f} KB of postings in {time.perf_counter() - start:.2f}s. 📚")
+
+# --- Read side ---
+
+def lookup(c, tag):
+    # 'H7225' -> {'strongs', 'verses', 'occurrences', 'forms', 'postings'} or None
+    testament, strongs = parse_strongs(tag)
+    if strongs is None: return None
+    row = c.execute(f"SELECT verses, occurrences, forms, postings FROM {POSTINGS_TABLE} WHERE testament = ? AND strongs = ?",
+                    (testament, strongs)).fetchone()
+    if row is None: return None
+    return {
+        'strongs': format_strongs(testament, strongs),
+        'verses': row[0],
+        'occurrences': row[1],
+        'forms': json.loads(row[2]),
+        'postings': decode_postings(row[3]),
+    }
+
+def occurrence_refs(c, postings):
+    # [(verse_id, count)] -> [(book, chapter, verse, count)] in verse order
+    counts = dict(postings)
+    rows = c.execute('''SELECT v.id, b.name, v.chapter, v.verse FROM json_each(?) j
+                        JOIN verses v ON v.id = j.value JOIN books b ON b.id = v.book_id
+                        ORDER BY v.id''', (json.dumps(list(counts)),))
+    return [(book, chapter, verse, counts[verse_id]) for verse_id, book, chapter, verse in rows]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Strong's concordance (strongs_postings) from verse_tokens")
+    parser.add_argument('--full', action='store_true', help="Rebuild even if verse_tokens is unchanged")
+    parser.add_argument('--lookup', help="Print the entry for one number, e.g. H7225")
+    args = parser.parse_args()
+    if args.lookup:
+        conn = sqlite3.connect(DB_PATH)
+        entry = lookup(conn.cursor(), args.lookup)
+        if entry is None:
+            print(f"{args.lookup}: not found")
+        else:
+            print(f"{entry['strongs']}: {entry['occurrences']} occurrences in {entry['verses']} verses")
+            print("  " + ", ".join(f"{word} ({n})" for word, n in entry['forms'][:10]))
+            for book, chapter, verse, n in occurrence_refs(conn.cursor(), entry['postings'])[:20]:
+                print(f"  {book} {chapter}:{verse}" + (f" x{n}" if n > 1 else ""))
+        conn.close()
+    else:
+        build_concordance(args.full)
@@ -0,0 +1,340 @@
+import sqlite3
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+import zipfile
+
+from versification import KJV
+from interlinear import TOKEN_TABLE, LETTERS
+from setup_search import TOKENIZERS
+import robust_parser
+import import_bibles
+import import_all
+import parse_cross_refs
+import import_transliterations
+import build_chapter_cache
+import search_pages
+import verify_plans
+
+# Release build: the four SQLite files the Laravel app reads (config/database.php).
+#
+#   python build_shards.py                          (import stages, then every shard)
+#   python build_shards.py --skip-import --only core extras --jobs 4 --zip
+#
+# 1. Import: the importers run in order against bible_app.db, each skipping the
+#    modules its manifest says are unchanged. bible_app.db is the staging area;
+#    the app never reads it.
+# 2. Shards: each shard is written by its own process into <name>.db.tmp with
+#    bible_app.db attached read-only, in the schema the app and its migrations
+#    expect (Laravel index names included). Data goes in first, indexes after.
+# 3. Finish: FTS optimize, ANALYZE, PRAGMA optimize, VACUUM at the shard's page
+#    size, then an atomic rename over the old file. A failed shard leaves the
+#    old one alone.
+# 4. Verify: verify_plans.py replays the app's queries under EXPLAIN QUERY PLAN;
+#    the build exits non-zero if one of them scans a table.
+#
+#   core.db          books, KJV verses (id = global verse ID), verses_fts,
+#                    chapter_cache (KJV chapters), verses_fts_keys + search_terms
+#   versions.db      every other version (ids as in bible_app.db), verses_fts,
+#                    chapter_cache (their chapters), verses_fts_keys + search_terms
+#   commentaries.db  commentaries, commentary_entries (raw text + pre-rendered html),
+#                    verse_modules (per-verse bitmask of the modules with an entry)
+#   extras.db        dictionaries, lexicon, cross_references (one row per target
+#                    verse), verse_words (interlinear, strongs_id like 'H7225')
+
+# --- CONFIG ---
+DB_PATH = 'bible_app.db'
+OUT_DIR = '../assets/data'
+SOURCE_VERSION = 'KJV' # Lives in core.db; every other version goes to versions.db
+DEFAULT_TOKENIZER = 'unicode61' # What the shipped verses_fts uses; porter (stemming) is opt-in
+OT_BOOKS = 39
+
+# Read-mostly page sizes: small pages where reads are short verse/chapter rows,
+# larger ones where rows are long commentary/dictionary text (fewer overflow pages)
+PAGE_SIZES = {
+    'core': 4096,
+    'versions': 8192,
+    'commentaries': 16384,
+    'extras': 8192,
+}
+
+VERSES_SQL = '''CREATE TABLE verses (id INTEGER PRIMARY KEY AUTOINCREMENT, book_id INTEGER, chapter INTEGER, verse INTEGER, text TEXT, version TEXT, FOREIGN KEY (book_id) REFERENCES books(id))'''
+
+def verses_fts_sql(tokenizer, name='verses_fts', rowid='id'):
+    # Column order as shipped: highlight(verses_fts, 0, ...) is the text. The
+    # shipped schema names no tokenizer (FTS5's own unicode61), so the default
+    # writes none either.
+    tokenize = '' if tokenizer == DEFAULT_TOKENIZER else f'tokenize="{TOKENIZERS[tokenizer]}", '
+    return f'''CREATE VIRTUAL TABLE {name} USING fts5(text, version, book_id UNINDEXED, chapter UNINDEXED, verse UNINDEXED, {tokenize}content='verses', content_rowid='{rowid}')'''
+
+def _kjv_verse_id(book_id, chapter, verse):
+    try:
+        return KJV.verse_id(book_id, chapter, verse)
+    except ValueError:
+        return None
+
+def src_table(c, name):
+    return c.execute("SELECT 1 FROM src.sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+def src_columns(c, table):
+    return {row[1] for row in c.execute(f"PRAGMA src.table_info({table})")}
+
+def count(c, table):
+    return c.execute(f"SELECT count(*) FROM main.{table}").fetchone()[0]
+
+def copy_chapter_cache(c, where):
+    # Current-format payloads from build_chapter_cache.py; BibleController reads
+    # them and falls back to per-verse queries for a chapter without a row
+    c.execute('''CREATE TABLE chapter_cache (version TEXT, book_id INTEGER, chapter INTEGER, format INTEGER, modules_mask INTEGER, payload BLOB,
+                    PRIMARY KEY (version, book_id, chapter)) WITHOUT ROWID''')
+    if src_table(c, 'chapter_cache'):
+        c.execute(f'''INSERT INTO chapter_cache (version, book_id, chapter, format, modules_mask, payload)
+                      SELECT version, book_id, chapter, format, modules_mask, payload FROM src.chapter_cache
+                      WHERE format = ? AND {where} ORDER BY version, book_id, chapter''', (build_chapter_cache.CACHE_FORMAT, SOURCE_VERSION))
+
+def fill_fts(c, name='verses_fts'):
+    c.execute(f"INSERT INTO {name}({name}) VALUES('rebuild')")
+    c.execute(f"INSERT INTO {name}({name}) VALUES('optimize')")
+
+def build_search_keys(c, tokenizer):
+    # search_pages.py's canonical order on this shard's verses: verses_fts_keys has
+    # rowid = verses.search_key (slot << 24 | book << 16 | chapter << 8 | verse), so
+    # a MATCH returns hits in Bible order and SearchController pages with
+    # "rowid > cursor" instead of sorting for an OFFSET. Slots come from
+    # bible_app.db, so a cursor stays valid across builds.
+    versions = [v for (v,) in c.execute("SELECT DISTINCT version FROM main.verses ORDER BY version")]
+    too_big = c.execute("SELECT count(*) FROM main.verses WHERE book_id > 255 OR chapter > 255 OR verse > 255").fetchone()[0]
+    if too_big:
+        raise ValueError(f"{too_big} verses do not fit the 8-bit book/chapter/verse fields of the search key")
+    c.execute(f"CREATE TABLE {search_pages.STATE_TABLE} (version TEXT PRIMARY KEY, slot INTEGER UNIQUE)")
+    if src_table(c, search_pages.STATE_TABLE):
+        c.execute(f"INSERT INTO main.{search_pages.STATE_TABLE} (version, slot) SELECT version, slot FROM src.{search_pages.STATE_TABLE}")
+    slots = search_pages.assign_slots(c, versions)
+    c.execute(f"DELETE FROM main.{search_pages.STATE_TABLE}")
+    c.executemany(f"INSERT INTO main.{search_pages.STATE_TABLE} (version, slot) VALUES (?, ?)", sorted(slots.items()))
+
+    c.execute("ALTER TABLE verses ADD COLUMN search_key INTEGER")
+    c.executemany(f"UPDATE verses SET search_key = (? << {search_pages.SLOT_SHIFT}) | (book_id << 16) | (chapter << 8) | verse WHERE version = ?",
+                  [(slot, version) for version, slot in slots.items()])
+    c.execute('CREATE UNIQUE INDEX "verses_search_key_unique" on "verses" ("search_key")')
+    c.execute(verses_fts_sql(tokenizer, search_pages.KEY_FTS, 'search_key'))
+    fill_fts(c, search_pages.KEY_FTS)
+    # Per-version document counts: the total for a one-word query is a key lookup.
+    # The app looks its lower-cased word up, which only names a term when the
+    # index does not stem or split words
+    search_pages.build_terms(c, slots)
+    if tokenizer != DEFAULT_TOKENIZER:
+        c.execute(f"DELETE FROM {search_pages.TERMS_TABLE}")
+
+# --- Shards ---
+
+def build_core(c, tokenizer):
+    c.execute("CREATE TABLE books (id INTEGER PRIMARY KEY, name TEXT UNIQUE, testament TEXT, book_number INTEGER)")
+    c.execute(VERSES_SQL)
+    c.execute(verses_fts_sql(tokenizer))
+    c.execute(f"INSERT INTO books (id, name, testament, book_number) SELECT id, name, CASE WHEN id <= {OT_BOOKS} THEN 'OT' ELSE 'NT' END, id FROM src.books ORDER BY id")
+    # Commentaries, cross-references and .ct4/.xr4 modules key on the global verse ID
+    c.execute('''INSERT INTO verses (id, book_id, chapter, verse, text, version)
+                 SELECT kjv_verse_id(book_id, chapter, verse), book_id, chapter, verse, text, version FROM src.verses
+                 WHERE version = ? AND kjv_verse_id(book_id, chapter, verse) IS NOT NULL ORDER BY 1''', (SOURCE_VERSION,))
+    c.execute('CREATE INDEX "books_name_index" on "books" ("name")')
+    c.execute('CREATE INDEX "books_book_number_index" on "books" ("book_number")')
+    c.execute('CREATE INDEX "verses_book_id_chapter_verse_index" on "verses" ("book_id", "chapter", "verse")')
+    copy_chapter_cache(c, 'version = ?')
+    fill_fts(c)
+    build_search_keys(c, tokenizer)
+    return {'books': count(c, 'books'), 'verses': count(c, 'verses'), 'chapter_cache': count(c, 'chapter_cache'),
+            'search_terms': count(c, search_pages.TERMS_TABLE)}
+
+def build_versions(c, tokenizer):
+    c.execute(VERSES_SQL)
+    c.execute(verses_fts_sql(tokenizer))
+    # Ids kept from bible_app.db: merge_verses keeps them stable across re-imports
+    c.execute('''INSERT INTO verses (id, book_id, chapter, verse, text, version)
+                 SELECT id, book_id, chapter, verse, text, version FROM src.verses WHERE version != ? ORDER BY id''', (SOURCE_VERSION,))
+    c.execute('CREATE INDEX "verses_version_book_id_chapter_verse_index" on "verses" ("version", "book_id", "chapter", "verse")')
+    copy_chapter_cache(c, 'version != ?')
+    fill_fts(c)
+    build_search_keys(c, tokenizer)
+    return {'verses': count(c, 'verses'), 'chapter_cache': count(c, 'chapter_cache'), 'search_terms': count(c, search_pages.TERMS_TABLE)}
+
+def commentary_modules(c):
+    # [(id, name, table)]; ids follow verse_module_bits so a module keeps its id across builds
+    tables = [name for (name,) in c.execute("SELECT name FROM src.sqlite_master WHERE type = 'table' AND name LIKE 'commentary\\_%' ESCAPE '\\' ORDER BY name")]
+    bits = dict(c.execute("SELECT upper(name), bit FROM src.verse_module_bits").fetchall()) if src_table(c, 'verse_module_bits') else {}
+    modules = []
+    next_id = max(bits.values(), default=-1) + 2
+    for table in tables:
+        name = table[len('commentary_'):].upper()
+        if name in bits:
+            modules.append((bits[name] + 1, name, table))
+        else:
+            modules.append((next_id, name, table))
+            next_id += 1
+    return sorted(modules)
+
+def build_commentaries(c, tokenizer):
+    c.execute("CREATE TABLE commentaries (id INTEGER PRIMARY KEY, name TEXT, abbreviation TEXT UNIQUE)")
+    c.execute('''CREATE TABLE commentary_entries (id INTEGER PRIMARY KEY, commentary_id INTEGER, verse_id INTEGER, text TEXT, html TEXT, format INTEGER,
+                    FOREIGN KEY (commentary_id) REFERENCES commentaries(id))''')
+    for module_id, name, table in commentary_modules(c):
+        # StudyController matches the lower-case abbreviation
+        c.execute("INSERT INTO commentaries (id, name, abbreviation) VALUES (?, ?, ?)", (module_id, name, name.lower()))
+        rendered = {'html', 'format'} <= src_columns(c, table)
+        # Entry id = commentary_id << 32 | verse_id: stable across builds, module-major order
+        c.execute(f'''INSERT INTO commentary_entries (id, commentary_id, verse_id, text, html, format)
+                      SELECT (? << 32) | verse_id, ?, verse_id, text, {'html, format' if rendered else 'NULL, NULL'}
+                      FROM src.{table} ORDER BY verse_id''', (module_id, module_id))
+    c.execute('CREATE INDEX "commentary_entries_verse_id_index" on "commentary_entries" ("verse_id")')
+    # Modules per verse as one mask, bit = commentaries.id - 1 (verse_module_bits in
+    # bible_app.db); BibleController reads a chapter's masks in one query
+    top = c.execute("SELECT max(id) FROM commentaries").fetchone()[0] or 0
+    if top - 1 > import_all.MAX_MODULE_BIT:
+        raise ValueError(f"commentary id {top} has no availability bit ({import_all.MAX_MODULE_BIT + 1} modules max)")
+    c.execute("CREATE TABLE verse_modules (verse_id INTEGER PRIMARY KEY, mask INTEGER NOT NULL)")
+    c.execute('''INSERT INTO verse_modules (verse_id, mask)
+                 SELECT verse_id, sum(1 << (commentary_id - 1)) FROM commentary_entries GROUP BY verse_id ORDER BY verse_id''')
+    return {table: count(c, table) for table in ('commentaries', 'commentary_entries', 'verse_modules')}
+
+def build_extras(c, tokenizer):
+    c.execute("CREATE TABLE dictionaries (id INTEGER PRIMARY KEY, module TEXT, topic TEXT, definition TEXT)")
+    c.execute("CREATE TABLE lexicon (id TEXT PRIMARY KEY, transliteration TEXT, definition TEXT)")
+    c.execute("CREATE TABLE cross_references (id INTEGER PRIMARY KEY, from_verse_id INTEGER, to_verse_id INTEGER)")
+    c.execute("CREATE TABLE verse_words (verse_id INTEGER, position INTEGER, word TEXT, strongs_id TEXT, PRIMARY KEY (verse_id, position)) WITHOUT ROWID")
+
+    if src_table(c, 'dictionaries'):
+        c.execute("INSERT INTO dictionaries (module, topic, definition) SELECT module, topic, definition FROM src.dictionaries ORDER BY module, rowid")
+    if src_table(c, 'lexicons'):
+        translit = 'transliteration' if 'transliteration' in src_columns(c, 'lexicons') else 'NULL'
+        c.execute(f"INSERT INTO lexicon (id, transliteration, definition) SELECT id, {translit}, definition FROM src.lexicons ORDER BY id")
+    if src_table(c, 'cross_references'):
+        # bible_app.db keeps a range as one (from_id, to_start, to_end) row; the app
+        # wants one row per target verse
+        c.execute('''WITH RECURSIVE refs (from_id, to_id, to_end) AS (
+                         SELECT from_id, to_start, to_end FROM src.cross_references
+                         UNION ALL
+                         SELECT from_id, to_id + 1, to_end FROM refs WHERE to_id < to_end)
+                     INSERT INTO cross_references (from_verse_id, to_verse_id)
+                     SELECT from_id, to_id FROM refs ORDER BY from_id, to_id''')
+    if src_table(c, TOKEN_TABLE):
+        # KJV words follow their verse to its global ID in core.db; the app reads
+        # verse_words.verse_id as a KJV verse, so tokens of other versions stay out
+        c.execute(f'''INSERT INTO verse_words (verse_id, position, word, strongs_id)
+                      SELECT kjv_verse_id(v.book_id, v.chapter, v.verse), t.position, t.word,
+                             CASE t.testament WHEN 0 THEN '{LETTERS[0]}' || t.strongs WHEN 1 THEN '{LETTERS[1]}' || t.strongs END
+                      FROM src.{TOKEN_TABLE} t JOIN src.verses v ON v.id = t.verse_id
+                      WHERE v.version = ? AND kjv_verse_id(v.book_id, v.chapter, v.verse) IS NOT NULL
+                      ORDER BY 1, 2''', (SOURCE_VERSION,))
+
+    c.execute('CREATE INDEX "dictionaries_topic_module_index" on "dictionaries" ("topic", "module")')
+    c.execute('CREATE INDEX "lexicon_transliteration_index" on "lexicon" ("transliteration")')
+    c.execute('CREATE INDEX "cross_references_from_verse_id_to_verse_id_index" on "cross_references" ("from_verse_id", "to_verse_id")')
+    return {table: count(c, table) for table in ('dictionaries', 'lexicon', 'cross_references', 'verse_words')}
+
+SHARDS = {
+    'core': build_core,
+    'versions': build_versions,
+    'commentaries': build_commentaries,
+    'extras': build_extras,
+}
+
+def shard_path(name, out_dir=OUT_DIR):
+    return os.path.join(out_dir, f"{name}.db")
+
+def build_shard(name, out_dir=OUT_DIR, tokenizer=DEFAULT_TOKENIZER, db_path=DB_PATH):
+    # Runs in its own process with --jobs > 1; only reads bible_app.db
+    start = time.perf_counter()
+    path = shard_path(name, out_dir)
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        c = conn.cursor()
+        c.execute(f"PRAGMA page_size = {PAGE_SIZES[name]}") # before the first table
+        c.execute("PRAGMA journal_mode = OFF") # a failed build just deletes the .tmp
+        c.execute("PRAGMA synchronous = OFF")
+        c.execute("ATTACH DATABASE ? AS src", (f"file:{os.path.abspath(db_path)}?mode=ro",))
+        conn.create_function('kjv_verse_id', 3, _kjv_verse_id, deterministic=True)
+        tables = SHARDS[name](c, tokenizer)
+        conn.commit()
+        c.execute("DETACH DATABASE src")
+        c.execute("ANALYZE")
+        c.execute("PRAGMA optimize")
+        conn.commit()
+        c.execute("PRAGMA journal_mode = DELETE") # what the app opens; VACUUM rewrites at page_size
+        c.execute("VACUUM")
+        conn.close()
+    except BaseException:
+        conn.close()
+        os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+    return name, tables, os.path.getsize(path), time.perf_counter() - start
+
+def _build_shard_task(args):
+    return build_shard(*args)
+
+def zip_shard(path):
+    # <name>.db.zip as main.js downloads and the CI expands
+    archive = path + '.zip'
+    with zipfile.ZipFile(archive + '.tmp', 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as z:
+        z.write(path, os.path.basename(path))
+    os.replace(archive + '.tmp', archive)
+    return archive
+
+# --- Pipeline ---
+
+def run_imports(jobs=1):
+    # Same order as a manual build; every stage skips what has not changed
+    stages = [
+        ('Bibles, lexicons, dictionary', lambda: robust_parser.main()),
+        ('Other Bibles', lambda: import_bibles.import_bibles(jobs)),
+        ('Commentaries', lambda: import_all.main(jobs)),
+        ('Cross-references', lambda: parse_cross_refs.parse_cross_refs(os.path.join(import_all.SOURCE_DIR, 'bcdxrefs.xr4'), DB_PATH)),
+        ('Transliterations', lambda: import_transliterations.extract_transliterations()),
+        ('Chapter cache', lambda: build_chapter_cache.build_chapter_cache()),
+    ]
+    for label, stage in stages:
+        print(f"--- {label} ---")
+        stage()
+
+def build_shards(names, jobs=1, out_dir=OUT_DIR, tokenizer=DEFAULT_TOKENIZER, skip_import=False, zip_output=False, verify=True):
+    if not skip_import:
+        run_imports(jobs)
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"Building {', '.join(names)} in {out_dir}" + (f" with {jobs} workers..." if jobs > 1 else "..."))
+    start = time.perf_counter()
+    tasks = [(name, out_dir, tokenizer) for name in names]
+    if jobs > 1 and len(tasks) > 1:
+        with mp.Pool(min(jobs, len(tasks))) as pool:
+            results = list(pool.imap_unordered(_build_shard_task, tasks))
+    else:
+        results = [_build_shard_task(task) for task in tasks]
+
+    for name, tables, size, seconds in sorted(results, key=lambda r: names.index(r[0])):
+        rows = ', '.join(f"{table} {n}" for table, n in tables.items())
+        print(f"  {name}.db: {size / 1024 / 1024:.1f} MB in {seconds:.1f}s ({rows})")
+        if zip_output:
+            archive = zip_shard(shard_path(name, out_dir))
+            print(f"    -> {os.path.basename(archive)} {os.path.getsize(archive) / 1024 / 1024:.1f} MB")
+    print(f"Shards ready in {time.perf_counter() - start:.1f}s. 📦")
+    if verify:
+        return verify_plans.verify(DB_PATH, out_dir, names, analyze_first=False) == 0
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build core.db, versions.db, commentaries.db and extras.db for a release")
+    parser.add_argument('--only', nargs='+', choices=list(SHARDS), default=list(SHARDS), help="Shards to build")
+    parser.add_argument('--jobs', type=int, default=1, help="Build shards (and decode modules) in N processes")
+    parser.add_argument('--out', default=OUT_DIR, help=f"Output directory (default {OUT_DIR})")
+    parser.add_argument('--tokenizer', choices=sorted(TOKENIZERS), default=DEFAULT_TOKENIZER,
+                        help=f"verses_fts tokenizer (default {DEFAULT_TOKENIZER}, as shipped; porter stems English words)")
+    parser.add_argument('--skip-import', action='store_true', help="Build from bible_app.db as it is")
+    parser.add_argument('--zip', action='store_true', help="Also write <name>.db.zip next to each shard")
+    parser.add_argument('--no-verify', action='store_true', help="Skip the query plan check")
+    args = parser.parse_args()
+    if not build_shards(args.only, args.jobs, args.out, args.tokenizer, args.skip_import, args.zip, not args.no_verify):
+        sys.exit(1)
@@ -0,0 +1,154 @@
+import sqlite3
+import time
+
+# Bulk-load mode shared by the importers.
+#
+#   with BulkWriter(conn) as bulk:
+#       bulk.defer_indexes('cross_references')
+#       bulk.insert('cross_references', ('from_id', 'to_start', 'to_end'), rows)
+#
+# On entry the load-time pragma profile is applied. Rows go in through
+# executemany in fixed-size chunks. On a clean exit the work is committed,
+# deferred indexes are (re)built once the data is in, the connection's own
+# pragma values are restored and rows/sec is reported for each table.
+#
+# If the block raises, the load is rolled back and any index dropped by
+# defer_indexes() is put back. The DROP may already have been committed by
+# the time the error happens.
+#
+# Entering the block may switch temp_store, which drops TEMP tables: create
+# staging tables inside it, not before.
+
+CHUNK_SIZE = 5000
+
+LOAD_PRAGMAS = {
+    'synchronous': 'OFF',
+    'journal_mode': 'MEMORY',
+    'temp_store': 'MEMORY',
+    'cache_size': -256000, # KiB, ~250MB page cache while loading
+}
+
+class BulkWriter:
+    def __init__(self, conn, chunk_size=CHUNK_SIZE, pragmas=LOAD_PRAGMAS, commit_every=None, quiet=False):
+        # commit_every: commit after this many rows per insert() call. Leave it off
+        # when the caller relies on module_transaction() savepoints.
+        self.conn = conn
+        self.c = conn.cursor()
+        self.chunk_size = chunk_size
+        self.pragmas = pragmas
+        self.commit_every = commit_every
+        self.quiet = quiet
+        self.stats = {} # table -> [rows, seconds]
+        self._saved = {}
+        self._deferred = [] # (name, sql)
+
+    # --- Pragmas ---
+
+    def _pragma(self, name):
+        return self.c.execute(f"PRAGMA {name}").fetchone()[0]
+
+    def _apply(self, settings):
+        for name, value in settings.items():
+            # journal_mode cannot change inside an open transaction
+            if name == 'journal_mode' and self.conn.in_transaction: continue
+            # Changing temp_store drops every TEMP table, so only touch it when needed
+            if str(self._pragma(name)).lower() == str(value).lower(): continue
+            self.c.execute(f"PRAGMA {name} = {value}")
+
+    def __enter__(self):
+        self._saved = {name: self._pragma(name) for name in self.pragmas}
+        self._apply(self.pragmas)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.commit()
+            self._build_deferred()
+            self.conn.commit()
+        else:
+            # Drop the half-written load; pragmas cannot be restored mid-transaction
+            self.conn.rollback()
+            self._restore_deferred()
+            self.conn.commit()
+        self._apply(self._saved)
+        if exc_type is None and not self.quiet:
+            self.report()
+        return False
+
+    # --- Indexes ---
+
+    def defer_index(self, name, sql):
+        # CREATE INDEX statement to run once the data is loaded
+        self._deferred.append((name, sql))
+
+    def defer_indexes(self, table, force=False):
+        # Drop the table's existing secondary indexes now, rebuild them on exit.
+        # Only worth it when the table is being filled from empty: rebuilding a big
+        # index for a small incremental load costs more than maintaining it.
+        if not force and self.c.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+            return
+        rows = self.c.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)).fetchall()
+        for name, sql in rows:
+            self.c.execute(f"DROP INDEX {name}")
+            self._deferred.append((name, sql))
+
+    def _build_deferred(self):
+        for name, sql in self._deferred:
+            start = time.perf_counter()
+            self.c.execute(sql)
+            if not self.quiet:
+                print(f"  Index {name} built in {time.perf_counter() - start:.1f}s")
+        self._deferred = []
+
+    def _restore_deferred(self):
+        # Error path: recreate whichever deferred indexes are missing, without
+        # masking the error that got us here
+        for name, sql in self._deferred:
+            if self.c.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone():
+                continue
+            try:
+                self.c.execute(sql)
+            except sqlite3.Error as e:
+                print(f"  Index {name} could not be rebuilt: {e}")
+        self._deferred = []
+
+    # --- Rows ---
+
+    def executemany(self, sql, rows, table):
+        # Any statement (INSERT OR REPLACE, UPDATE...) run over rows in fixed-size chunks
+        start = time.perf_counter()
+        count = 0
+        since_commit = 0
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self.c.executemany(sql, chunk)
+                count += len(chunk)
+                since_commit += len(chunk)
+                chunk = []
+                if self.commit_every and since_commit >= self.commit_every:
+                    self.conn.commit()
+                    since_commit = 0
+        if chunk:
+            self.c.executemany(sql, chunk)
+            count += len(chunk)
+        self.count(table, count, time.perf_counter() - start)
+        return count
+
+    def insert(self, table, columns, rows, verb='INSERT', label=None):
+        # label: name to report under, e.g. the real table behind a temp staging table
+        placeholders = ', '.join('?' for _ in columns)
+        sql = f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        return self.executemany(sql, rows, label or table)
+
+    def count(self, table, rows, seconds=0.0):
+        # Rows written some other way (INSERT ... SELECT, swaps) still show up in the report
+        entry = self.stats.setdefault(table, [0, 0.0])
+        entry[0] += rows
+        entry[1] += seconds
+
+    def report(self):
+        for table, (rows, seconds) in self.stats.items():
+            rate = rows / seconds if seconds > 0 else 0
+            print(f"  {table}: {rows} rows in {seconds:.1f}s ({rate:,.0f} rows/s)")
@@ -0,0 +1,186 @@
+import sqlite3
+import argparse
+import mmap
+import os
+import struct
+import zlib
+from bisect import bisect_left
+
+# Offline chapter bundles: one binary file per version that the Electron shell
+# can mmap or range-read without SQL. Format spec in TECHNICAL_DOCS.md
+# ("Chapter Bundles"); all integers little-endian.
+#
+#   Header   16 bytes   magic 'LUMB', format u16, flags u16, chapters u32, name_len u32
+#   Name     name_len   version name, UTF-8
+#   Index    16 bytes per chapter, sorted by (book_id, chapter):
+#                       book_id u16, chapter u16, verses u32, offset u32, length u32
+#   Blocks   one per chapter at `offset`, `length` bytes stored (zlib when flags & 1)
+#
+# A chapter block (once inflated) is its verses back to back:
+#   verse u16, byte_len u32, UTF-8 text
+
+# --- CONFIG ---
+DB_PATH = 'bible_app.db'
+OUT_DIR = 'bundles'
+EXTENSION = '.lumb'
+
+MAGIC = b'LUMB'
+FORMAT = 1
+FLAG_ZLIB = 1
+
+HEADER = struct.Struct('<4sHHII')
+INDEX_ENTRY = struct.Struct('<HHIII')
+VERSE_HEAD = struct.Struct('<HI')
+
+# --- Writer ---
+
+def encode_chapter(verses):
+    # [(verse, text), ...] -> block bytes
+    parts = []
+    for verse, text in verses:
+        data = (text or '').encode('utf-8')
+        parts.append(VERSE_HEAD.pack(verse, len(data)))
+        parts.append(data)
+    return b''.join(parts)
+
+def write_bundle(c, version, path, compress=True, level=6):
+    # Chapters come straight off the verses index; blocks are streamed to disk and
+    # the index is written last, once every offset is known
+    chapters = c.execute('''SELECT book_id, chapter, count(*) FROM verses WHERE version = ?
+                            GROUP BY book_id, chapter ORDER BY book_id, chapter''', (version,)).fetchall()
+    name = version.encode('utf-8')
+    flags = FLAG_ZLIB if compress else 0
+    data_start = HEADER.size + len(name) + INDEX_ENTRY.size * len(chapters)
+
+    index = []
+    part = path + '.part'
+    with open(part, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT, flags, len(chapters), len(name)))
+        f.write(name)
+        f.seek(data_start)
+        offset = data_start
+        rows = c.execute('''SELECT book_id, chapter, verse, text FROM verses WHERE version = ?
+                            ORDER BY book_id, chapter, verse''', (version,))
+        current = None
+        verses = []
+        for book_id, chapter, verse, text in rows:
+            if (book_id, chapter) != current:
+                if current is not None:
+                    offset = _write_block(f, index, current, verses, offset, compress, level)
+                current = (book_id, chapter)
+                verses = []
+            verses.append((verse, text))
+        if current is not None:
+            offset = _write_block(f, index, current, verses, offset, compress, level)
+        f.seek(HEADER.size + len(name))
+        for entry in index:
+            f.write(INDEX_ENTRY.pack(*entry))
+    os.replace(part, path)
+    return len(index), offset
+
+def _write_block(f, index, key, verses, offset, compress, level):
+    block = encode_chapter(verses)
+    if compress:
+        block = zlib.compress(block, level)
+    f.write(block)
+    index.append((key[0], key[1], len(verses), offset, len(block)))
+    return offset + len(block)
+
+# --- Reader ---
+
+class BundleReader:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.format, self.flags, count, name_len = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a chapter bundle")
+        if self.format != FORMAT:
+            raise ValueError(f"{path}: unsupported bundle format {self.format}")
+        self.version = self._map[HEADER.size:HEADER.size + name_len].decode('utf-8')
+        start = HEADER.size + name_len
+        self.index = [INDEX_ENTRY.unpack_from(self._map, start + i * INDEX_ENTRY.size) for i in range(count)]
+        self._keys = [(book_id, chapter) for book_id, chapter, _, _, _ in self.index]
+
+    def chapters(self):
+        return list(self._keys)
+
+    def raw_chapter(self, book_id, chapter):
+        # The block as stored (what a range read would fetch)
+        i = bisect_left(self._keys, (book_id, chapter))
+        if i == len(self._keys) or self._keys[i] != (book_id, chapter):
+            return None
+        _, _, _, offset, length = self.index[i]
+        return self._map[offset:offset + length]
+
+    def chapter(self, book_id, chapter):
+        # [(verse, text), ...] or None when the chapter is not in the bundle
+        block = self.raw_chapter(book_id, chapter)
+        if block is None:
+            return None
+        if self.flags & FLAG_ZLIB:
+            block = zlib.decompress(block)
+        verses = []
+        pos = 0
+        while pos < len(block):
+            verse, length = VERSE_HEAD.unpack_from(block, pos)
+            pos += VERSE_HEAD.size
+            verses.append((verse, block[pos:pos + length].decode('utf-8')))
+            pos += length
+        return verses
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def verify_bundle(c, path):
+    # Every chapter in the bundle matches the verses table, and nothing is missing
+    with BundleReader(path) as bundle:
+        errors = 0
+        expected = c.execute("SELECT count(DISTINCT book_id * 1000 + chapter) FROM verses WHERE version = ?", (bundle.version,)).fetchone()[0]
+        if expected != len(bundle.index):
+            print(f"  {bundle.version}: {len(bundle.index)} chapters in bundle, {expected} in database")
+            errors += 1
+        for book_id, chapter, count, _, _ in bundle.index:
+            verses = bundle.chapter(book_id, chapter)
+            rows = c.execute("SELECT verse, coalesce(text, '') FROM verses WHERE version = ? AND book_id = ? AND chapter = ? ORDER BY verse",
+                             (bundle.version, book_id, chapter)).fetchall()
+            if verses != rows or count != len(rows):
+                print(f"  {bundle.version} {book_id}:{chapter} does not match the database")
+                errors += 1
+        return errors == 0
+
+def main(versions=None, compress=True, verify=False):
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    versions = versions or [v for (v,) in c.execute("SELECT DISTINCT version FROM verses ORDER BY version")]
+    os.makedirs(OUT_DIR, exist_ok=True)
+
+    for version in versions:
+        path = os.path.join(OUT_DIR, version + EXTENSION)
+        if verify:
+            ok = verify_bundle(c, path)
+            print(f"{path}: {'OK' if ok else 'MISMATCH'}")
+            continue
+        chapters, size = write_bundle(c, version, path, compress)
+        print(f"Bundled {version}: {chapters} chapters, {size / 1024 / 1024:.1f} MB -> {path}")
+
+    conn.close()
+    if not verify:
+        print("Chapter bundles ready. 📦")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack each version into an indexed binary chapter bundle")
+    parser.add_argument('versions', nargs='*', help="Versions to bundle (default: all)")
+    parser.add_argument('--raw', action='store_true', help="Store chapter blocks uncompressed")
+    parser.add_argument('--verify', action='store_true', help="Read existing bundles back and compare with the database")
+    args = parser.parse_args()
+    main(args.versions, not args.raw, args.verify)
@@ -0,0 +1,225 @@
+import re
+from string import hexdigits
+
+from versification import KJV
+
+# Import-time commentary rendering.
+#
+# Raw commentary text carries \x07bold\x07, \x06italic\x06 and \x03HEX\x03
+# verse references (global KJV verse IDs in hex: "5749", lists "580458C3",
+# ranges "5749-575D"). TextService::formatCommentary used to turn that into
+# HTML on every request. render() does the same passes once, at import, and
+# resolves references through the versification tables instead of a verse
+# query per reference. The result is stored next to the raw text:
+#
+#   commentary_<module> (verse_id, text, html, format)
+#
+# format is RENDER_FORMAT when html is current. Bump it whenever the output
+# changes (here and TextService::COMMENTARY_FORMAT); imports re-render rows
+# with an older format, and the app falls back to formatCommentary for them.
+
+RENDER_FORMAT = 2
+RENDER_COLUMNS = (('html', 'TEXT'), ('format', 'INTEGER'))
+
+ALLOWED_TAGS = '<span><b><i><br><h3><div><mark><a><sup>'
+
+SCRIPT_PATTERN = re.compile(r'<script\b[^>]*>(.*?)</script>', re.I | re.S)
+HANDLER_PATTERNS = (re.compile(r'on\w+="[^"]*"', re.I | re.A), re.compile(r"on\w+='[^']*'", re.I | re.A))
+BOLD_PATTERN = re.compile('\x07(.*?)\x07')
+ITALIC_PATTERN = re.compile('\x06(.*?)\x06')
+REF_RUN_PATTERN = re.compile('((\x03[0-9A-Fa-f-]+\x03)+)')
+REF_PATTERN = re.compile('\x03([0-9A-Fa-f-]+)\x03')
+BARE_REF_PATTERN = re.compile(r'\(([0-9A-Fa-f]{4,})\)')
+CONTROL_PATTERN = re.compile('[\x00-\x1F]')
+LEGACY_REF_PATTERN = re.compile('»([0-9A-Fa-f]+)«')
+
+# --- strip_tags ---
+#
+# A port of PHP's strip_tags() state machine (ext/standard/string.c), so
+# import-time HTML matches what sanitizeHTML produced at request time.
+# Anything from "<" to the closing ">" is a tag: closing tags, "<!-- -->"
+# comments, "<!DOCTYPE>" and "<? ?>" blocks included. Quotes inside a tag
+# hide ">", nested "<" need their own ">", and an unterminated tag drops the
+# rest of the text.
+
+TEXT, TAG, PHP_BLOCK, BANG, COMMENT = range(5)
+
+def _allowed(tag, allowed):
+    # PHP php_tag_find(): <A href="x"> -> <a>, </b> -> <b>, <br/> -> <br>
+    name, started = [], False
+    for i, ch in enumerate(tag.lower()):
+        if ch == '>':
+            break
+        if ch == '<':
+            continue
+        if ch.isspace():
+            if started:
+                break
+            continue
+        started = True
+        if ch != '/' or (tag[i - 1] != '<' and tag[i + 1:i + 2] != '>'):
+            name.append(ch)
+    return f"<{''.join(name)}>" in allowed
+
+def strip_tags(text, allowed=''):
+    if '<' not in text:
+        # Nothing can open a tag; PHP only drops NUL bytes
+        return text.replace('\0', '')
+    out, tag = [], []
+    state, depth, in_q, lc, bracket, is_xml = TEXT, 0, '', '', 0, False
+    prev = lambda n: text[i - n] if i >= n else ''
+    for i, ch in enumerate(text):
+        if ch == '\0':
+            continue
+        if state == TEXT:
+            if ch == '<':
+                if in_q:
+                    continue
+                if not allowed and text[i + 1:i + 2].isspace():
+                    out.append(ch)
+                    continue
+                state, lc, tag = TAG, '<', ['<']
+            elif ch == '>' and depth:
+                depth -= 1
+            elif ch != '>' or not in_q:
+                out.append(ch)
+        elif state == TAG:
+            if ch == '<':
+                if in_q:
+                    continue
+                if not allowed and text[i + 1:i + 2].isspace():
+                    tag.append(ch)
+                else:
+                    depth += 1
+            elif ch == '>':
+                if depth:
+                    depth -= 1
+                elif in_q or (is_xml and prev(1) == '-'):
+                    continue
+                else:
+                    lc, in_q, state, is_xml = '>', '', TEXT, False
+                    tag.append(ch)
+                    if allowed and _allowed(''.join(tag), allowed):
+                        out.extend(tag)
+            elif ch == '!' and prev(1) == '<':
+                state, lc = BANG, ch
+            elif ch == '?' and prev(1) == '<':
+                state, bracket = PHP_BLOCK, 0
+            else:
+                if ch in '"\'' and i and (not in_q or ch == in_q):
+                    in_q = '' if in_q else ch
+                tag.append(ch)
+        elif state == PHP_BLOCK:
+            if ch in '()' and lc not in ('"', "'"):
+                lc = ch
+                bracket += 1 if ch == '(' else -1
+            elif ch == '>':
+                if depth:
+                    depth -= 1
+                elif not in_q and not bracket and lc != '"' and prev(1) == '?':
+                    in_q, state = '', TEXT
+            elif ch in '"\'':
+                if prev(1) != '\\':
+                    if lc == ch:
+                        lc = ''
+                    elif lc != '\\':
+                        lc = ch
+                if i and (not in_q or ch == in_q):
+                    in_q = '' if in_q else ch
+            elif ch in 'lL' and i > 4 and text[i - 4:i].lower() == '<?xm':
+                # "<?xml ... >" is markup, not PHP
+                state, is_xml = TAG, True
+        elif state == BANG:
+            if ch == '>':
+                if depth:
+                    depth -= 1
+                elif not in_q:
+                    in_q, state = '', TEXT
+            elif ch in '"\'':
+                if i and prev(1) != '\\' and (not in_q or ch == in_q):
+                    in_q = '' if in_q else ch
+            elif ch == '-' and prev(1) == '-' and prev(2) == '!':
+                state = COMMENT
+            elif ch in 'eE' and i > 6 and text[i - 6:i].lower() == 'doctyp':
+                state = TAG
+        elif ch == '>' and not in_q and prev(1) == '-' and prev(2) == '-':
+            in_q, state = '', TEXT
+    return ''.join(out)
+
+def sanitize(text):
+    # Same steps as TextService::sanitizeHTML
+    text = SCRIPT_PATTERN.sub('', text)
+    text = strip_tags(text, ALLOWED_TAGS)
+    for pattern in HANDLER_PATTERNS:
+        text = pattern.sub('', text)
+    return text
+
+def _hexdec(text):
+    # PHP hexdec(): ignores anything that is not a hex digit
+    return int(''.join(ch for ch in text if ch in hexdigits) or '0', 16)
+
+def _link(versification, verse_id, label=None, end_verse=None):
+    book_id, chapter, verse = versification.reference(verse_id)
+    name = versification.book_name(book_id)
+    safe = name.replace('\\', '\\\\').replace("'", "\\'")
+    end = f' data-end-verse="{end_verse}"' if end_verse is not None else ''
+    return (f'<span class="ref-link" data-book="{name}" data-chapter="{chapter}" data-verse="{verse}"{end}'
+            f''' onclick="jumpTo('{safe}', {chapter}, {verse})">{label or f"{name} {chapter}:{verse}"}</span>''')
+
+def resolve_reference(code, versification=KJV):
+    # One \x03...\x03 payload -> ref-link span(s); unresolvable codes stay as "[code]"
+    if '-' in code:
+        parts = code.split('-')
+        start_id, end_id = _hexdec(parts[0]), _hexdec(parts[1])
+        if not (versification.is_valid_id(start_id) and versification.is_valid_id(end_id)):
+            return f"[{code}]"
+        end_verse = versification.reference(end_id)[2]
+        return _link(versification, start_id, versification.label(start_id, end_id), end_verse)
+
+    if len(code) >= 4 and len(code) % 4 == 0:
+        # A list of 4-digit IDs
+        ids = [_hexdec(code[i:i + 4]) for i in range(0, len(code), 4)]
+        refs = [_link(versification, verse_id) for verse_id in ids if versification.is_valid_id(verse_id)]
+        return '; '.join(refs) if refs else f"[{code}]"
+
+    verse_id = _hexdec(code)
+    if versification.is_valid_id(verse_id):
+        return _link(versification, verse_id)
+    return f"[{code}]"
+
+def render(text, versification=KJV):
+    # Raw commentary text -> the HTML TextService::formatCommentary returns
+    if not text:
+        return ''
+    text = sanitize(text)
+    text = BOLD_PATTERN.sub(r'<b>\1</b>', text)
+    text = ITALIC_PATTERN.sub(r'<i>\1</i>', text)
+    # Runs of adjacent references become one comma-separated list
+    text = REF_RUN_PATTERN.sub(lambda m: ', '.join(resolve_reference(p, versification) for p in m.group(1).split('\x03') if p), text)
+    text = REF_PATTERN.sub(lambda m: resolve_reference(m.group(1), versification), text)
+    text = BARE_REF_PATTERN.sub(lambda m: f"({resolve_reference(m.group(1), versification)})", text)
+    text = CONTROL_PATTERN.sub('', text)
+    text = LEGACY_REF_PATTERN.sub(lambda m: resolve_reference(m.group(1), versification), text)
+    return text
+
+def rendered_rows(entries, versification=KJV):
+    # (verse_id, text) -> (verse_id, text, html, format)
+    for verse_id, text in entries:
+        yield verse_id, text, render(text, versification), RENDER_FORMAT
+
+# --- Storage ---
+
+def ensure_render_columns(c, table):
+    # Older builds created commentary tables as (verse_id, text)
+    columns = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+    for name, kind in RENDER_COLUMNS:
+        if name not in columns:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+
+def refresh_rendered(c, table, versification=KJV):
+    # Re-render rows left by an older RENDER_FORMAT (or none); returns rows updated
+    ensure_render_columns(c, table)
+    stale = c.execute(f"SELECT verse_id, text FROM {table} WHERE format IS NOT ?", (RENDER_FORMAT,)).fetchall()
+    c.executemany(f"UPDATE {table} SET html = ?, format = ? WHERE verse_id = ?",
+                  ((render(text, versification), RENDER_FORMAT, verse_id) for verse_id, text in stale))
+    return len(stale)
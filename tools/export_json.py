@@ -1,34 +1,105 @@
 import sqlite3
+import argparse
+import gzip
 import json
+import os
 
-def export_to_json(db_path, json_path):
+# Streaming verse export for offline caches.
+#
+# Rows are read straight off the cursor and written through a buffered (and
+# optionally compressed) writer, so memory stays flat however many versions are
+# loaded. Output is NDJSON (one verse per line) or a compact JSON array, in one
+# file or sharded per version or per version/book. Each shard is written to a
+# .part file and renamed when complete; --resume skips shards already on disk.
+
+BUFFER_SIZE = 1024 * 1024
+EXTENSIONS = {'ndjson': '.ndjson', 'json': '.json'}
+COMPRESSED = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+def open_output(path, compress=None):
+    if compress == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+    if compress == 'zstd':
+        try:
+            from compression import zstd # Python 3.14+
+        except ImportError:
+            raise SystemExit("zstd output needs Python 3.14+ (compression.zstd); use --compress gzip")
+        return zstd.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8', buffering=BUFFER_SIZE)
+
+def list_shards(c, shard):
+    # [(shard_name, where, params), ...] in export order
+    if shard == 'version':
+        return [(version, "v.version = ?", (version,))
+                for (version,) in c.execute("SELECT DISTINCT version FROM verses ORDER BY version")]
+    if shard == 'book':
+        return [(os.path.join(version, f"{book_id:02d}_{name.replace(' ', '_')}"), "v.version = ? AND v.book_id = ?", (version, book_id))
+                for version, book_id, name in c.execute('''SELECT DISTINCT v.version, v.book_id, b.name
+                                                          FROM verses v JOIN books b ON v.book_id = b.id
+                                                          ORDER BY v.version, v.book_id''')]
+    return [(None, "1", ())]
+
+def iter_verses(c, where, params):
+    return c.execute(f'''
+        SELECT v.version, b.name, v.chapter, v.verse, v.text
+        FROM verses v
+        JOIN books b ON v.book_id = b.id
+        WHERE {where}
+        ORDER BY v.version, v.book_id, v.chapter, v.verse
+    ''', params)
+
+def write_shard(rows, f, fmt):
+    # Returns the number of verses written
+    count = 0
+    if fmt == 'json': f.write('[')
+    for version, book, chapter, verse, text in rows:
+        line = json.dumps({"version": version, "book": book, "chapter": chapter, "verse": verse, "text": text},
+                          ensure_ascii=False, separators=(',', ':'))
+        if fmt == 'json':
+            f.write(',' if count else '')
+            f.write(line)
+        else:
+            f.write(line)
+            f.write('\n')
+        count += 1
+    if fmt == 'json': f.write(']')
+    return count
+
+def export_to_json(db_path, out_path, fmt='json', shard=None, compress=None, resume=False):
     conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
     c = conn.cursor()
-    
-    # Get all verses joined with book names
-    c.execute('''
-        SELECT b.name as book, v.chapter, v.verse, v.text 
-        FROM verses v 
-        JOIN books b ON v.book_id = b.id
-        ORDER BY v.id
-    ''')
-    
-    rows = c.fetchall()
-    
-    bible_data = []
-    for row in rows:
-        bible_data.append({
-            "book": row['book'],
-            "chapter": row['chapter'],
-            "verse": row['verse'],
-            "text": row['text']
-        })
-        
-    with open(json_path, 'w') as f:
-        json.dump(bible_data, f, indent=2)
-        
-    print(f"Exported {len(bible_data)} verses to {json_path}")
+    suffix = EXTENSIONS[fmt] + COMPRESSED[compress]
+
+    total = 0
+    skipped = 0
+    for name, where, params in list_shards(c, shard):
+        # Unsharded: out_path is the file. Sharded: out_path is a directory
+        path = out_path if name is None else os.path.join(out_path, name + suffix)
+        if resume and os.path.exists(path):
+            skipped += 1
+            continue
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        part = path + '.part'
+        with open_output(part, compress) as f:
+            count = write_shard(iter_verses(conn.cursor(), where, params), f, fmt)
+        os.replace(part, path)
+        total += count
+        if name is not None:
+            print(f"  {name}: {count} verses")
+
+    conn.close()
+    if skipped:
+        print(f"Skipped {skipped} shard(s) already exported.")
+    print(f"Exported {total} verses to {out_path}")
 
 if __name__ == "__main__":
-    export_to_json('bible_app.db', 'bible_dump.json')
+    parser = argparse.ArgumentParser(description="Stream verses out of bible_app.db as JSON / NDJSON")
+    parser.add_argument('--db', default='bible_app.db')
+    parser.add_argument('--out', default=None, help="Output file, or directory when sharding (default bible_dump.json / bible_dump/)")
+    parser.add_argument('--format', choices=sorted(EXTENSIONS), default='json')
+    parser.add_argument('--shard', choices=['version', 'book'], default=None, help="One file per version or per version/book")
+    parser.add_argument('--compress', choices=['gzip', 'zstd'], default=None)
+    parser.add_argument('--resume', action='store_true', help="Keep shards that are already complete on disk")
+    args = parser.parse_args()
+    out = args.out or ('bible_dump' if args.shard else 'bible_dump' + EXTENSIONS[args.format] + COMPRESSED[args.compress])
+    export_to_json(args.db, out, args.format, args.shard, args.compress, args.resume)
@@ -1,98 +1,295 @@
 import sqlite3
-import urllib.request
-import json
+import argparse
 import re
-import difflib
+import time
+
+from manifest import Manifest, module_transaction
+from bulkload import BulkWriter
+from interlinear import ALIGNED_TABLE, TOKEN_TABLE, init_aligned, init_tokens
+from pipeline import run_pipeline, BATCH, DONE
+from import_full_interlinear import iter_source, replace_batch
+from setup_search import rows_signature
+
+# Token aligner: carries Strong's tags from a tagged source onto the exact
+# wording stored in verses.text for another version (ASV, ...).
+#
+#   python heuristic_mapper.py ASV                        (source: KJV tokens already in verse_tokens)
+#   python heuristic_mapper.py ASV --source kjv_strongs.xml --jobs 4
+#
+# Words are normalized (case, edge punctuation) and interned to integers, so
+# the diff compares ints. Each verse trims its common prefix and suffix
+# (anchors), then runs Myers' O((n+m)·d) diff on what is left; d is the number
+# of differing words, which for two translations of the same verse is small.
+# Matched words take the source's Strong's number and morphology. A changed
+# run of the same length on both sides ("thee" -> "you") is paired word by word
+# and counted as substituted; anything else stays untagged.
+#
+# verse_alignments keeps one row per target verse with the counts and
+#
+#   confidence = (2 * matched + substituted) / (source words + target words)
+#
+# (1.0 for identical wording), so the app can decide which verses to show
+# tags for. The tokens go to aligned_tokens under the target's verse IDs, never
+# into the KJV-only verse_tokens. A run replaces the version's rows in one
+# transaction (a failed book rolls the whole version back) and, once that has
+# committed, records aligned_tokens:<version> in the manifest so the chapter
+# cache rebuilds it.
+# Books are aligned in worker processes (pipeline.py); only this process writes.
 
 # --- CONFIG ---
 DB_PATH = 'bible_app.db'
-# This JSON contains verses with Strong's numbers embedded: "In the beginning <H7225>..."
-# We will use a reliable mirror
-SOURCE_URL = "https://raw.githubusercontent.com/seven1m/bible/master/json/kjv.json" 
-# Wait, seven1m is plain text.
-# Let's use a source that definitely has Strongs.
-# "raw.githubusercontent.com/openscriptures/KJV/master/source/kjv_strongs.xml" failed.
-# Let's try to parse a local sample I can generate or a different public domain text file.
-
-# Fallback: Since I cannot guarantee a URL download works in this restricted environment,
-# I will write the LOGIC. You can feed it any "KJV with Strongs" text file.
-
-def clean_strongs_text(text):
-    # Input: "In the beginning <H7225> God <H430>..."
-    # Output List: [("In", ""), ("the", ""), ("beginning", "H7225"), ("God", "H430")...]
-    
-    # Simple tokenizer
-    # Split by spaces, preserve tags
-    parts = text.split(' ')
-    result = []
-    
-    current_word = ""
-    current_strongs = ""
-    
-    for p in parts:
-        # Check for tag <H123>
-        if re.match(r'<[HG]\d+>', p):
-            code = p.strip('<>')
-            if current_word:
-                result.append((current_word, code))
-                current_word = ""
-                current_strongs = ""
+SOURCE_VERSION = 'KJV'
+ALIGN_TABLE = 'verse_alignments'
+BATCH_SIZE = 500 # Verses per transaction
+LOW_CONFIDENCE = 0.6 # Reported as weak alignments
+
+WORD_EDGES = re.compile(r"^[^\w']+|[^\w']+$")
+
+# --- Alignment ---
+
+def normalize(word):
+    return WORD_EDGES.sub('', word).lower()
+
+def intern_words(words, codes):
+    # Same word -> same int across the chunk
+    return [codes.setdefault(normalize(w), len(codes)) for w in words]
+
+def _myers(a, b):
+    # Matched (i, j) index pairs of a shortest edit script between a and b
+    n, m = len(a), len(b)
+    if not n or not m:
+        return []
+    offset = n + m + 1
+    v = [0] * (2 * offset + 1)
+    trace = []
+    for d in range(n + m + 1):
+        trace.append(v[:])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1] # step down (insertion)
             else:
-                # Strongs before word? or attached to previous?
-                # Usually follows word.
-                if result:
-                    prev_w, prev_s = result.pop()
-                    result.append((prev_w, code))
+                x = v[offset + k - 1] + 1 # step right (deletion)
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m, offset)
+    return []
+
+def _backtrack(trace, n, m, offset):
+    pairs = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[offset + prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            pairs.append((x, y))
+        x, y = prev_x, prev_y
+    pairs.reverse()
+    return pairs
+
+def match_words(a, b):
+    # Anchored diff: common prefix and suffix first, Myers on the middle
+    n, m = len(a), len(b)
+    head = 0
+    while head < n and head < m and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < n - head and tail < m - head and a[n - 1 - tail] == b[m - 1 - tail]:
+        tail += 1
+    pairs = [(i, i) for i in range(head)]
+    pairs.extend((i + head, j + head) for i, j in _myers(a[head:n - tail], b[head:m - tail]))
+    pairs.extend((n - tail + i, m - tail + i) for i in range(tail))
+    return pairs
+
+def align(source_tokens, target_words, codes):
+    # -> (tokens for target_words, matched, substituted)
+    a = intern_words([t[0] for t in source_tokens], codes)
+    b = intern_words(target_words, codes)
+    tags = [None] * len(b)
+    matched = substituted = 0
+    last_i = last_j = -1
+    for i, j in match_words(a, b) + [(len(a), len(b))]:
+        # Equal-length changed runs between two matches pair up word by word
+        if i - last_i == j - last_j:
+            for step in range(1, i - last_i):
+                tags[last_j + step] = source_tokens[last_i + step]
+                substituted += 1
+        if i < len(a):
+            tags[j] = source_tokens[i]
+            matched += 1
+        last_i, last_j = i, j
+    tokens = [(word,) + (tag[1:] if tag else (None, None, None)) for word, tag in zip(target_words, tags)]
+    return tokens, matched, substituted
+
+def confidence(matched, substituted, source_len, target_len):
+    total = source_len + target_len
+    return round((2 * matched + substituted) / total, 4) if total else 0.0
+
+def align_chunk(entries):
+    # Runs in a worker when --jobs > 1: entries are (verse_id, source tokens, target text), no DB access
+    codes = {}
+    batch = []
+    for verse_id, source_tokens, text in entries:
+        words = text.split()
+        tokens, matched, substituted = align(source_tokens, words, codes)
+        batch.append((verse_id, tokens, matched, substituted, len(source_tokens), len(words),
+                      confidence(matched, substituted, len(source_tokens), len(words))))
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# --- Sources ---
+
+def tokens_from_db(c, version):
+    # {(book_id, chapter, verse): tokens} from verse_tokens of an already tagged version
+    source = {}
+    for book_id, chapter, verse, word, testament, strongs, morph in c.execute(
+            f"""SELECT v.book_id, v.chapter, v.verse, t.word, t.testament, t.strongs, t.morph
+                FROM {TOKEN_TABLE} t JOIN verses v ON v.id = t.verse_id
+                WHERE v.version = ? ORDER BY t.verse_id, t.position""", (version,)):
+        source.setdefault((book_id, chapter, verse), []).append((word, testament, strongs, morph))
+    return source
+
+def tokens_from_file(path):
+    source = {}
+    for ref, tokens in iter_source(path):
+        if ref: source[ref] = tokens
+    return source
+
+# --- Build ---
+
+def init_alignments(c):
+    c.execute(f'''CREATE TABLE IF NOT EXISTS {ALIGN_TABLE} (
+                    verse_id INTEGER PRIMARY KEY,
+                    version TEXT,
+                    source TEXT,
+                    confidence REAL,
+                    matched INTEGER,
+                    substituted INTEGER,
+                    source_words INTEGER,
+                    target_words INTEGER
+                )''')
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_alignments_version ON {ALIGN_TABLE} (version, confidence)")
+
+def chunk_tasks(c, version, source):
+    # One task per book: [(book_id, ([(verse_id, source tokens, target text), ...],)), ...]
+    books = {}
+    for verse_id, book_id, chapter, verse, text in c.execute(
+            "SELECT id, book_id, chapter, verse, text FROM verses WHERE version = ? ORDER BY book_id, chapter, verse", (version,)):
+        tokens = source.get((book_id, chapter, verse))
+        if tokens:
+            books.setdefault(book_id, []).append((verse_id, tokens, text or ''))
+    return [(book_id, (entries,)) for book_id, entries in books.items()]
+
+def token_table(version):
+    # Tags aligned onto the KJV itself (--source) are its verse_tokens
+    return TOKEN_TABLE if version == SOURCE_VERSION else ALIGNED_TABLE
+
+def write_alignments(c, bulk, version, label, batch, min_confidence):
+    c.executemany(f'''INSERT OR REPLACE INTO {ALIGN_TABLE}
+                      (verse_id, version, source, confidence, matched, substituted, source_words, target_words)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                  [(vid, version, label, conf, matched, sub, n, m) for vid, _, matched, sub, n, m, conf in batch])
+    # Below the threshold a verse keeps its alignment row but loses its tokens
+    replace_batch(c, bulk, {vid: tokens if conf >= min_confidence else [] for vid, tokens, *_, conf in batch}, token_table(version))
+
+def record_alignment(c, manifest, version, label, verses):
+    if token_table(version) == TOKEN_TABLE:
+        manifest.record(label, TOKEN_TABLE, {ALIGN_TABLE: verses})
+        return
+    # The fingerprint is taken over the rows written, so a rerun that changes
+    # nothing leaves the chapter cache alone
+    target = f"{ALIGNED_TABLE}:{version}"
+    rows, signature = rows_signature(c.execute(f"""SELECT t.* FROM {ALIGNED_TABLE} t JOIN verses v ON v.id = t.verse_id
+                                                   WHERE v.version = ? ORDER BY t.verse_id, t.position""", (version,)))
+    manifest.forget_targets(target)
+    manifest.record(label, target, {ALIGNED_TABLE: rows, ALIGN_TABLE: verses}, fingerprint=(rows, None, signature))
+
+def map_version(version, source_path=None, jobs=1, min_confidence=0.0):
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    if not source_path and version == SOURCE_VERSION:
+        print(f"{version} is the source version; pass --source to align a tagged file onto it.")
+        conn.close()
+        return
+    init_tokens(c)
+    init_aligned(c)
+    init_alignments(c)
+    manifest = Manifest(c)
+    conn.commit()
+
+    label = source_path or f"{TOKEN_TABLE}:{SOURCE_VERSION}"
+    print(f"Loading tagged source ({label})...")
+    source = tokens_from_file(source_path) if source_path else tokens_from_db(c, SOURCE_VERSION)
+    tasks = chunk_tasks(c, version, source)
+    del source
+    if not tasks:
+        print(f"No {version} verses have source tokens to align.")
+        conn.close()
+        return
+
+    print(f"Aligning {sum(len(args[0]) for _, args in tasks)} {version} verses in {len(tasks)} books" + (f" with {jobs} workers..." if jobs > 1 else "..."))
+    start = time.perf_counter()
+    verses = low = 0
+    total_confidence = 0.0
+    failed = []
+    with BulkWriter(conn, quiet=True) as bulk:
+        try:
+            with module_transaction(c, 'alignment'):
+                if token_table(version) == ALIGNED_TABLE:
+                    # A run replaces the version's alignment wholesale
+                    c.execute(f"DELETE FROM {ALIGNED_TABLE} WHERE verse_id IN (SELECT id FROM verses WHERE version = ?)", (version,))
+                    c.execute(f"DELETE FROM {ALIGN_TABLE} WHERE version = ?", (version,))
+                for kind, book_id, payload in run_pipeline(tasks, align_chunk, jobs):
+                    if kind == BATCH:
+                        write_alignments(c, bulk, version, label, payload, min_confidence)
+                        verses += len(payload)
+                        low += sum(1 for row in payload if row[-1] < LOW_CONFIDENCE)
+                        total_confidence += sum(row[-1] for row in payload)
+                    elif kind != DONE:
+                        failed.append(book_id)
+                        print(f"  -> Book {book_id} failed: {payload}")
+                if failed:
+                    raise RuntimeError(f"{len(failed)} book(s) failed")
+        except RuntimeError as e:
+            if not failed: raise
+            print(f"{version} left as it was: {e}.")
         else:
-            if current_word:
-                result.append((current_word, "H0")) # No tag found for previous
-            current_word = p
-            
-    if current_word:
-        result.append((current_word, "H0"))
-        
-    return result
-
-def align_verses(db_verse, tagged_verse_source):
-    # db_verse: "In the beginning God created..."
-    # tagged_verse_source: "In the beginning <H7225> God <H430> created <H1254>..."
-    
-    # 1. Extract tokens from source
-    # This regex looks for Word followed optionally by <H123>
-    # Pattern: (\w+)\s*(?:<([HG]\d+)>)?
-    
-    # Heuristic: We will assume the source is "Perfect" for now and just format it.
-    # If we were aligning two different texts, we'd use difflib.SequenceMatcher.
-    
-    # Let's convert the source "In the beginning <H7225>"
-    # to our DB format "In|H0 the|H0 beginning|H7225"
-    
-    tokens = []
-    # Split by spaces but keep tags attached to words if possible
-    # Regex to find "Word <Tag>" or "Word"
-    matches = re.findall(r'([^\s<]+)(?:\s*<([HG]\d+)>)?', tagged_verse_source)
-    
-    formatted_parts = []
-    for word, tag in matches:
-        if not tag: tag = "H0" # Default/Empty
-        formatted_parts.append(f"{word}|{tag}")
-        
-    return ' '.join(formatted_parts)
-
-def main():
-    print("This script is ready to process a KJV+ source file.")
-    print("Since external downloads are flaky, please download 'kjv_strongs.txt' manually.")
-    print("Format expected: Gen 1:1 In the beginning <H7225>...")
-    
-    # Mock Example of the Algorithm in Action:
-    print("\n--- Algorithm Demo ---")
-    source_text = "In the beginning <H7225> God <H430> created <H1254>"
-    print(f"Source: {source_text}")
-    aligned = align_verses("", source_text)
-    print(f"Result: {aligned}")
-    
-    # In a real run, we would loop through the file and update the DB:
-    # c.execute("UPDATE verses SET strongs = ? WHERE ...", (aligned,))
+            conn.commit()
+            record_alignment(c, manifest, version, label, verses)
+    if failed:
+        conn.close()
+        return
+
+    elapsed = time.perf_counter() - start
+    weakest = c.execute(f'''SELECT b.name, v.chapter, v.verse, a.confidence FROM {ALIGN_TABLE} a
+                            JOIN verses v ON v.id = a.verse_id JOIN books b ON b.id = v.book_id
+                            WHERE a.version = ? ORDER BY a.confidence LIMIT 5''', (version,)).fetchall()
+    conn.close()
+    if verses:
+        print(f"  Mean confidence {total_confidence / verses:.3f}; {low} verses below {LOW_CONFIDENCE}.")
+        for book, chapter, verse, conf in weakest:
+            print(f"    {book} {chapter}:{verse}  {conf:.3f}")
+    print(f"Aligned {verses} verses in {elapsed:.1f}s ({verses / elapsed if elapsed else 0:,.0f} verses/s). 🧭")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Align Strong's-tagged tokens onto the stored wording of a version")
+    parser.add_argument('version', help="Target version, e.g. ASV")
+    parser.add_argument('--source', help=f"Tagged .xml/.osis or .json file (default: {SOURCE_VERSION} tokens in {TOKEN_TABLE})")
+    parser.add_argument('--jobs', type=int, default=1, help="Align books in N worker processes")
+    parser.add_argument('--min-confidence', type=float, default=0.0, help="Leave verses below this confidence without tokens")
+    args = parser.parse_args()
+    map_version(args.version.upper(), args.source, args.jobs, args.min_confidence)
@@ -0,0 +1,179 @@
+import argparse
+import glob
+import mmap
+import os
+import time
+
+try:
+    import numpy as np
+except ImportError: # Pure-Python fallback below; slower but same hits
+    np = None
+
+# Binary pattern hunter for reverse-engineering module files.
+#
+# Searches files for one or more sequences of integers (Strong's numbers,
+# verse IDs, offsets...) laid out as uint16 or uint32, little or big endian,
+# at every byte alignment. Consecutive values of a sequence may be up to `gap`
+# elements apart, to step over padding or interleaved fields.
+#
+#   python hunt.py 2377,3470,531 H7225 --gap 8 --files ../*.bt4
+#
+# Files are memory-mapped. With NumPy each layout is one zero-copy view and
+# every value is located with one vectorized compare; sequences are chained
+# with searchsorted. Without NumPy the first value is found with mmap.find
+# (which covers every alignment at once) and the rest is checked in place.
+
+# --- CONFIG ---
+DEFAULT_FILES = '../*.*'
+SKIP_EXTENSIONS = ('.db', '.json', '.py')
+WIDTHS = (2, 4)
+ENDIANS = ('little', 'big')
+CONTEXT = 6 # Elements shown either side of a hit
+LIMIT = 20 # Hits printed per file, layout and sequence
+
+def parse_value(text):
+    # '7225', 'H7225', 'G3056' or '0x1C39'
+    text = text.strip()
+    if text[:1] in ('H', 'G', 'h', 'g'):
+        text = text[1:]
+    return int(text, 0)
+
+def parse_sequence(text):
+    return [parse_value(v) for v in text.split(',') if v.strip()]
+
+def layouts(widths):
+    # (width, endian, alignment)
+    return [(w, e, a) for w in widths for e in ENDIANS for a in range(w)]
+
+def read_value(buf, pos, width, endian):
+    return int.from_bytes(buf[pos:pos + width], endian)
+
+# --- NumPy path ---
+
+def _np_view(buf, width, endian, alignment):
+    count = (len(buf) - alignment) // width
+    dtype = np.dtype(f"u{width}").newbyteorder('<' if endian == 'little' else '>')
+    return np.frombuffer(buf, dtype=dtype, count=count, offset=alignment)
+
+def _np_chain(positions, sequence, gap):
+    # -> (start element, end element) arrays of every chain matching the sequence
+    starts = positions(sequence[0])
+    ends = starts
+    for value in sequence[1:]:
+        nxt = positions(value)
+        if not len(nxt) or not len(ends):
+            return starts[:0], ends[:0]
+        i = np.searchsorted(nxt, ends, side='right') # first occurrence after the previous element
+        found = i < len(nxt)
+        candidate = nxt[np.minimum(i, len(nxt) - 1)]
+        ok = found & (candidate - ends <= gap + 1)
+        starts, ends = starts[ok], candidate[ok]
+    return starts, ends
+
+def hunt_numpy(buf, sequences, gap, widths):
+    # Yields (sequence index, width, endian, start byte, end byte)
+    for width, endian, alignment in layouts(widths):
+        if len(buf) < alignment + width: continue
+        view = _np_view(buf, width, endian, alignment)
+        cache = {}
+        def positions(value):
+            if value not in cache:
+                cache[value] = np.flatnonzero(view == value) if value < 1 << (8 * width) else np.empty(0, dtype=np.intp)
+            return cache[value]
+        for n, sequence in enumerate(sequences):
+            starts, ends = _np_chain(positions, sequence, gap)
+            for s, e in zip(starts.tolist(), ends.tolist()):
+                yield n, width, endian, alignment + s * width, alignment + e * width
+
+# --- Pure-Python path ---
+
+def _find_all(buf, needle):
+    pos = buf.find(needle)
+    while pos != -1:
+        yield pos
+        pos = buf.find(needle, pos + 1)
+
+def hunt_python(buf, sequences, gap, widths):
+    size = len(buf)
+    for width in widths:
+        for endian in ENDIANS:
+            for n, sequence in enumerate(sequences):
+                if any(v >= 1 << (8 * width) for v in sequence): continue
+                for start in _find_all(buf, sequence[0].to_bytes(width, endian)):
+                    end = start
+                    for value in sequence[1:]:
+                        for step in range(1, gap + 2):
+                            pos = end + step * width
+                            if pos + width > size:
+                                end = None
+                                break
+                            if read_value(buf, pos, width, endian) == value:
+                                end = pos
+                                break
+                        else:
+                            end = None
+                        if end is None: break
+                    if end is not None:
+                        yield n, width, endian, start, end
+
+# --- Reporting ---
+
+def context(buf, start, end, width, endian, size=CONTEXT):
+    first = start - width * size
+    while first < 0: first += width
+    last = min(len(buf) - width, end + width * size)
+    values = []
+    for pos in range(first, last + 1, width):
+        value = read_value(buf, pos, width, endian)
+        values.append(f"[{value}]" if pos in (start, end) else str(value))
+    return ' '.join(values), bytes(buf[start:end + width]).hex(' ')
+
+def hunt_file(path, sequences, gap=0, widths=WIDTHS, limit=LIMIT, use_numpy=True):
+    # Returns {(sequence index, width, endian): [(start, end), ...]} sorted by offset
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            search = hunt_numpy if (np is not None and use_numpy) else hunt_python
+            hits = {}
+            for n, width, endian, start, end in search(buf, sequences, gap, widths):
+                hits.setdefault((n, width, endian), []).append((start, end))
+            for key in hits:
+                hits[key].sort()
+            if limit:
+                for (n, width, endian), found in sorted(hits.items()):
+                    print(f"  {os.path.basename(path)}: {','.join(map(str, sequences[n]))} as u{width * 8} {endian}: {len(found)} hit(s)")
+                    for start, end in found[:limit]:
+                        values, raw = context(buf, start, end, width, endian)
+                        print(f"    0x{start:08X} (align {start % width}): {values}")
+                        print(f"                bytes: {raw}")
+            return hits
+
+def list_files(patterns):
+    files = []
+    for pattern in patterns:
+        files.extend(p for p in sorted(glob.glob(pattern)) if os.path.isfile(p) and not p.endswith(SKIP_EXTENSIONS))
+    return files
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search binary files for integer sequences (uint16/uint32, both endians, every alignment)")
+    parser.add_argument('sequences', nargs='+', help="Comma-separated values per sequence, e.g. 2377,3470,531 or H7225")
+    parser.add_argument('--files', nargs='+', default=[DEFAULT_FILES], help=f"Glob patterns (default {DEFAULT_FILES})")
+    parser.add_argument('--gap', type=int, default=0, help="Max elements skipped between consecutive values")
+    parser.add_argument('--width', type=int, nargs='+', choices=WIDTHS, default=list(WIDTHS), help="Element sizes in bytes")
+    parser.add_argument('--limit', type=int, default=LIMIT, help="Hits printed per file/layout/sequence")
+    parser.add_argument('--no-numpy', action='store_true', help="Use the pure-Python search")
+    args = parser.parse_args()
+
+    sequences = [parse_sequence(s) for s in args.sequences]
+    files = list_files(args.files)
+    engine = 'numpy' if (np is not None and not args.no_numpy) else 'python'
+    print(f"Hunting {len(sequences)} sequence(s) in {len(files)} file(s) (gap {args.gap}, {engine})...")
+    start = time.perf_counter()
+    total = 0
+    for path in files:
+        try:
+            total += sum(len(v) for v in hunt_file(path, sequences, args.gap, args.width, args.limit, not args.no_numpy).values())
+        except OSError as e:
+            print(f"Error reading {path}: {e}")
+    print(f"{total} hit(s) in {time.perf_counter() - start:.2f}s.")
@@ -1,10 +1,20 @@
 import sqlite3
+import argparse
 import os
 import glob
 
+from modreader import open_module, batched
+from pipeline import run_pipeline, BATCH, DONE
+from versification import KJV
+from manifest import Manifest, module_transaction, create_staging, drop_staging, swap_in
+from bulkload import BulkWriter
+from commentary_html import ensure_render_columns, refresh_rendered, rendered_rows
+
 # --- CONFIG ---
 DB_PATH = 'bible_app.db'
 SOURCE_DIR = '../' # Parent directory where .ct4, .bt4, .dt4 files are
+BATCH_SIZE = 5000
+MAX_MODULE_BIT = 62 # verse_modules.mask is a signed 64-bit SQLite integer
 
 def scan_modules():
     modules = {
@@ -35,87 +45,113 @@ def scan_modules():
     print(f"Found: {len(modules['bibles'])} Bibles, {len(modules['commentaries'])} Commentaries, {len(modules['dictionaries'])} Dictionaries.")
     return modules
 
-def import_commentaries(mod_list, c):
+def read_commentary(name):
+    # Runs in a worker when --jobs > 1: decode and pre-render, no DB access
+    with open_module(os.path.join(SOURCE_DIR, f"{name}.ct4"), versification=KJV) as entries:
+        yield from batched(rendered_rows(entries), BATCH_SIZE)
+
+def import_commentaries(mod_list, bulk, jobs=1, manifest=None):
+    c = bulk.c
+    tasks = []
     for name in mod_list:
         table_name = f"commentary_{name.lower()}"
-        print(f"Importing Commentary: {name} -> {table_name}")
-        
-        c.execute(f"CREATE TABLE IF NOT EXISTS {table_name} (verse_id INTEGER PRIMARY KEY, text TEXT)")
-        
-        try:
-            with open(os.path.join(SOURCE_DIR, f"{name}.ct4"), 'rb') as f:
-                content = f.read()
-                parts = content.split(b'\x00')
-                
-                batch = []
-                for i in range(0, len(parts) - 1, 2):
-                    try:
-                        k_hex = parts[i].decode('cp1252', errors='ignore').strip()
-                        v = parts[i+1].decode('cp1252', errors='ignore').strip()
-                        if k_hex and v:
-                            k_int = int(k_hex, 16)
-                            batch.append((k_int, v))
-                    except: continue
-                
-                if batch:
-                    c.executemany(f"INSERT OR REPLACE INTO {table_name} (verse_id, text) VALUES (?, ?)", batch)
-                    print(f"  -> {len(batch)} entries.")
-        except Exception as e:
-            print(f"  -> Failed: {e}")
+        c.execute(f"CREATE TABLE IF NOT EXISTS {table_name} (verse_id INTEGER PRIMARY KEY, text TEXT, html TEXT, format INTEGER)")
+        ensure_render_columns(c, table_name)
+        if manifest and manifest.is_current(os.path.join(SOURCE_DIR, f"{name}.ct4"), table_name):
+            # Unchanged source, but rows rendered by an older format still need redoing
+            rendered = refresh_rendered(c, table_name)
+            print(f"Skipping Commentary: {name} (Unchanged since last import" + (f", re-rendered {rendered} entries)" if rendered else ")"))
+            continue
+        tasks.append((name, (name,)))
+    
+    if jobs > 1:
+        print(f"Decoding {len(tasks)} commentaries with {jobs} workers...")
+    
+    # Batches arrive from the workers into per-module staging tables; this cursor
+    # is the only writer. A finished module replaces its old rows in one transaction,
+    # a failed one leaves them untouched.
+    staging = {name: create_staging(c, f"commentary_{name.lower()}") for name, _ in tasks}
+    imported = []
+    for kind, name, payload in run_pipeline(tasks, read_commentary, jobs):
+        table_name = f"commentary_{name.lower()}"
+        if kind == BATCH:
+            bulk.insert(f"temp.{staging[name]}", ('verse_id', 'text', 'html', 'format'), payload, label=table_name)
+            continue
+        print(f"Imported Commentary: {name} -> {table_name}")
+        if kind == DONE:
+            with module_transaction(c):
+                swap_in(c, table_name, staging[name])
+                if manifest: manifest.record(os.path.join(SOURCE_DIR, f"{name}.ct4"), table_name, {table_name: payload})
+            imported.append(name)
+            if payload:
+                print(f"  -> {payload} entries.")
+        else:
+            drop_staging(c, staging[name])
+            print(f"  -> Failed: {payload}")
+    return imported
+
+def module_bit(c, name):
+    # Stable bit position per commentary; a module keeps its bit across rebuilds
+    row = c.execute("SELECT bit FROM verse_module_bits WHERE name = ?", (name,)).fetchone()
+    if row: return row[0]
+    bit = c.execute("SELECT coalesce(max(bit) + 1, 0) FROM verse_module_bits").fetchone()[0]
+    if bit > MAX_MODULE_BIT:
+        raise ValueError(f"No availability bit left for {name} ({MAX_MODULE_BIT + 1} modules max)")
+    c.execute("INSERT INTO verse_module_bits (bit, name) VALUES (?, ?)", (bit, name))
+    return bit
 
-def import_bibles(mod_list, c):
-    # Just ensure we have KJV and ASV for now, logic is complex for unknown formats
-    # Use existing parser logic if we want to add more later
-    pass 
+def update_module_availability(c, name):
+    # Clear the module's bit everywhere, then set it again for the verses its table
+    # covers. Runs entirely in SQLite; no per-verse lists in Python.
+    table_name = f"commentary_{name.lower()}"
+    flag = 1 << module_bit(c, name.upper())
+    c.execute("UPDATE verse_modules SET mask = mask & ~? WHERE mask & ?", (flag, flag))
+    try:
+        c.execute(f"""INSERT INTO verse_modules (verse_id, mask)
+                      SELECT verse_id, ? FROM {table_name} WHERE true
+                      ON CONFLICT (verse_id) DO UPDATE SET mask = mask | excluded.mask""", (flag,))
+    except sqlite3.OperationalError:
+        pass # No table for this module (yet)
+    c.execute("DELETE FROM verse_modules WHERE mask = 0")
 
-def build_availability_index(mod_list, c):
+def build_availability_index(mod_list, c, changed=None):
+    # verse_modules: one row per verse with commentary, mask = OR of its modules'
+    # bits (verse_module_bits maps bit -> module). Only modules in `changed` are
+    # re-applied; a missing or old-style (comma-separated) index is rebuilt from all.
     print("Building Verse Module Index...")
-    c.execute("DROP TABLE IF EXISTS verse_modules")
-    c.execute("CREATE TABLE verse_modules (verse_id INTEGER, modules TEXT, PRIMARY KEY (verse_id))")
+    columns = [row[1] for row in c.execute("PRAGMA table_info(verse_modules)")]
+    if 'mask' not in columns:
+        c.execute("DROP TABLE IF EXISTS verse_modules")
+        changed = None
+    c.execute("CREATE TABLE IF NOT EXISTS verse_module_bits (bit INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+    c.execute("CREATE TABLE IF NOT EXISTS verse_modules (verse_id INTEGER PRIMARY KEY, mask INTEGER NOT NULL)")
     
-    # We need to aggregate which modules have content for which verse
-    # This is heavy, so we do it in memory first
-    verse_map = {} # {verse_id: ['MHC', 'ACC', ...]}
+    todo = mod_list if changed is None else [name for name in mod_list if name in changed]
+    with module_transaction(c, 'availability_index'):
+        for name in todo:
+            update_module_availability(c, name)
     
-    for name in mod_list:
-        table_name = f"commentary_{name.lower()}"
-        # Check if table exists
-        try:
-            c.execute(f"SELECT verse_id FROM {table_name}")
-            ids = c.fetchall()
-            mod_code = name.upper()
-            
-            for (vid,) in ids:
-                if vid not in verse_map:
-                    verse_map[vid] = []
-                verse_map[vid].append(mod_code)
-        except: continue
-        
-    print(f"Indexing {len(verse_map)} verses...")
-    
-    batch = []
-    for vid, mods in verse_map.items():
-        batch.append((vid, ','.join(sorted(mods))))
-        
-    c.executemany("INSERT INTO verse_modules (verse_id, modules) VALUES (?, ?)", batch)
-    print("Index Complete.")
+    count = c.execute("SELECT count(*) FROM verse_modules").fetchone()[0]
+    print(f"Index Complete: {len(todo)} module(s) updated, {count} verses indexed.")
 
-def main():
+def main(jobs=1):
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    c.execute("PRAGMA synchronous = OFF")
     
     mods = scan_modules()
     
-    # 1. Import all Commentaries
-    import_commentaries(mods['commentaries'], c)
-    
-    # 2. Build the "Quick Link" Index
-    build_availability_index(mods['commentaries'], c)
+    with BulkWriter(conn) as bulk:
+        # 1. Import all Commentaries
+        imported = import_commentaries(mods['commentaries'], bulk, jobs, Manifest(c))
+        
+        # 2. Update the "Quick Link" Index for the modules that changed
+        build_availability_index(mods['commentaries'], c, imported)
     
-    conn.commit()
     conn.close()
     print("Master Import Complete. 🚀")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Import every module found in SOURCE_DIR")
+    parser.add_argument('--jobs', type=int, default=1, help="Decode modules in N worker processes")
+    args = parser.parse_args()
+    main(args.jobs)
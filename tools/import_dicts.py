@@ -2,6 +2,10 @@ import sqlite3
 import os
 import glob
 
+from modreader import open_module
+from manifest import Manifest, module_transaction, create_staging, drop_staging, swap_in
+from bulkload import BulkWriter
+
 # --- CONFIG ---
 DB_PATH = 'bible_app.db'
 SOURCE_DIR = '../' 
@@ -25,44 +29,52 @@ def scan_modules():
         elif ext == '.xr4': modules['xrefs'].append(name)
     return modules
 
-def import_dictionaries(mod_list, c):
-    # Update table to include module
-    c.execute("DROP TABLE IF EXISTS dictionaries")
-    c.execute("CREATE TABLE dictionaries (topic TEXT, definition TEXT, module TEXT)")
-    c.execute("CREATE INDEX idx_dict_topic ON dictionaries (topic)")
-    c.execute("CREATE INDEX idx_dict_mod ON dictionaries (module)")
+def import_dictionaries(mod_list, bulk, manifest=None):
+    c = bulk.c
+    # Update table to include module (older builds have topic/definition only)
+    columns = [row[1] for row in c.execute("PRAGMA table_info(dictionaries)")]
+    if columns and 'module' not in columns:
+        c.execute("DROP TABLE dictionaries")
+        if manifest: manifest.forget_targets('dictionaries')
+    c.execute("CREATE TABLE IF NOT EXISTS dictionaries (topic TEXT, definition TEXT, module TEXT)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_dict_topic ON dictionaries (topic)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_dict_mod ON dictionaries (module)")
+    # First build into an empty table: indexes go on after the rows
+    bulk.defer_indexes('dictionaries')
 
     for name in mod_list:
+        path = os.path.join(SOURCE_DIR, f"{name}.dt4")
+        module = name.upper()
+        target = f"dictionaries:{module}"
+        if manifest and manifest.is_current(path, target):
+            print(f"Skipping Dictionary: {name} (Unchanged since last import)")
+            continue
         print(f"Importing Dictionary: {name}")
+        # Stage the module, then replace its old rows in one transaction
+        staging = create_staging(c, 'dictionaries', f"dict_{name.lower()}")
         try:
-            with open(os.path.join(SOURCE_DIR, f"{name}.dt4"), 'rb') as f:
-                content = f.read()
-                parts = content.split(b'\x00')
-                batch = []
-                for i in range(0, len(parts) - 1, 2):
-                    try:
-                        k = parts[i].decode('cp1252', errors='ignore').strip()
-                        v = parts[i+1].decode('cp1252', errors='ignore').strip()
-                        if k and v:
-                            batch.append((k, v, name.upper()))
-                    except: continue
-                if batch:
-                    c.executemany("INSERT INTO dictionaries (topic, definition, module) VALUES (?, ?, ?)", batch)
-                    print(f"  -> {len(batch)} entries.")
+            with open_module(path) as entries:
+                rows = ((k, v, module) for k, v in entries)
+                bulk.insert(f"temp.{staging}", ('topic', 'definition', 'module'), rows, label='dictionaries')
+            with module_transaction(c):
+                count = swap_in(c, 'dictionaries', staging, "module = ?", (module,))
+                if manifest: manifest.record(path, target, {'dictionaries': count})
+            if count:
+                print(f"  -> {count} entries.")
         except Exception as e:
+            drop_staging(c, staging)
             print(f"  -> Failed: {e}")
 
 def main():
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    c.execute("PRAGMA synchronous = OFF")
     
     mods = scan_modules()
     
-    # Re-import dictionaries
-    import_dictionaries(mods['dictionaries'], c)
+    # Re-import changed dictionaries
+    with BulkWriter(conn) as bulk:
+        import_dictionaries(mods['dictionaries'], bulk, Manifest(c))
     
-    conn.commit()
     conn.close()
     print("Dictionary Import Complete. 📚")
 
@@ -1,57 +1,268 @@
 import sqlite3
-import urllib.request
+import argparse
 import json
-import gzip
-import io
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+
+from manifest import Manifest
+from bulkload import BulkWriter
+from interlinear import TOKEN_TABLE, attach_punctuation, init_tokens, parse_strongs, token, token_rows, tokens_from_tagged, verse_ids
+from versification import KJV, parse_osis_ref
+
+# Streaming full-Bible interlinear import from a local KJV+ file.
+#
+#   python import_full_interlinear.py kjv_strongs.xml     (OSIS)
+#   python import_full_interlinear.py kjv_strongs.json    ({"verses": [{book, chapter, verse, text}, ...]})
+#
+# Neither format is loaded whole. OSIS goes through iterparse: each element is
+# cleared and detached from its parent once its text and tail have been read,
+# so the tree never grows past the current verse. JSON is decoded one verse
+# object at a time from a sliding buffer. Verses are mapped onto KJV verse IDs
+# and written in batches, each batch one transaction that replaces those
+# verses' tokens, so memory stays flat and an interrupted run keeps what it
+# committed (rerun to finish; the manifest is only recorded at the end).
 
 # --- CONFIG ---
 DB_PATH = 'bible_app.db'
-# We use a compressed source to save bandwidth/time
-KJV_JSON_URL = "https://raw.githubusercontent.com/seven1m/bible/master/json/kjv.json" 
-# Actually, that source doesn't have Strongs numbers.
-# We need a source with Strongs.
-# Alternative: OpenScriptures Hebrew Bible (OSHB) or similar.
-# For simplicity and reliability in this CLI context, I will use a known mapping algorithm or fetch a specific KJV+ file.
-
-# Let's use a heuristic mapping based on my "Synthetic" strategy earlier, 
-# but applied to the whole Bible.
-# Since I cannot easily download a massive 10MB+ file without potential timeout here,
-# I will simulate the "Full Import" by extending the logic to Genesis 1 fully.
-# To truly do the WHOLE Bible, the user should run a script that downloads the KJV+ XML.
-
-# I will write a script that attempts to fetch a KJV+ JSON if available, 
-# otherwise it generates placeholders so the feature is "Active" but waits for data.
-
-def import_full_interlinear():
-    print("Fetching KJV+ Data (This might take a moment)...")
-    # Using a reliable public domain source for KJV with Strongs
-    url = "https://raw.githubusercontent.com/openscriptures/KJV/master/source/kjv_strongs.xml" 
-    # That is XML and huge.
-    
-    # Let's use a lightweight JSON if possible.
-    # If not, I will update the database to support the feature and leave a note.
-    
-    print("NOTE: To import the full 5MB KJV+ dataset, please download 'kjv_strongs.json' and place it in this folder.")
-    print("I will proceed with mapping Genesis Chapter 1 fully as a proof of concept.")
-    
+BATCH_SIZE = 500 # Verses per transaction
+READ_SIZE = 1024 * 1024 # JSON characters read at a time
+PROGRESS_EVERY = 2000 # Verses between progress lines
+
+SKIP_TAGS = {'note'} # OSIS elements whose text is not verse text
+TOKEN_COLUMNS = ('verse_id', 'position', 'word', 'testament', 'strongs', 'morph')
+
+# --- JSON ---
+
+JSON_SPACE = re.compile(r'[\s,]*')
+JSON_ARRAY = re.compile(r'\s*\[')
+
+def iter_json_records(f, key='verses', read_size=READ_SIZE):
+    # Objects of the top-level array, or of the array under `key`, one at a time
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(read_size)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    # Find the opening bracket: the document is the array itself, or the array
+    # is the value of `key`. Never just the first '[' in the buffer.
+    fill()
+    while not buf.strip() and not eof:
+        fill()
+    m = JSON_ARRAY.match(buf)
+    keyed = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+    while not m:
+        m = keyed.search(buf)
+        if m: break
+        if eof:
+            raise ValueError(f"No '{key}' array found")
+        fill()
+    pos = m.end()
+
+    while True:
+        pos = JSON_SPACE.match(buf, pos).end()
+        if pos >= len(buf):
+            if eof: raise ValueError("JSON ended inside the array")
+            fill()
+            continue
+        if buf[pos] == ']':
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof: raise
+            fill()
+            continue
+        if end == len(buf) and not eof:
+            # Could be cut at the buffer edge; decode again with more input
+            fill()
+            continue
+        yield obj
+        pos = end
+        if pos > read_size:
+            buf, pos = buf[pos:], 0
+
+def json_ref(record):
+    # (book_id, chapter, verse) of a record, or None when it has no usable reference
+    if not isinstance(record, dict):
+        return None
+    book = record.get('book')
+    if isinstance(book, str):
+        book = KJV.book_id(book)
+    try:
+        return (book, int(record['chapter']), int(record['verse'])) if book else None
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def iter_json_verses(path):
+    # ((book_id, chapter, verse), tokens); malformed records are skipped and counted
+    skipped = 0
+    first_skipped = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for index, record in enumerate(iter_json_records(f)):
+            ref = json_ref(record)
+            if ref is None:
+                skipped += 1
+                if first_skipped is None: first_skipped = index
+                continue
+            yield ref, tokens_from_tagged(record.get('text', ''))
+    if skipped:
+        print(f"  Skipped {skipped} records without a usable book/chapter/verse (first at index {first_skipped}).")
+
+# --- OSIS ---
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def _strongs(elem):
+    # lemma="strong:H0853 strong:H07225" -> first real number, e.g. 'H07225'
+    for part in (elem.get('lemma') or '').split():
+        value = part.split(':', 1)[-1]
+        if parse_strongs(value)[1] is not None:
+            return value
+    return None
+
+def _morph(elem):
+    # morph="strongMorph:TH8804" -> 'H8804'; "robinson:V-AAI-3S" -> 'V-AAI-3S'
+    parts = (elem.get('morph') or '').split()
+    if not parts: return None
+    prefix, _, value = parts[0].rpartition(':')
+    if prefix == 'strongMorph' and value[:2] in ('TH', 'TG'):
+        value = value[1:]
+    return value or None
+
+def iter_osis_verses(path):
+    # ((book_id, chapter, verse), tokens) for container <verse osisID> and
+    # milestone <verse sID/> ... <verse eID/> markup alike
+    current = None # ref of the verse being read
+    tokens = []
+    stack = []
+    skip = 0
+    in_word = 0
+    last = None # (event, elem) whose text (after start) or tail (after end) is pending
+
+    def words(text):
+        if current and not skip and not in_word:
+            for w in (text or '').split():
+                # Tail punctuation ("</w>.") stays with its word
+                if not attach_punctuation(tokens, w):
+                    tokens.append(token(w))
+
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        # The parser has now seen everything up to this event, so the previous
+        # element's text/tail is complete
+        if last is not None:
+            prev_event, prev = last
+            if prev_event == 'start':
+                if _local(prev.tag) != 'w': words(prev.text)
+            else:
+                words(prev.tail)
+                if not in_word: # a <w> still needs its children for itertext()
+                    prev.clear()
+                    if stack and len(stack[-1]) and stack[-1][-1] is prev:
+                        del stack[-1][-1]
+        tag = _local(elem.tag)
+        if event == 'start':
+            stack.append(elem)
+            if tag == 'verse':
+                if elem.get('eID'):
+                    if current: yield current, tokens
+                    current, tokens = None, []
+                elif elem.get('osisID') or elem.get('sID'):
+                    if current: yield current, tokens
+                    current, tokens = parse_osis_ref((elem.get('osisID') or elem.get('sID')).split()[0]), []
+            elif tag in SKIP_TAGS:
+                skip += 1
+            elif tag == 'w':
+                in_word += 1
+        else:
+            stack.pop()
+            if tag == 'verse' and not (elem.get('sID') or elem.get('eID')):
+                if current: yield current, tokens
+                current, tokens = None, []
+            elif tag in SKIP_TAGS:
+                skip -= 1
+            elif tag == 'w':
+                in_word -= 1
+                if current and not skip and not in_word:
+                    word = ' '.join(''.join(elem.itertext()).split())
+                    tokens.append(token(word or '[?]', _strongs(elem), _morph(elem)))
+        last = (event, elem)
+    if current: yield current, tokens
+
+# --- Import ---
+
+def iter_source(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.xml', '.osis'):
+        return iter_osis_verses(path)
+    if ext == '.json':
+        return iter_json_verses(path)
+    raise ValueError(f"Unsupported interlinear source: {path} (expected .xml/.osis or .json)")
+
+def replace_batch(c, bulk, batch, table=TOKEN_TABLE):
+    # batch: {verse_id: tokens}; replaces those verses' tokens, commits nothing
+    c.executemany(f"DELETE FROM {table} WHERE verse_id = ?", ((vid,) for vid in batch))
+    bulk.insert(table, TOKEN_COLUMNS, (row for vid, tokens in batch.items() for row in token_rows(vid, tokens)))
+
+def write_batch(c, bulk, batch):
+    # One transaction per batch, so an interrupted run keeps what it wrote
+    replace_batch(c, bulk, batch)
+    bulk.conn.commit()
+
+def import_stream(path, batch_size=BATCH_SIZE, force=False):
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    
-    # Genesis 1 full mapping (Sample)
-    gen_1_map = {
-        1: "In|H0 the|H0 beginning|H7225 God|H430 created|H1254 the|H853 heaven|H8064 and|H853 the|H0 earth|H776",
-        2: "And|H0 the|H0 earth|H776 was|H1961 without form|H8414 and|H0 void|H922 and|H0 darkness|H2822 was|H0 upon|H5921 the|H0 face|H6440 of|H0 the|H0 deep|H8415",
-        3: "And|H0 God|H430 said|H559 Let|H0 there|H0 be|H1961 light|H216 and|H0 there|H0 was|H1961 light|H216",
-        4: "And|H0 God|H430 saw|H7200 the|H853 light|H216 that|H3588 it|H0 was|H0 good|H2896 and|H0 God|H430 divided|H914 the|H0 light|H216 from|H996 the|H0 darkness|H2822",
-        5: "And|H0 God|H430 called|H7121 the|H0 light|H216 Day|H3117 and|H0 the|H0 darkness|H2822 he|H0 called|H7121 Night|H3915 And|H0 the|H0 evening|H6153 and|H0 the|H0 morning|H1242 were|H1961 the|H0 first|H259 day|H3117"
-    }
-    
-    for verse, strongs in gen_1_map.items():
-        c.execute("UPDATE verses SET strongs = ? WHERE book_id=1 AND chapter=1 AND verse=? AND version='KJV'", (strongs, verse))
-        
+    init_tokens(c)
+    manifest = Manifest(c)
     conn.commit()
+    if not force and manifest.is_current(path, TOKEN_TABLE):
+        print("Unchanged since last import, skipping.")
+        conn.close()
+        return
+
+    ids = verse_ids(c, 'KJV')
+    print(f"Streaming {path} into {TOKEN_TABLE}...")
+    start = time.perf_counter()
+    verses = tokens = unmapped = 0
+    batch = {}
+    with BulkWriter(conn, quiet=True) as bulk:
+        for ref, verse_tokens in iter_source(path):
+            verse_id = ids.get(ref) if ref else None
+            if verse_id is None:
+                unmapped += 1
+                continue
+            batch[verse_id] = verse_tokens # a repeated verse replaces the earlier one
+            verses += 1
+            tokens += len(verse_tokens)
+            if len(batch) >= batch_size:
+                write_batch(c, bulk, batch)
+                batch = {}
+            if verses % PROGRESS_EVERY == 0:
+                elapsed = time.perf_counter() - start
+                print(f"  {verses}/{KJV.total} verses ({verses * 100 // KJV.total}%), {verses / elapsed:,.0f} verses/s, {tokens} tokens")
+        if batch:
+            write_batch(c, bulk, batch)
+        manifest.record(path, TOKEN_TABLE, {TOKEN_TABLE: tokens})
+
+    elapsed = time.perf_counter() - start
     conn.close()
-    print("Genesis 1 Interlinear Mapped.")
+    if unmapped:
+        print(f"  {unmapped} verses had no KJV verse ID and were skipped.")
+    print(f"Imported {verses} verses, {tokens} tokens in {elapsed:.1f}s ({verses / elapsed if elapsed else 0:,.0f} verses/s, {tokens / elapsed if elapsed else 0:,.0f} tokens/s). 🌍")
 
 if __name__ == "__main__":
-    import_full_interlinear()
+    parser = argparse.ArgumentParser(description="Stream a KJV+ interlinear file (OSIS XML or JSON) into verse_tokens")
+    parser.add_argument('source', help="Local .xml/.osis or .json file")
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE, help="Verses per transaction")
+    parser.add_argument('--force', action='store_true', help="Import even if the manifest says the file is unchanged")
+    args = parser.parse_args()
+    import_stream(args.source, args.batch, args.force)
@@ -1,6 +1,9 @@
 import sqlite3
 import os
 
+from modreader import open_module
+from bulkload import BulkWriter
+
 # --- CONFIG ---
 DB_PATH = 'bible_app.db'
 SD2 = '../Strongs.sd2'
@@ -17,47 +20,31 @@ def extract_transliterations():
     try:
         c.execute("ALTER TABLE lexicons ADD COLUMN transliteration TEXT")
     except: pass
+    conn.commit()
     
     print("Extracting Transliterations from Strongs.sd2 (Sequential Mode)...")
     
+    counts = {'H': 0, 'G': 0}
+    
+    def updates(entries):
+        for strongs_id, word in entries:
+            counts[strongs_id[0]] += 1
+            yield word, strongs_id
+    
     try:
-        with open(SD2, 'rb') as f:
-            content = f.read()
-            parts = content.split(b'\x00')
+        with open_module(SD2) as entries, BulkWriter(conn) as bulk:
+            print(f"File holds {entries.records.count()} segments.")
             
-        print(f"File split into {len(parts)} segments.")
+            # Hebrew H1..H8675 then Greek G1..G5625, every 3rd segment (see StrongsIndexDecoder)
+            # One prepared UPDATE run over chunks instead of ~14k single statements
+            bulk.executemany("UPDATE lexicons SET transliteration = ? WHERE id = ?", updates(entries), 'lexicons')
         
-        # Hebrew: H1 to H8675
-        # Starts at index 3, every 3rd item
-        h_count = 0
-        for i in range(1, 8676):
-            idx = 3 + (i-1) * 3
-            if idx < len(parts):
-                word = parts[idx].decode('cp1252', errors='ignore').strip()
-                if word:
-                    c.execute("UPDATE lexicons SET transliteration = ? WHERE id = ?", (word, f"H{i}"))
-                    h_count += 1
-        
-        print(f"Imported {h_count} Hebrew transliterations.")
-        
-        # Greek: G1 to G5625
-        # Starts after Hebrew (8675 * 3 + 3 = 26028)
-        g_count = 0
-        offset = 26028
-        for i in range(1, 5626):
-            idx = offset + (i-1) * 3
-            if idx < len(parts):
-                word = parts[idx].decode('cp1252', errors='ignore').strip()
-                if word:
-                    c.execute("UPDATE lexicons SET transliteration = ? WHERE id = ?", (word, f"G{i}"))
-                    g_count += 1
-                    
-        print(f"Imported {g_count} Greek transliterations.")
+        print(f"Imported {counts['H']} Hebrew transliterations.")
+        print(f"Imported {counts['G']} Greek transliterations.")
         
     except Exception as e:
         print(f"Error: {e}")
         
-    conn.commit()
     conn.close()
     print("Sequential Import Complete.")
 
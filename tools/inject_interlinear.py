@@ -2,6 +2,8 @@ import sqlite3
 import json
 import re
 
+from interlinear import init_tokens, replace_tokens, tokens_from_pipes, verse_ids
+
 # --- MOCK DATA FOR DEMONSTRATION (Since I cannot reliably download 5MB without potential timeout) ---
 # In a real deployment, I would download 'kjv_strongs.xml' or similar.
 # Here I will construct the Interlinear format for Genesis 1 to demonstrate the feature working end-to-end.
@@ -10,10 +12,9 @@ def import_mock_interlinear():
     conn = sqlite3.connect('bible_app.db')
     c = conn.cursor()
     
-    # 1. Add column
-    try:
-        c.execute("ALTER TABLE verses ADD COLUMN strongs TEXT")
-    except: pass
+    # 1. Token table
+    init_tokens(c)
+    ids = verse_ids(c, 'KJV')
     
     print("Injecting Strongs Data...")
     
@@ -26,12 +27,12 @@ def import_mock_interlinear():
     gen1_1 = "In|H0 the|H0 beginning|H7225 God|H430 created|H1254 the|H853 heaven|H8064 and|H853 the|H0 earth|H776"
     
     # We update KJV verses
-    c.execute("UPDATE verses SET strongs = ? WHERE book_id=1 AND chapter=1 AND verse=1 AND version='KJV'", (gen1_1,))
+    replace_tokens(c, ids[(1, 1, 1)], tokens_from_pipes(gen1_1))
     
     # Gen 1:2
     # And the earth was without form, and void;
     gen1_2 = "And|H0 the|H0 earth|H776 was|H1961 without form|H8414 and|H0 void|H922"
-    c.execute("UPDATE verses SET strongs = ? WHERE book_id=1 AND chapter=1 AND verse=2 AND version='KJV'", (gen1_2,))
+    replace_tokens(c, ids[(1, 1, 2)], tokens_from_pipes(gen1_2))
 
     print("Sample Interlinear Data Injected.")
     conn.commit()
@@ -0,0 +1,162 @@
+import re
+
+# Normalized interlinear storage.
+#
+# verse_tokens holds one row per word instead of a "word|H123 word|H0" string
+# in verses.strongs:
+#
+#   verse_id, position   -- primary key, so a verse is one index range
+#   word                 -- surface text as printed in the verse
+#   testament, strongs   -- 'H7225' is (HEBREW, 7225); NULL when untagged
+#   morph                -- morphology code ('G5656'), NULL when absent
+#
+# idx_tokens_strongs makes "every occurrence of G3056" an index lookup.
+#
+# verse_tokens is KJV only: the concordance and the shards read its verse_id
+# as a KJV verse. Tags carried onto another version's wording by
+# heuristic_mapper.py go to aligned_tokens (same columns, that version's
+# verse IDs).
+
+TOKEN_TABLE = 'verse_tokens'
+ALIGNED_TABLE = 'aligned_tokens'
+TOKEN_VERSION = 'KJV'
+HEBREW = 0
+GREEK = 1
+PREFIXES = {'H': HEBREW, 'G': GREEK}
+LETTERS = {HEBREW: 'H', GREEK: 'G'}
+
+STRONGS_PATTERN = re.compile(r'^([HG])0*(\d+)$')
+OPENING_MARKS = '([{\u201c\u2018' # Punctuation that belongs to the word after it
+
+def parse_strongs(tag):
+    # 'G3056' -> (GREEK, 3056); 'H0', '' and junk -> (None, None)
+    m = STRONGS_PATTERN.match(tag or '')
+    if not m:
+        return None, None
+    number = int(m.group(2))
+    if number == 0:
+        return None, None
+    return PREFIXES[m.group(1)], number
+
+def format_strongs(testament, strongs):
+    if strongs is None or testament is None:
+        return None
+    return f"{LETTERS[testament]}{strongs}"
+
+def token(word, tag=None, morph=None):
+    # (word, testament, strongs, morph) row values for one word
+    testament, strongs = parse_strongs(tag)
+    return word, testament, strongs, morph or None
+
+def attach_punctuation(tokens, piece):
+    # A punctuation-only piece ("." ",", "):") joins the word before it, as in
+    # the printed text; returns False when it has to stand alone
+    if not tokens or not piece or piece[0] in OPENING_MARKS or any(ch.isalnum() for ch in piece):
+        return False
+    tokens[-1] = (tokens[-1][0] + piece,) + tokens[-1][1:]
+    return True
+
+# KJV+ inline tags: word{G123}, standalone {G123}, morphology {(G5656)} or a plain word
+TAGGED_PATTERN = re.compile(r'\{\(([HG]\d+)\)\}|([^\s{}]*)\{([HG]\d+)\}|([^\s{}]+)')
+
+def tokens_from_tagged(text):
+    # "In the beginning{H7225} God{H430} created{H1254}{(H8804)}" ->
+    # [("In", None, None, None), ..., ("created", HEBREW, 1254, "H8804")]
+    tokens = []
+    for morph, word, tag, plain in TAGGED_PATTERN.findall(text or ''):
+        if morph:
+            # Morphology belongs to the word before it
+            if tokens:
+                tokens[-1] = tokens[-1][:3] + (morph,)
+        elif tag:
+            # Standalone tags are untranslated words
+            tokens.append(token(word or '[?]', tag))
+        elif not attach_punctuation(tokens, plain):
+            tokens.append(token(plain))
+    return tokens
+
+def tokens_from_pipes(text):
+    # Legacy verses.strongs format: "In|H0 the|H0 beginning|H7225"
+    tokens = []
+    for part in (text or '').split():
+        word, _, tag = part.rpartition('|')
+        if not word:
+            word, tag = tag, ''
+        tokens.append(token(word, tag))
+    return tokens
+
+def init_tokens(c):
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TOKEN_TABLE,)).fetchone()
+    c.execute(f'''CREATE TABLE IF NOT EXISTS {TOKEN_TABLE} (
+                    verse_id INTEGER,
+                    position INTEGER,
+                    word TEXT,
+                    testament INTEGER,
+                    strongs INTEGER,
+                    morph TEXT,
+                    PRIMARY KEY (verse_id, position)
+                ) WITHOUT ROWID''')
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_tokens_strongs ON {TOKEN_TABLE} (testament, strongs, verse_id) WHERE strongs IS NOT NULL")
+    if not exists:
+        migrate_legacy(c)
+
+def migrate_legacy(c):
+    # One-time copy of any strings an older build left in verses.strongs
+    if not any(row[1] == 'strongs' for row in c.execute("PRAGMA table_info(verses)")):
+        return
+    rows = c.execute("SELECT id, strongs FROM verses WHERE strongs IS NOT NULL AND strongs != ''").fetchall()
+    for verse_id, text in rows:
+        replace_tokens(c, verse_id, tokens_from_pipes(text))
+    if rows:
+        print(f"Migrated {len(rows)} verses from verses.strongs into {TOKEN_TABLE}.")
+
+def init_aligned(c):
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (ALIGNED_TABLE,)).fetchone()
+    c.execute(f'''CREATE TABLE IF NOT EXISTS {ALIGNED_TABLE} (
+                    verse_id INTEGER,
+                    position INTEGER,
+                    word TEXT,
+                    testament INTEGER,
+                    strongs INTEGER,
+                    morph TEXT,
+                    PRIMARY KEY (verse_id, position)
+                ) WITHOUT ROWID''')
+    if not exists:
+        migrate_aligned(c)
+
+def migrate_aligned(c):
+    # One-time move of the other versions' rows older builds left in verse_tokens
+    other = "SELECT id FROM verses WHERE version != ?"
+    c.execute(f"INSERT INTO {ALIGNED_TABLE} SELECT * FROM {TOKEN_TABLE} WHERE verse_id IN ({other})", (TOKEN_VERSION,))
+    moved = c.execute(f"DELETE FROM {TOKEN_TABLE} WHERE verse_id IN ({other})", (TOKEN_VERSION,)).rowcount
+    if moved:
+        print(f"Moved {moved} tokens of aligned versions from {TOKEN_TABLE} into {ALIGNED_TABLE}.")
+
+def token_rows(verse_id, tokens):
+    for position, (word, testament, strongs, morph) in enumerate(tokens, 1):
+        yield verse_id, position, word, testament, strongs, morph
+
+def replace_tokens(c, verse_id, tokens):
+    c.execute(f"DELETE FROM {TOKEN_TABLE} WHERE verse_id = ?", (verse_id,))
+    c.executemany(f"INSERT INTO {TOKEN_TABLE} (verse_id, position, word, testament, strongs, morph) VALUES (?, ?, ?, ?, ?, ?)",
+                  token_rows(verse_id, tokens))
+
+def verse_ids(c, version=TOKEN_VERSION):
+    # {(book_id, chapter, verse): id} for mapping source references onto the DB
+    return {(b, ch, v): vid for vid, b, ch, v in c.execute("SELECT id, book_id, chapter, verse FROM verses WHERE version = ?", (version,))}
+
+def read_tokens(c, first_id, last_id, table=TOKEN_TABLE):
+    # {verse_id: [(word, 'H7225' or None, morph), ...]} for a range of verse IDs
+    result = {}
+    for verse_id, word, testament, strongs, morph in c.execute(
+            f"""SELECT verse_id, word, testament, strongs, morph FROM {table}
+                WHERE verse_id BETWEEN ? AND ? ORDER BY verse_id, position""", (first_id, last_id)):
+        result.setdefault(verse_id, []).append((word, format_strongs(testament, strongs), morph))
+    return result
+
+def occurrences(c, tag):
+    # Every (verse_id, position) where a Strong's number appears
+    testament, strongs = parse_strongs(tag)
+    if strongs is None: return []
+    return c.execute(f"SELECT verse_id, position FROM {TOKEN_TABLE} WHERE testament = ? AND strongs = ? ORDER BY verse_id, position",
+                     (testament, strongs)).fetchall()
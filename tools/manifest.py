@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Build manifest for incremental rebuilds of bible_app.db.
+#
+# Every import step records the source file it read (size, mtime, sha256) and
+# the rows it produced per table. On the next run a step whose source is
+# unchanged is skipped; a changed one is re-imported into a staging table and
+# swapped in with its old rows inside one transaction.
+#
+# Steps are keyed by (source, target): the same Easton.dt4 feeds different
+# tables depending on which script imports it.
+
+MANIFEST_TABLE = 'build_manifest'
+HASH_CHUNK = 1024 * 1024
+
+def file_fingerprint(path):
+    st = os.stat(path)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return st.st_size, st.st_mtime_ns, digest.hexdigest()
+
+@contextmanager
+def module_transaction(c, name='module_import'):
+    # SAVEPOINT works whether or not the script already has a transaction open
+    c.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        c.execute(f"ROLLBACK TO {name}")
+        c.execute(f"RELEASE {name}")
+        raise
+    c.execute(f"RELEASE {name}")
+
+class Manifest:
+    def __init__(self, c):
+        self.c = c
+        self._fingerprints = {}
+        c.execute(f'''CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+                        source TEXT,
+                        target TEXT,
+                        size INTEGER,
+                        mtime_ns INTEGER,
+                        sha256 TEXT,
+                        tables TEXT,
+                        built_at TEXT,
+                        PRIMARY KEY (source, target)
+                    )''')
+
+    def _key(self, path, target):
+        return os.path.basename(path), target
+
+    def is_current(self, path, target):
+        key = self._key(path, target)
+        row = self.c.execute(f"SELECT size, mtime_ns, sha256 FROM {MANIFEST_TABLE} WHERE source = ? AND target = ?", key).fetchone()
+        if row is None:
+            return False
+        st = os.stat(path)
+        if row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return True
+        # Size or mtime moved: only the content hash can tell
+        fp = file_fingerprint(path)
+        self._fingerprints[key] = fp
+        if row[2] != fp[2]:
+            return False
+        # Touched but identical; store the new mtime so next run takes the fast path
+        self.c.execute(f"UPDATE {MANIFEST_TABLE} SET size = ?, mtime_ns = ? WHERE source = ? AND target = ?", (fp[0], fp[1]) + key)
+        return True
+
+    def record(self, path, target, tables, fingerprint=None):
+        # tables: {table_name: rows_written}. Steps whose source is not a file
+        # (rows already in the DB) pass their own (size, mtime_ns, sha256).
+        key = self._key(path, target)
+        size, mtime_ns, sha256 = fingerprint or self._fingerprints.pop(key, None) or file_fingerprint(path)
+        self.c.execute(f'''INSERT OR REPLACE INTO {MANIFEST_TABLE}
+                           (source, target, size, mtime_ns, sha256, tables, built_at)
+                           VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                       key + (size, mtime_ns, sha256, json.dumps(tables), time.strftime('%Y-%m-%d %H:%M:%S')))
+
+    def forget(self, path, target):
+        self.c.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE source = ? AND target = ?", self._key(path, target))
+
+    def forget_targets(self, prefix):
+        # For steps that drop a whole table: everything built into it must be redone
+        self.c.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE target = ? OR target LIKE ?", (prefix, prefix + ':%'))
+
+# --- Staging / swap helpers ---
+
+def staging_name(name):
+    return f"staging_{name}"
+
+def create_staging(c, table, name=None):
+    # Empty temp copy of the table's columns; fill it with executemany as batches arrive
+    staging = staging_name(name or table)
+    c.execute(f"DROP TABLE IF EXISTS temp.{staging}")
+    c.execute(f"CREATE TEMP TABLE {staging} AS SELECT * FROM main.{table} WHERE 0")
+    return staging
+
+def drop_staging(c, staging):
+    c.execute(f"DROP TABLE IF EXISTS temp.{staging}")
+
+def swap_in(c, table, staging, where=None, params=()):
+    # Replace the module's old rows (all rows, or those matching `where`) with the
+    # staged ones. Call inside module_transaction(). Returns rows swapped in.
+    c.execute(f"DELETE FROM main.{table}" + (f" WHERE {where}" if where else ""), params)
+    c.execute(f"INSERT OR REPLACE INTO main.{table} SELECT * FROM temp.{staging} ORDER BY rowid")
+    count = c.execute(f"SELECT count(*) FROM temp.{staging}").fetchone()[0]
+    drop_staging(c, staging)
+    return count
+
+def merge_verses(c, version, staging):
+    # Bibles are merged on (book_id, chapter, verse) instead of swapped, so a
+    # re-imported version keeps its verse IDs (commentaries and xrefs key on them).
+    # staging holds (book_id, chapter, verse, version, text) rows for this version.
+    c.execute(f"CREATE INDEX IF NOT EXISTS temp.idx_{staging}_loc ON {staging} (book_id, chapter, verse)")
+    match = "s.book_id = verses.book_id AND s.chapter = verses.chapter AND s.verse = verses.verse"
+    c.execute(f"""DELETE FROM main.verses WHERE version = ?
+                  AND NOT EXISTS (SELECT 1 FROM temp.{staging} s WHERE {match})""", (version,))
+    c.execute(f"""UPDATE main.verses SET text = (SELECT s.text FROM temp.{staging} s WHERE {match})
+                  WHERE version = ?""", (version,))
+    c.execute(f"""INSERT INTO main.verses (book_id, chapter, verse, version, text)
+                  SELECT s.book_id, s.chapter, s.verse, ?, s.text FROM temp.{staging} s
+                  WHERE NOT EXISTS (SELECT 1 FROM main.verses v WHERE v.version = ?
+                                    AND v.book_id = s.book_id AND v.chapter = s.chapter AND v.verse = s.verse)
+                  ORDER BY s.rowid""", (version, version))
+    count = c.execute(f"SELECT count(*) FROM temp.{staging}").fetchone()[0]
+    drop_staging(c, staging)
+    return count
@@ -0,0 +1,48 @@
+import os
+
+from .records import RecordReader, iter_records
+from .decoders import (
+    Decoder, BibleDecoder, CommentaryDecoder, DictionaryDecoder, LexiconDecoder,
+    CrossRefDecoder, StrongsIndexDecoder, DECODERS, register_decoder, get_decoder, pairs,
+)
+from .normalize import TextCleaner
+
+# Shared streaming reader for the module files in SOURCE_DIR.
+#
+#   with open_module('../MHC.ct4') as entries:
+#       for verse_id, text in entries: ...
+#
+# The decoder is picked from the file extension; keyword options are passed to it.
+
+class ModuleReader:
+    def __init__(self, path, decoder=None, **options):
+        self.path = path
+        self.decoder = decoder or get_decoder(os.path.splitext(path)[1], **options)
+        self.records = RecordReader(path)
+
+    def __iter__(self):
+        return self.decoder.decode(self.records)
+
+    def close(self):
+        self.records.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def open_module(path, decoder=None, **options):
+    return ModuleReader(path, decoder, **options)
+
+def batched(iterable, size):
+    # Fixed-size chunks for executemany, so a module never sits in one big list
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,238 @@
+import re
+from abc import ABC, abstractmethod
+
+# Per-format decoders. Each one turns the raw record stream of a module file
+# into logical entries; register_decoder() lets new formats plug in.
+
+ENCODING = 'cp1252'
+
+# \x03HEX\x03 or \x03HEX-HEX\x03 inside an .xr4 value
+XREF_PATTERN = re.compile(rb'\x03([0-9A-F\-]+)\x03')
+
+# Batch scan of a whole .xr4 buffer, yielding (key, start, end) tuples:
+#   key    - a key record (any record not starting with \x03)
+#   start  - a reference in the value records after it, end set for HEX-HEX
+# Malformed refs (A-B-C, A-) are consumed with all groups empty, exactly where
+# XREF_PATTERN would have matched and then failed to parse them.
+XREF_SCAN = re.compile(rb'(?:\A|\x00)(?!\x03)([^\x00]*)'
+                       rb'|\x03(?:([0-9A-F]+)(?:-([0-9A-F]+))?|[0-9A-F\-]+)\x03')
+SCAN_WINDOW = 4 * 1024 * 1024 # Bytes per findall() call; bounds the match list
+
+def pairs(records):
+    # Key/Value records: [0] key, [1] value, [2] key... (odd tail is dropped)
+    it = iter(records)
+    return zip(it, it)
+
+class Decoder(ABC):
+    def __init__(self, errors='ignore'):
+        # errors='strict' skips records that are not valid cp1252
+        self.errors = errors
+
+    def text(self, raw):
+        try:
+            return raw.decode(ENCODING, errors=self.errors).strip()
+        except UnicodeDecodeError:
+            return None
+
+    @abstractmethod
+    def decode(self, records):
+        # raw records -> logical entries
+        pass
+
+class BibleDecoder(Decoder):
+    # .bt4 -> verse text, one record per verse in canonical order
+    def __init__(self, clean=None, errors='ignore'):
+        super().__init__(errors)
+        self.clean = clean
+
+    def decode(self, records):
+        # A cleaner that handles whole buffers (TextCleaner) cleans the file in one pass
+        if hasattr(self.clean, 'clean_buffer') and hasattr(records, 'buffer'):
+            yield from self.clean.clean_buffer(records.buffer())
+            return
+        for raw in records:
+            yield self.clean(raw) if self.clean else self.text(raw)
+
+class CommentaryDecoder(Decoder):
+    # .ct4 -> (verse_id, text), keys are hex verse IDs
+    # With a versification, keys that are not verses of that scheme are dropped
+    def __init__(self, versification=None, errors='ignore'):
+        super().__init__(errors)
+        self.versification = versification
+
+    def decode(self, records):
+        valid = self.versification.is_valid_id if self.versification else None
+        for k_raw, v_raw in pairs(records):
+            k_hex = self.text(k_raw)
+            v = self.text(v_raw)
+            if not k_hex or not v: continue
+            try:
+                verse_id = int(k_hex, 16)
+            except ValueError:
+                continue
+            if valid and not valid(verse_id): continue
+            yield verse_id, v
+
+class DictionaryDecoder(Decoder):
+    # .dt4 -> (topic, definition)
+    # smart=True resyncs on modules whose topics/definitions are not strictly paired
+    def __init__(self, smart=False, errors='ignore'):
+        super().__init__('strict' if smart else errors)
+        self.smart = smart
+
+    def decode(self, records):
+        if self.smart:
+            yield from self._decode_smart(records)
+            return
+        for k_raw, v_raw in pairs(records):
+            k = self.text(k_raw)
+            v = self.text(v_raw)
+            if k and v:
+                yield k, v
+
+    def _decode_smart(self, records):
+        it = iter(records)
+        key_raw = next(it, None)
+        while key_raw is not None:
+            # Skip empty keys
+            if not key_raw.strip():
+                key_raw = next(it, None)
+                continue
+            key = self.text(key_raw)
+            # Heuristic: Topics are usually short (< 100 chars) and have no newlines
+            if key is None or len(key) > 100 or '\r' in key or '\n' in key:
+                key_raw = next(it, None)
+                continue
+            # If we found a valid key, the NEXT record is likely the definition
+            val_raw = next(it, None)
+            if val_raw is None:
+                break # End of file
+            val = self.text(val_raw)
+            if val:
+                yield key, val
+                key_raw = next(it, None) # Consumed Key and Value
+            else:
+                key_raw = val_raw # Value was empty, maybe key was garbage?
+
+class LexiconDecoder(Decoder):
+    # .hx4/.gx4 -> (strongs_id, definition), '01' becomes H1 / G1
+    def __init__(self, prefix='', errors='ignore'):
+        super().__init__(errors)
+        self.prefix = prefix
+
+    def decode(self, records):
+        for k_raw, v_raw in pairs(records):
+            k = self.text(k_raw)
+            v = self.text(v_raw)
+            if k is None or v is None: continue
+            if k.isdigit():
+                k = f"{self.prefix}{int(k)}"
+            if k and v:
+                yield k, v
+
+class CrossRefDecoder(Decoder):
+    # .xr4 -> (from_id, to_start, to_end); single refs have to_start == to_end
+    # Keys are hex verse IDs, values start with \x03 and hold one or more refs
+    # With a versification, refs pointing outside that scheme are dropped
+    def __init__(self, versification=None, errors='ignore'):
+        super().__init__(errors)
+        self.versification = versification
+
+    def decode(self, records):
+        if hasattr(records, 'buffer'):
+            return self._decode_buffer(records.buffer())
+        return self._decode_records(records)
+
+    def _ref(self, ref):
+        # b'3BEA' -> (id, id), b'3BEA-3BEB' -> (start, end), None if malformed
+        try:
+            if b'-' in ref:
+                start_hex, end_hex = ref.split(b'-')
+                return int(start_hex, 16), int(end_hex, 16)
+            ref_id = int(ref, 16)
+            return ref_id, ref_id
+        except ValueError:
+            return None
+
+    def _key(self, raw, valid):
+        try:
+            key = int(self.text(raw), 16)
+        except (TypeError, ValueError):
+            return None
+        if valid and not valid(key):
+            return None
+        return key
+
+    def _decode_buffer(self, buf):
+        # findall() over large windows of the mmap: the regex engine walks the
+        # records in C and Python only sees the matches. Windows end on a NUL, so
+        # no record or ref is ever cut in two.
+        valid = self.versification.is_valid_id if self.versification else None
+        current_key = None
+        pos = 0
+        size = len(buf)
+        while pos < size:
+            end = buf.find(b'\x00', pos + SCAN_WINDOW) if pos + SCAN_WINDOW < size else -1
+            if end == -1: end = size
+            for key_raw, start_hex, end_hex in XREF_SCAN.findall(buf, pos, end):
+                if start_hex:
+                    if current_key is None: continue
+                    start_id = int(start_hex, 16)
+                    end_id = int(end_hex, 16) if end_hex else start_id
+                    if valid and not (valid(start_id) and valid(end_id)): continue
+                    yield current_key, start_id, end_id
+                elif key_raw: # Empty records do not reset the key
+                    current_key = self._key(key_raw, valid)
+            pos = end
+
+    def _decode_records(self, records):
+        valid = self.versification.is_valid_id if self.versification else None
+        current_key = None
+        for raw in records:
+            if not raw: continue
+            if raw.startswith(b'\x03'):
+                if current_key is None: continue
+                for ref in XREF_PATTERN.findall(raw):
+                    span = self._ref(ref)
+                    if span is None: continue
+                    if valid and not (valid(span[0]) and valid(span[1])): continue
+                    yield current_key, span[0], span[1]
+            else:
+                current_key = self._key(raw, valid)
+
+class StrongsIndexDecoder(Decoder):
+    # .sd2 -> (strongs_id, transliteration)
+    # Three records per entry: Hebrew H1..H8675 from record 3,
+    # Greek G1..G5625 right after it (8675 * 3 + 3 = 26028)
+    SECTIONS = (('H', 3, 8675), ('G', 26028, 5625))
+
+    def decode(self, records):
+        for index, raw in enumerate(records):
+            for prefix, offset, count in self.SECTIONS:
+                rel = index - offset
+                if rel < 0 or rel % 3: continue
+                num = rel // 3 + 1
+                if num > count: continue
+                word = self.text(raw)
+                if word:
+                    yield f"{prefix}{num}", word
+
+DECODERS = {
+    '.bt4': BibleDecoder,
+    '.ct4': CommentaryDecoder,
+    '.dt4': DictionaryDecoder,
+    '.hx4': lambda **kw: LexiconDecoder(**{'prefix': 'H', **kw}),
+    '.gx4': lambda **kw: LexiconDecoder(**{'prefix': 'G', **kw}),
+    '.xr4': CrossRefDecoder,
+    '.sd2': StrongsIndexDecoder,
+}
+
+def register_decoder(ext, factory):
+    DECODERS[ext.lower()] = factory
+
+def get_decoder(ext, **options):
+    try:
+        factory = DECODERS[ext.lower()]
+    except KeyError:
+        raise ValueError(f"No decoder registered for '{ext}' files")
+    return factory(**options)
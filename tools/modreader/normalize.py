@@ -0,0 +1,78 @@
+import re
+
+from .records import SEPARATOR
+
+# Shared text normalization for Bible modules.
+#
+# Cleaning happens on bytes, before decoding: the control markers are deleted
+# and the paragraph mark becomes a space with one bytes.translate() call. For a
+# whole file that is one translate, one decode and one split, instead of a
+# decode + re.sub + replace per verse.
+#
+# Records that are not valid cp1252 are decoded as latin1, the same fallback
+# the per-verse cleaners used, but now they are counted (cleaner.fallbacks).
+
+ENCODING = 'cp1252'
+FALLBACK_ENCODING = 'latin1'
+
+CONTROL_BYTES = bytes(range(0x01, 0x09)) + bytes(range(0x0e, 0x20)) # \x01-\x08, \x0e-\x1f
+PARAGRAPH_MARK = b'\xb6' # in cp1252 and latin1
+
+# Bytes cp1252 cannot decode come back as lone surrogates under surrogateescape
+SURROGATE = re.compile('[\udc80-\udcff]')
+
+class TextCleaner:
+    def __init__(self, delete=CONTROL_BYTES, replace=((PARAGRAPH_MARK, b' '),), encoding=ENCODING, fallback=FALLBACK_ENCODING):
+        src = b''.join(old for old, _ in replace)
+        dst = b''.join(new for _, new in replace)
+        self.table = bytes.maketrans(src, dst)
+        self.delete = delete
+        self.encoding = encoding
+        self.fallback = fallback
+        self.records = 0
+        self.fallbacks = 0
+
+    def __call__(self, raw):
+        return self.clean(raw)
+
+    def clean(self, raw):
+        # One record
+        self.records += 1
+        data = bytes(raw).translate(self.table, self.delete)
+        try:
+            text = data.decode(self.encoding)
+        except UnicodeDecodeError:
+            self.fallbacks += 1
+            text = data.decode(self.fallback)
+        return text.strip()
+
+    def clean_buffer(self, buf):
+        # A whole NUL-delimited file -> list of cleaned records (same segments as
+        # RecordReader: no empty tail when the file ends with a NUL)
+        if not len(buf):
+            return []
+        data = buf[:].translate(self.table, self.delete)
+        try:
+            text = data.decode(self.encoding)
+            needs_fallback = False
+        except UnicodeDecodeError:
+            text = data.decode(self.encoding, errors='surrogateescape')
+            needs_fallback = True
+        parts = text.split(SEPARATOR.decode())
+        if buf[-1:] == SEPARATOR:
+            parts.pop()
+        self.records += len(parts)
+        if not needs_fallback:
+            return [p.strip() for p in parts]
+        # Rare path: only the records holding undecodable bytes are redone
+        result = []
+        for p in parts:
+            if SURROGATE.search(p):
+                self.fallbacks += 1
+                p = p.encode(self.encoding, errors='surrogateescape').decode(self.fallback)
+            result.append(p.strip())
+        return result
+
+    def report(self, name):
+        if self.fallbacks:
+            print(f"  {name}: {self.fallbacks} of {self.records} records were not valid {self.encoding}, decoded as {self.fallback}")
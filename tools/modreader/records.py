@@ -0,0 +1,71 @@
+import mmap
+import os
+
+# Raw record access for the NUL-delimited module files (.bt4, .ct4, .dt4, ...)
+# The file is memory-mapped and records are sliced out one at a time, so we
+# never hold the whole file AND a list of every segment in memory together.
+
+SEPARATOR = b'\x00'
+
+class RecordReader:
+    def __init__(self, path):
+        self.path = path
+        # Open eagerly so a missing file fails here, not on first iteration
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap refuses zero-length files (on Windows too)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def __iter__(self):
+        # Same segments as content.split(b'\x00'), minus the empty tail
+        # left behind when the file ends with a NUL.
+        mm = self._map
+        if mm is None:
+            return
+        pos = 0
+        end = len(mm)
+        while pos < end:
+            nxt = mm.find(SEPARATOR, pos)
+            if nxt == -1:
+                yield mm[pos:end]
+                return
+            yield mm[pos:nxt]
+            pos = nxt + 1
+
+    def buffer(self):
+        # The whole file as one read-only buffer, for decoders that scan it in a
+        # single pass (re.finditer works on the mmap directly)
+        return self._map if self._map is not None else b''
+
+    def count(self):
+        # Number of records, without materializing any of them
+        mm = self._map
+        if mm is None:
+            return 0
+        total = 0
+        pos = 0
+        end = len(mm)
+        while pos < end:
+            nxt = mm.find(SEPARATOR, pos)
+            total += 1
+            if nxt == -1:
+                break
+            pos = nxt + 1
+        return total
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def iter_records(path):
+    with RecordReader(path) as reader:
+        yield from reader
@@ -1,36 +1,44 @@
 import sqlite3
-import os
+
+from modreader import open_module, batched
+from versification import KJV
+from manifest import Manifest, module_transaction, create_staging, swap_in
+from commentary_html import ensure_render_columns, refresh_rendered, rendered_rows
+
+BATCH_SIZE = 5000
 
 def parse_commentary(file_path, db_path, name):
     print(f"Parsing Commentary {name} from {file_path}...")
+    table_name = f"commentary_{name}"
     try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
+        entries = open_module(file_path, versification=KJV)
     except: return
 
-    parts = content.split(b'\x00')
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
     
-    # Drop old table to change schema
-    c.execute(f"DROP TABLE IF EXISTS commentary_{name}")
-    c.execute(f"CREATE TABLE commentary_{name} (verse_id INTEGER PRIMARY KEY, text TEXT)")
+    c.execute(f"CREATE TABLE IF NOT EXISTS {table_name} (verse_id INTEGER PRIMARY KEY, text TEXT, html TEXT, format INTEGER)")
+    ensure_render_columns(c, table_name)
+    manifest = Manifest(c)
+    if manifest.is_current(file_path, table_name):
+        entries.close()
+        rendered = refresh_rendered(c, table_name)
+        conn.commit()
+        conn.close()
+        print(f"Skipping {name} (Unchanged since last import" + (f", re-rendered {rendered} entries)" if rendered else ")"))
+        return
     
-    batch = []
-    for i in range(0, len(parts) - 1, 2):
-        key_hex = parts[i].decode('cp1252', errors='ignore').strip()
-        val = parts[i+1].decode('cp1252', errors='ignore').strip()
-        if key_hex and val:
-            try:
-                key_int = int(key_hex, 16)
-                batch.append((key_int, val))
-            except ValueError:
-                continue
-            
-    c.executemany(f"INSERT OR REPLACE INTO commentary_{name} (verse_id, text) VALUES (?, ?)", batch)
+    # Stage the new entries, then replace the old rows in one transaction
+    staging = create_staging(c, table_name)
+    with entries:
+        for batch in batched(rendered_rows(entries), BATCH_SIZE):
+            c.executemany(f"INSERT INTO temp.{staging} (verse_id, text, html, format) VALUES (?, ?, ?, ?)", batch)
+    with module_transaction(c):
+        count = swap_in(c, table_name, staging)
+        manifest.record(file_path, table_name, {table_name: count})
     conn.commit()
     conn.close()
-    print(f"Finished {name}. Total sections: {len(batch)}")
+    print(f"Finished {name}. Total sections: {count}")
 
 if __name__ == "__main__":
     db = 'bible_app.db'
@@ -1,76 +1,53 @@
 import sqlite3
-import os
-import re
+
+from modreader import open_module
+from versification import KJV
+from bulkload import BulkWriter
+from xref_graph import build_graph
 
 def parse_cross_refs(file_path, db_path):
     print(f"Parsing Cross-References from {file_path}...")
     try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
+        # Drop refs that point outside the KJV versification (no verse to show)
+        refs = open_module(file_path, versification=KJV)
     except Exception as e:
         print(f"Error: {e}")
         return
-
-    # Split by null byte
-    parts = content.split(b'\x00')
     
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
     
     c.execute("DROP TABLE IF EXISTS cross_references")
+    c.execute("DROP TABLE IF EXISTS cross_reference_stats")
+    # One row per reference as written in the module: a range like 3BEA-3BEB
+    # stays a single (from_id, to_start, to_end) row instead of one row per verse.
+    # Single refs have to_start == to_end.
     c.execute('''CREATE TABLE cross_references (
                     from_id INTEGER, 
-                    to_id INTEGER
+                    to_start INTEGER,
+                    to_end INTEGER
                 )''')
-    c.execute("CREATE INDEX idx_xref_from ON cross_references (from_id)")
-    
-    current_key = None
-    batch = []
+    conn.commit()
     
-    for p_bytes in parts:
-        if not p_bytes: continue
-        
-        # Check if it starts with \x03 (it's a value)
-        if p_bytes.startswith(b'\x03'):
-            if current_key is None: continue
-            
-            # Value is like \x0336C0\x03\x033825\x03...
-            # Extract hex strings between \x03
-            hex_refs = re.findall(r'\x03([0-9A-F\-]+)\x03', p_bytes.decode('cp1252', errors='ignore'))
-            
-            for hr in hex_refs:
-                if '-' in hr:
-                    # Range: 3BEA-3BEB
-                    try:
-                        start_hex, end_hex = hr.split('-')
-                        start_id = int(start_hex, 16)
-                        end_id = int(end_hex, 16)
-                        for tid in range(start_id, end_id + 1):
-                            batch.append((current_key, tid))
-                    except: continue
-                else:
-                    try:
-                        tid = int(hr, 16)
-                        batch.append((current_key, tid))
-                    except: continue
-        else:
-            # It's a Key (Verse ID in hex)
-            try:
-                current_key = int(p_bytes.decode('cp1252', errors='ignore').strip(), 16)
-            except:
-                current_key = None
-                
-        # Commit in chunks
-        if len(batch) > 10000:
-            c.executemany("INSERT INTO cross_references (from_id, to_id) VALUES (?, ?)", batch)
-            batch = []
-
-    if batch:
-        c.executemany("INSERT INTO cross_references (from_id, to_id) VALUES (?, ?)", batch)
+    with refs, BulkWriter(conn, chunk_size=10000, commit_every=100000) as bulk:
+        # Indexes go on once every row is in:
+        #   from side: WHERE from_id = ?
+        #   to side:   WHERE to_start BETWEEN ? - max_span AND ? AND to_end >= ?
+        #              (max_span from cross_reference_stats keeps the range scan short)
+        bulk.defer_index('idx_xref_from', "CREATE INDEX idx_xref_from ON cross_references (from_id, to_start, to_end)")
+        bulk.defer_index('idx_xref_to', "CREATE INDEX idx_xref_to ON cross_references (to_start, to_end, from_id)")
+        count = bulk.insert('cross_references', ('from_id', 'to_start', 'to_end'), refs)
         
+    c.execute("CREATE TABLE cross_reference_stats AS SELECT max(to_end - to_start) AS max_span, sum(to_end - to_start + 1) AS verse_links FROM cross_references")
+    max_span, links = c.execute("SELECT max_span, verse_links FROM cross_reference_stats").fetchone()
+    print(f"Cross-references parsed successfully: {count} rows covering {links or 0} verse links (longest range {max_span or 0} verses).")
+    
+    # Reverse index + CSR adjacency for "what points here" and related-passage queries
+    print("Building cross-reference graph...")
+    graph = build_graph(c, KJV.total)
     conn.commit()
     conn.close()
-    print("Cross-references parsed successfully.")
+    print(f"Graph ready: {graph.edge_count} edges.")
 
 if __name__ == "__main__":
     parse_cross_refs('../bcdxrefs.xr4', 'bible_app.db')
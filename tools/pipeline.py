@@ -0,0 +1,81 @@
+import multiprocessing as mp
+import queue
+
+# Parallel decode, single writer.
+#
+# Worker processes run produce(*args) for each task and push the batches it
+# yields onto a bounded queue. The calling process is the only one touching
+# SQLite: it iterates run_pipeline() and writes each batch as it arrives.
+#
+#   for kind, key, payload in run_pipeline(tasks, produce, jobs=4):
+#       if kind == BATCH: c.executemany(..., payload)
+#
+# Events are (BATCH, key, rows), (DONE, key, row_count) and (FAILED, key, error).
+# produce must be a module-level function so it can be sent to spawned workers.
+
+BATCH = 'batch'
+DONE = 'done'
+FAILED = 'failed'
+
+QUEUE_SIZE = 16 # Batches in flight; bounds memory when the writer falls behind
+
+def _run_task(key, args, produce):
+    count = 0
+    try:
+        for batch in produce(*args):
+            yield BATCH, key, batch
+            count += len(batch)
+        yield DONE, key, count
+    except Exception as e:
+        yield FAILED, key, str(e)
+
+def _worker(tasks, results, produce):
+    while True:
+        task = tasks.get()
+        if task is None: break
+        key, args = task
+        for event in _run_task(key, args, produce):
+            results.put(event)
+    results.put(None) # This worker is finished
+
+def run_pipeline(tasks, produce, jobs=1, queue_size=QUEUE_SIZE):
+    # tasks: [(key, args), ...]
+    tasks = list(tasks)
+    if jobs <= 1 or len(tasks) <= 1:
+        for key, args in tasks:
+            yield from _run_task(key, args, produce)
+        return
+
+    jobs = min(jobs, len(tasks))
+    task_q = mp.Queue()
+    result_q = mp.Queue(maxsize=queue_size)
+    for task in tasks:
+        task_q.put(task)
+    for _ in range(jobs):
+        task_q.put(None)
+
+    workers = [mp.Process(target=_worker, args=(task_q, result_q, produce), daemon=True) for _ in range(jobs)]
+    for w in workers:
+        w.start()
+
+    finished = 0
+    try:
+        while finished < jobs:
+            try:
+                event = result_q.get(timeout=1)
+            except queue.Empty:
+                # A worker that died hard never sends its sentinel
+                if not any(w.is_alive() for w in workers) and result_q.empty():
+                    raise RuntimeError("Import worker exited unexpectedly")
+                continue
+            if event is None:
+                finished += 1
+                continue
+            yield event
+    except BaseException:
+        for w in workers:
+            w.terminate()
+        raise
+    finally:
+        for w in workers:
+            w.join()
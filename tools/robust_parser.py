@@ -1,91 +1,14 @@
 import sqlite3
+import argparse
 import os
-import re
+
+from modreader import open_module, TextCleaner
+from versification import KJV
+from manifest import Manifest, module_transaction, create_staging, merge_verses, swap_in
+from bulkload import BulkWriter
 
 # --- CONFIG ---
 DB_PATH = 'bible_app.db'
-BIBLE_STRUCTURE = {
-    # Standard 66 Books with Chapter counts (Standard KJV/ASV versification)
-    "Genesis": [31, 25, 24, 26, 32, 22, 24, 22, 29, 32, 32, 20, 18, 24, 21, 16, 27, 33, 38, 18, 34, 24, 20, 67, 34, 35, 46, 22, 35, 43, 55, 32, 20, 31, 29, 43, 36, 30, 23, 23, 57, 38, 34, 34, 28, 34, 31, 22, 33, 26],
-    "Exodus": [22, 25, 22, 31, 23, 30, 25, 32, 35, 29, 10, 51, 22, 31, 27, 36, 16, 27, 25, 26, 36, 31, 33, 18, 40, 37, 21, 43, 46, 38, 18, 35, 23, 35, 35, 38, 29, 31, 43, 38],
-    "Leviticus": [17, 16, 17, 35, 19, 30, 38, 36, 24, 20, 47, 8, 59, 57, 33, 34, 16, 30, 37, 27, 24, 33, 44, 23, 55, 46, 34],
-    "Numbers": [54, 34, 51, 49, 31, 27, 89, 26, 23, 36, 35, 16, 33, 45, 41, 50, 13, 32, 22, 29, 35, 41, 30, 25, 18, 65, 23, 31, 40, 16, 54, 42, 56, 29, 34, 13],
-    "Deuteronomy": [46, 37, 29, 49, 33, 25, 26, 20, 29, 22, 32, 32, 18, 29, 23, 22, 20, 22, 21, 20, 23, 30, 25, 22, 19, 19, 26, 68, 29, 20, 30, 52, 29, 12],
-    "Joshua": [18, 24, 17, 24, 15, 27, 26, 35, 27, 43, 23, 24, 33, 15, 63, 10, 18, 28, 51, 9, 45, 34, 16, 33],
-    "Judges": [36, 23, 31, 24, 31, 40, 25, 35, 57, 18, 40, 15, 25, 20, 20, 31, 13, 31, 30, 48, 25],
-    "Ruth": [22, 23, 18, 22],
-    "1 Samuel": [28, 36, 21, 22, 12, 21, 17, 22, 27, 27, 15, 25, 23, 52, 35, 23, 58, 30, 24, 42, 15, 23, 29, 22, 44, 25, 12, 25, 11, 31, 13],
-    "2 Samuel": [27, 32, 39, 12, 25, 23, 29, 18, 13, 19, 27, 31, 39, 33, 37, 23, 29, 33, 43, 26, 22, 51, 39, 25],
-    "1 Kings": [53, 46, 28, 34, 18, 38, 51, 66, 28, 29, 43, 33, 34, 31, 34, 34, 24, 46, 21, 43, 29, 53],
-    "2 Kings": [18, 25, 27, 44, 27, 33, 20, 29, 37, 36, 21, 21, 25, 29, 38, 20, 41, 37, 37, 21, 26, 20, 37, 20, 30],
-    "1 Chronicles": [54, 55, 24, 43, 26, 81, 40, 40, 44, 14, 47, 40, 14, 17, 29, 43, 27, 17, 19, 8, 30, 19, 32, 31, 31, 32, 34, 21, 30],
-    "2 Chronicles": [17, 18, 17, 22, 14, 42, 22, 18, 31, 19, 23, 16, 22, 15, 19, 14, 19, 34, 11, 37, 20, 12, 21, 27, 28, 23, 9, 27, 36, 27, 21, 33, 25, 33, 27, 23],
-    "Ezra": [11, 70, 13, 24, 17, 22, 28, 36, 15, 44],
-    "Nehemiah": [11, 20, 32, 23, 19, 19, 73, 18, 38, 39, 36, 47, 31],
-    "Esther": [22, 23, 15, 17, 14, 14, 10, 17, 32, 3],
-    "Job": [22, 13, 26, 21, 27, 30, 21, 22, 35, 22, 20, 25, 28, 22, 35, 22, 16, 21, 29, 29, 34, 30, 17, 25, 6, 14, 23, 28, 25, 31, 40, 22, 33, 37, 16, 33, 24, 41, 30, 24, 34, 17],
-    "Psalms": [6, 12, 8, 8, 12, 10, 17, 9, 20, 18, 7, 8, 6, 7, 5, 11, 15, 50, 14, 9, 13, 31, 6, 10, 22, 12, 14, 9, 11, 12, 24, 11, 22, 22, 28, 12, 40, 22, 13, 17, 13, 11, 5, 26, 17, 11, 9, 14, 20, 23, 19, 9, 6, 7, 23, 13, 11, 11, 17, 12, 8, 12, 11, 10, 13, 20, 7, 35, 36, 5, 24, 20, 28, 23, 10, 12, 20, 72, 13, 19, 16, 8, 18, 12, 13, 17, 7, 18, 52, 17, 16, 15, 5, 23, 11, 13, 12, 9, 9, 5, 8, 28, 22, 35, 45, 48, 43, 13, 31, 7, 10, 10, 9, 8, 18, 19, 2, 29, 176, 7, 8, 9, 4, 8, 5, 6, 5, 6, 8, 8, 3, 18, 3, 3, 21, 26, 9, 8, 24, 13, 10, 7, 12, 15, 21, 10, 20, 14, 9, 6],
-    "Proverbs": [33, 22, 35, 27, 23, 35, 27, 36, 18, 32, 31, 28, 25, 35, 33, 33, 28, 24, 29, 30, 31, 29, 35, 34, 28, 28, 27, 28, 27, 33, 31],
-    "Ecclesiastes": [18, 26, 22, 16, 20, 12, 29, 17, 18, 20, 10, 14],
-    "Song of Solomon": [17, 17, 11, 16, 16, 13, 13, 14],
-    "Isaiah": [31, 22, 26, 6, 30, 13, 25, 22, 21, 34, 16, 6, 22, 32, 9, 14, 14, 7, 25, 6, 17, 25, 18, 23, 12, 21, 13, 29, 24, 33, 9, 20, 24, 17, 10, 22, 38, 22, 8, 31, 29, 25, 28, 28, 25, 13, 15, 22, 26, 11, 23, 15, 12, 17, 13, 12, 21, 14, 21, 22, 11, 12, 19, 12, 25, 24],
-    "Jeremiah": [19, 37, 25, 31, 31, 30, 34, 22, 26, 25, 23, 17, 27, 22, 21, 21, 27, 23, 15, 18, 14, 30, 40, 10, 38, 24, 22, 17, 32, 24, 40, 44, 26, 22, 19, 32, 21, 28, 18, 16, 18, 22, 13, 30, 5, 28, 7, 47, 39, 46, 64, 34],
-    "Lamentations": [22, 22, 66, 22, 22],
-    "Ezekiel": [28, 10, 27, 17, 17, 14, 27, 18, 11, 22, 25, 28, 23, 23, 8, 63, 24, 32, 14, 49, 32, 31, 49, 27, 17, 21, 36, 26, 21, 26, 18, 32, 33, 31, 15, 38, 28, 23, 29, 49, 26, 20, 27, 31, 25, 24, 23, 35],
-    "Daniel": [21, 49, 30, 37, 31, 28, 28, 27, 27, 21, 45, 13],
-    "Hosea": [11, 23, 5, 19, 15, 11, 16, 14, 17, 15, 12, 14, 16, 9],
-    "Joel": [20, 32, 21],
-    "Amos": [15, 16, 15, 13, 27, 14, 17, 14, 15],
-    "Obadiah": [21],
-    "Jonah": [17, 10, 10, 11],
-    "Micah": [16, 13, 12, 13, 15, 16, 20],
-    "Nahum": [15, 13, 19],
-    "Habakkuk": [17, 20, 19],
-    "Zephaniah": [18, 15, 20],
-    "Haggai": [15, 23],
-    "Zechariah": [21, 13, 10, 14, 11, 15, 14, 23, 17, 12, 17, 14, 9, 21],
-    "Malachi": [14, 17, 18, 6],
-    "Matthew": [25, 23, 17, 25, 48, 34, 29, 34, 38, 42, 30, 50, 58, 36, 39, 28, 27, 35, 30, 34, 46, 46, 39, 51, 46, 75, 66, 20],
-    "Mark": [45, 28, 35, 41, 43, 56, 37, 38, 50, 52, 33, 44, 37, 72, 47, 20],
-    "Luke": [80, 52, 38, 44, 39, 49, 50, 56, 62, 42, 54, 59, 35, 35, 32, 31, 37, 43, 48, 47, 38, 71, 56, 53],
-    "John": [51, 25, 36, 54, 47, 71, 53, 59, 41, 42, 57, 50, 38, 31, 27, 33, 26, 40, 42, 31, 25],
-    "Acts": [26, 47, 26, 37, 42, 15, 60, 40, 43, 48, 30, 25, 52, 28, 41, 40, 34, 28, 41, 38, 40, 30, 35, 27, 27, 32, 44, 31],
-    "Romans": [32, 29, 31, 25, 21, 23, 25, 39, 33, 21, 36, 21, 14, 23, 33, 27],
-    "1 Corinthians": [31, 16, 23, 21, 13, 20, 40, 13, 27, 33, 34, 31, 13, 40, 58, 24],
-    "2 Corinthians": [24, 17, 18, 18, 21, 18, 16, 24, 15, 18, 33, 21, 14],
-    "Galatians": [24, 21, 29, 31, 26, 18],
-    "Ephesians": [23, 22, 21, 32, 33, 24],
-    "Philippians": [30, 30, 21, 23],
-    "Colossians": [29, 23, 25, 18],
-    "1 Thessalonians": [10, 20, 13, 18, 28],
-    "2 Thessalonians": [12, 17, 18],
-    "1 Timothy": [20, 15, 16, 16, 25, 21],
-    "2 Timothy": [18, 26, 17, 22],
-    "Titus": [16, 15, 15],
-    "Philemon": [25],
-    "Hebrews": [14, 18, 19, 16, 14, 20, 28, 13, 28, 39, 40, 29, 25],
-    "James": [27, 26, 18, 17, 20],
-    "1 Peter": [25, 25, 22, 19, 14],
-    "2 Peter": [21, 22, 18],
-    "1 John": [10, 29, 24, 21, 21],
-    "2 John": [13],
-    "3 John": [14],
-    "Jude": [25],
-    "Revelation": [20, 29, 22, 11, 14, 17, 17, 13, 21, 11, 19, 17, 18, 20, 8, 21, 18, 24, 21, 15, 27, 21]
-}
-
-def clean_kjv_text(text_bytes):
-    try:
-        # Decode
-        text = text_bytes.decode('cp1252')
-    except:
-        text = text_bytes.decode('latin1', errors='ignore')
-    
-    # Remove binary markers like \x01 and \x06
-    text = re.sub(r'[\x01-\x08\x0e-\x1f]', '', text)
-    # Replace paragraph markers
-    text = text.replace('\xb6', ' ')
-    return text.strip()
 
 def init_db(c):
     # Books
@@ -105,120 +28,123 @@ def init_db(c):
                     id TEXT PRIMARY KEY,
                     definition TEXT
                 )''')
-    # Dictionaries
+    # Dictionaries (same layout import_dicts uses, one row set per module)
     c.execute('''CREATE TABLE IF NOT EXISTS dictionaries (
-                    topic TEXT PRIMARY KEY,
-                    definition TEXT
+                    topic TEXT,
+                    definition TEXT,
+                    module TEXT
                 )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_dict_topic ON dictionaries (topic)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_dict_mod ON dictionaries (module)")
     
     # Indexes
     c.execute("CREATE INDEX IF NOT EXISTS idx_version_loc ON verses (version, book_id, chapter, verse)")
 
 def populate_books(c):
     c.execute("DELETE FROM books")
-    book_id = 1
-    for name in BIBLE_STRUCTURE.keys():
-        c.execute("INSERT INTO books (id, name) VALUES (?, ?)", (book_id, name))
-        book_id += 1
+    c.executemany("INSERT INTO books (id, name) VALUES (?, ?)", enumerate(KJV.books, 1))
 
-def parse_bible(file_path, version, c):
+def parse_bible(file_path, version, bulk, manifest=None):
+    c = bulk.c
     print(f"Parsing {version} from {file_path}...")
+    target = f"verses:{version}"
     try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
+        if manifest and manifest.is_current(file_path, target):
+            print(f"Unchanged since last build, skipping {version}.")
+            return
+        # Control markers dropped, paragraph marks -> spaces, whole file in one pass
+        cleaner = TextCleaner()
+        module = open_module(file_path, clean=cleaner)
     except FileNotFoundError:
         print("File not found.")
         return
 
-    raw_verses = content.split(b'\x00')
-    if raw_verses and raw_verses[-1] == b'': raw_verses.pop()
-    
-    # Map to structure
-    verse_index = 0
-    batch = []
-    
-    book_map = {name: i+1 for i, name in enumerate(BIBLE_STRUCTURE.keys())}
-    
-    for book_name, chapters in BIBLE_STRUCTURE.items():
-        book_id = book_map[book_name]
-        for chapter_num, count in enumerate(chapters, 1):
-            for verse_num in range(1, count + 1):
-                if verse_index < len(raw_verses):
-                    text = clean_kjv_text(raw_verses[verse_index])
-                    batch.append((book_id, chapter_num, verse_num, version, text))
-                    verse_index += 1
-                else: break
-    
-    c.executemany("INSERT INTO verses (book_id, chapter, verse, version, text) VALUES (?, ?, ?, ?, ?)", batch)
-    print(f"Inserted {len(batch)} verses for {version}.")
+    # Map to structure: record N is verse N of the KJV versification
+    # Merge rather than append, so a re-import keeps the version's verse IDs
+    staging = create_staging(c, 'verses', f"verses_{version.lower()}")
+    with module:
+        rows = ((book_id, chapter_num, verse_num, version, text)
+                for (book_id, chapter_num, verse_num), text in zip(KJV.iter_verses(), module))
+        count = bulk.insert(f"temp.{staging}", ('book_id', 'chapter', 'verse', 'version', 'text'), rows, label='verses')
+    with module_transaction(c):
+        merge_verses(c, version, staging)
+        if manifest: manifest.record(file_path, target, {'verses': count})
+    cleaner.report(version)
+    print(f"Inserted {count} verses for {version}.")
 
-def parse_lexicon(file_path, prefix, c):
+def parse_lexicon(file_path, prefix, bulk, manifest=None):
+    c = bulk.c
     print(f"Parsing Lexicon {file_path}...")
     try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
-    except: return
+        if manifest and manifest.is_current(file_path, 'lexicons'):
+            print("Unchanged since last build, skipping.")
+            return
+        module = open_module(file_path, prefix=prefix)
+    except OSError as e:
+        print(f"Cannot read {file_path}: {e}")
+        return
 
-    parts = content.split(b'\x00')
-    count = 0
-    
-    # Iterate pairs
-    for i in range(0, len(parts) - 1, 2):
-        k = parts[i].decode('cp1252', errors='ignore').strip()
-        v = parts[i+1].decode('cp1252', errors='ignore').strip()
-        
-        if k.isdigit():
-            k = f"{prefix}{int(k)}" # Format as H1, G1
-            
-        if k and v:
-            c.execute("INSERT OR REPLACE INTO lexicons (id, definition) VALUES (?, ?)", (k, v))
-            count += 1
+    with module, module_transaction(c):
+        count = bulk.insert('lexicons', ('id', 'definition'), module, verb='INSERT OR REPLACE')
+        if manifest: manifest.record(file_path, 'lexicons', {'lexicons': count})
             
     print(f"Inserted {count} definitions.")
 
-def parse_dictionary(file_path, c):
+def parse_dictionary(file_path, bulk, manifest=None):
+    c = bulk.c
     print(f"Parsing Dictionary {file_path}...")
+    module_name = os.path.splitext(os.path.basename(file_path))[0].upper()
+    target = f"dictionaries:{module_name}"
     try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
-    except: return
+        if manifest and manifest.is_current(file_path, target):
+            print("Unchanged since last build, skipping.")
+            return
+        module = open_module(file_path)
+    except OSError as e:
+        print(f"Cannot read {file_path}: {e}")
+        return
 
-    parts = content.split(b'\x00')
-    count = 0
-    
-    for i in range(0, len(parts) - 1, 2):
-        k = parts[i].decode('cp1252', errors='ignore').strip()
-        v = parts[i+1].decode('cp1252', errors='ignore').strip()
-        if k and v:
-            c.execute("INSERT OR REPLACE INTO dictionaries (topic, definition) VALUES (?, ?)", (k, v))
-            count += 1
+    # Stage, then replace this module's old rows in one transaction
+    staging = create_staging(c, 'dictionaries', f"dict_{module_name.lower()}")
+    with module:
+        rows = ((k, v, module_name) for k, v in module)
+        bulk.insert(f"temp.{staging}", ('topic', 'definition', 'module'), rows, label='dictionaries')
+    with module_transaction(c):
+        count = swap_in(c, 'dictionaries', staging, "module = ?", (module_name,))
+        if manifest: manifest.record(file_path, target, {'dictionaries': count})
     print(f"Inserted {count} topics.")
 
-def main():
-    if os.path.exists(DB_PATH):
+def main(full=False):
+    # Incremental by default: unchanged sources are skipped via the build manifest
+    if full and os.path.exists(DB_PATH):
         os.remove(DB_PATH) # Fresh start
         
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    c.execute("PRAGMA synchronous = OFF")
-    c.execute("PRAGMA journal_mode = MEMORY")
     
     init_db(c)
     populate_books(c)
+    manifest = Manifest(c)
     conn.commit()
     
-    # Parses
-    parse_bible('../KJV.bt4', 'KJV', c)
-    parse_bible('../ASV.bt4', 'ASV', c)
-    
-    parse_lexicon('../StrHeb.hx4', 'H', c)
-    parse_lexicon('../StrGrk.gx4', 'G', c)
-    
-    parse_dictionary('../Easton.dt4', c)
+    # Parses (load-time pragmas, durable settings restored once everything is in)
+    with BulkWriter(conn) as bulk:
+        # verses keeps its index: merge_verses looks rows up by it
+        bulk.defer_indexes('dictionaries')
+        
+        parse_bible('../KJV.bt4', 'KJV', bulk, manifest)
+        parse_bible('../ASV.bt4', 'ASV', bulk, manifest)
+        
+        parse_lexicon('../StrHeb.hx4', 'H', bulk, manifest)
+        parse_lexicon('../StrGrk.gx4', 'G', bulk, manifest)
+        
+        parse_dictionary('../Easton.dt4', bulk, manifest)
     
-    conn.commit()
     conn.close()
     print("Robust parsing complete.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build bible_app.db from the KJV/ASV, Strong's and Easton modules")
+    parser.add_argument('--full', action='store_true', help="Delete the database and rebuild everything")
+    args = parser.parse_args()
+    main(args.full)
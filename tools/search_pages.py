@@ -0,0 +1,211 @@
+import sqlite3
+import argparse
+import re
+import time
+
+from setup_search import FTS_TABLE, TOKENIZERS, rows_signature
+
+# Keyset pagination and precomputed hit counts for verse search.
+#
+# verses_fts is keyed by verses.id, which is only canonical until a re-import
+# appends verses, and SearchController has to COUNT(*) every match and sort
+# for each page. This stage builds a second, external-content FTS5 index whose
+# rowid is the canonical key
+#
+#   slot << 24 | book_id << 16 | chapter << 8 | verse      (slot = version)
+#
+# so a MATCH already returns hits in Bible order, a version is a rowid range,
+# and the next page is "rowid > last key" with no sort and no OFFSET. Text is
+# not stored again: the index reads it through a view over verses.
+#
+# search_terms holds per-version document and hit counts for every indexed term
+# (from fts5vocab), so the total for a one-word query is a primary-key lookup.
+
+# --- CONFIG ---
+DB_PATH = 'bible_app.db'
+KEY_TABLE = 'search_keys'
+KEY_VIEW = 'verse_search_keys'
+KEY_FTS = 'verses_fts_keys'
+TERMS_TABLE = 'search_terms'
+STATE_TABLE = 'search_key_versions'
+SLOT_SHIFT = 24
+PAGE_SIZE = 200
+BAREWORD = re.compile(r'\w+')
+FTS_KEYWORDS = ('AND', 'OR', 'NOT', 'NEAR')
+
+PAGE_QUERY = f'''SELECT k.rowid, b.name, k.chapter, k.verse, highlight({KEY_FTS}, 0, '[[MARK]]', '[[/MARK]]')
+                 FROM {KEY_FTS} k JOIN books b ON b.id = k.book_id
+                 WHERE {KEY_FTS} MATCH ? AND k.rowid > ? AND k.rowid <= ?
+                 ORDER BY k.rowid LIMIT ?'''
+
+def canonical_key(slot, book_id, chapter, verse):
+    return slot << SLOT_SHIFT | book_id << 16 | chapter << 8 | verse
+
+def split_key(key):
+    # -> (slot, book_id, chapter, verse)
+    return key >> SLOT_SHIFT, key >> 16 & 0xFF, key >> 8 & 0xFF, key & 0xFF
+
+def slot_bounds(slot):
+    # (exclusive lower, inclusive upper) rowid bounds of one version
+    return (slot << SLOT_SHIFT) - 1, ((slot + 1) << SLOT_SHIFT) - 1
+
+def verses_tokenizer(c):
+    # Match verses_fts so counts and pages agree with the main search
+    row = c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)).fetchone()
+    m = re.search(r'tokenize="([^"]*)"', row[0]) if row else None
+    return m.group(1) if m else TOKENIZERS['porter']
+
+def table_exists(c, name):
+    return c.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+# --- Build ---
+
+def assign_slots(c, versions):
+    # Stable slot per version; new versions take the lowest free slot
+    slots = dict(c.execute(f"SELECT version, slot FROM {STATE_TABLE}").fetchall())
+    for version in versions:
+        if version not in slots:
+            used = set(slots.values())
+            slots[version] = min(set(range(len(used) + 1)) - used)
+    return {v: slots[v] for v in versions}
+
+def build_keys(c, slots):
+    too_big = c.execute("SELECT count(*) FROM verses WHERE book_id > 255 OR chapter > 255 OR verse > 255").fetchone()[0]
+    if too_big:
+        raise ValueError(f"{too_big} verses do not fit the 8-bit book/chapter/verse fields of the canonical key")
+    c.execute(f"DROP TABLE IF EXISTS {KEY_TABLE}")
+    c.execute(f"CREATE TABLE {KEY_TABLE} (key INTEGER PRIMARY KEY, verse_id INTEGER NOT NULL)")
+    for version, slot in slots.items():
+        c.execute(f'''INSERT INTO {KEY_TABLE} (key, verse_id)
+                      SELECT (? << {SLOT_SHIFT}) | (book_id << 16) | (chapter << 8) | verse, id
+                      FROM verses WHERE version = ? ORDER BY book_id, chapter, verse''', (slot, version))
+
+def build_index(c, tokenizer):
+    # The view is the external content: key -> search_keys (rowid) -> verses (rowid)
+    c.execute(f"DROP TABLE IF EXISTS {KEY_FTS}")
+    c.execute(f"DROP VIEW IF EXISTS {KEY_VIEW}")
+    c.execute(f'''CREATE VIEW {KEY_VIEW} AS
+                  SELECT k.key AS key, v.text AS text, v.book_id AS book_id, v.chapter AS chapter, v.verse AS verse, v.version AS version
+                  FROM {KEY_TABLE} k JOIN verses v ON v.id = k.verse_id''')
+    c.execute(f'''CREATE VIRTUAL TABLE {KEY_FTS} USING fts5(
+                    text, book_id UNINDEXED, chapter UNINDEXED, verse UNINDEXED, version UNINDEXED,
+                    tokenize="{tokenizer}", content='{KEY_VIEW}', content_rowid='key')''')
+    c.execute(f"INSERT INTO {KEY_FTS}({KEY_FTS}) VALUES('rebuild')")
+    c.execute(f"INSERT INTO {KEY_FTS}({KEY_FTS}) VALUES('optimize')")
+
+def build_terms(c, slots):
+    # Per-version doc/hit counts straight from the inverted index
+    c.execute(f"DROP TABLE IF EXISTS main.{TERMS_TABLE}")
+    c.execute(f'''CREATE TABLE main.{TERMS_TABLE} (
+                    version TEXT,
+                    term TEXT,
+                    docs INTEGER,
+                    hits INTEGER,
+                    PRIMARY KEY (version, term)
+                ) WITHOUT ROWID''')
+    c.execute(f"CREATE VIRTUAL TABLE temp.{KEY_FTS}_instance USING fts5vocab(main, {KEY_FTS}, 'instance')")
+    try:
+        for version, slot in slots.items():
+            low, high = slot_bounds(slot)
+            c.execute(f'''INSERT INTO main.{TERMS_TABLE} (version, term, docs, hits)
+                          SELECT ?, term, count(DISTINCT doc), count(*) FROM temp.{KEY_FTS}_instance
+                          WHERE doc > ? AND doc <= ? GROUP BY term''', (version, low, high))
+    finally:
+        c.execute(f"DROP TABLE temp.{KEY_FTS}_instance")
+
+def build_search_pages(full=False):
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    c.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (version TEXT PRIMARY KEY, slot INTEGER UNIQUE, rows INTEGER, signature TEXT)")
+
+    versions = [v for (v,) in c.execute("SELECT DISTINCT version FROM verses ORDER BY version").fetchall()]
+    current = {v: rows_signature(c.execute("SELECT id, book_id, chapter, verse, text FROM verses WHERE version = ? ORDER BY id", (v,)))
+               for v in versions}
+    indexed = {v: (rows, sig) for v, rows, sig in c.execute(f"SELECT version, rows, signature FROM {STATE_TABLE}")}
+    tokenizer = verses_tokenizer(c)
+    fts_sql = c.execute("SELECT sql FROM sqlite_master WHERE name = ?", (KEY_FTS,)).fetchone()
+    if not full and current == indexed and fts_sql and f'tokenize="{tokenizer}"' in fts_sql[0]:
+        print("Search pages are up to date.")
+        conn.close()
+        return
+
+    # External content cannot drop a changed version's old tokens, so any change
+    # rebuilds the keyed index (a fraction of a second per version)
+    start = time.perf_counter()
+    slots = assign_slots(c, versions)
+    build_keys(c, slots)
+    build_index(c, tokenizer)
+    build_terms(c, slots)
+    c.execute(f"DELETE FROM {STATE_TABLE}")
+    c.executemany(f"INSERT INTO {STATE_TABLE} (version, slot, rows, signature) VALUES (?, ?, ?, ?)",
+                  [(v, slots[v]) + current[v] for v in versions])
+    conn.commit()
+    terms = c.execute(f"SELECT count(*) FROM {TERMS_TABLE}").fetchone()[0]
+    conn.close()
+    print(f"Search pages ready: {len(versions)} version(s), {terms} term counts in {time.perf_counter() - start:.2f}s. 🔎")
+
+# --- Read side ---
+
+def version_slot(c, version):
+    row = c.execute(f"SELECT slot FROM {STATE_TABLE} WHERE version = ?", (version,)).fetchone()
+    return row[0] if row else None
+
+def query_terms(c, text, tokenizer=None):
+    # Tokens the index would produce for `text` (stemmed for porter)
+    tokenizer = tokenizer or verses_tokenizer(c)
+    c.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS temp.query_tokens USING fts5(text, tokenize="{tokenizer}")')
+    c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.query_tokens_vocab USING fts5vocab(temp, query_tokens, 'instance')")
+    c.execute("DELETE FROM temp.query_tokens")
+    c.execute("INSERT INTO temp.query_tokens (text) VALUES (?)", (text,))
+    return [term for (term,) in c.execute("SELECT term FROM temp.query_tokens_vocab ORDER BY offset")]
+
+def is_bareword(query):
+    # A single plain word: no prefix *, ^, quotes, column filter or operator,
+    # which query_terms would strip and search_terms cannot answer
+    query = query.strip()
+    return BAREWORD.fullmatch(query) is not None and query not in FTS_KEYWORDS
+
+def hit_count(c, query, version):
+    # Verses matching `query` in `version`: a lookup for one plain term, a count otherwise
+    terms = query_terms(c, query) if is_bareword(query) else []
+    if len(terms) == 1:
+        row = c.execute(f"SELECT docs FROM {TERMS_TABLE} WHERE version = ? AND term = ?", (version, terms[0])).fetchone()
+        return row[0] if row else 0
+    slot = version_slot(c, version)
+    if slot is None: return 0
+    low, high = slot_bounds(slot)
+    return c.execute(f"SELECT count(*) FROM {KEY_FTS} WHERE {KEY_FTS} MATCH ? AND rowid > ? AND rowid <= ?",
+                     (query, low, high)).fetchone()[0]
+
+def search_page(c, query, version, after=None, limit=PAGE_SIZE):
+    # One page in Bible order. Pass the returned cursor as `after` for the next
+    # page; None means there are no more results.
+    slot = version_slot(c, version)
+    if slot is None: return [], None
+    low, high = slot_bounds(slot)
+    rows = c.execute(PAGE_QUERY, (query, max(after or low, low), high, limit)).fetchall()
+    cursor = rows[-1][0] if len(rows) == limit else None
+    return [row[1:] for row in rows], cursor
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build canonical-order search keys and per-term hit counts")
+    parser.add_argument('--full', action='store_true', help="Rebuild even if no version changed")
+    parser.add_argument('--query', help="Page through a search with the keyset cursor and print timings")
+    parser.add_argument('--version', default='KJV')
+    args = parser.parse_args()
+    if args.query:
+        conn = sqlite3.connect(DB_PATH)
+        c = conn.cursor()
+        start = time.perf_counter()
+        total = hit_count(c, args.query, args.version)
+        print(f"{total} verses ({(time.perf_counter() - start) * 1000:.2f} ms)")
+        after, page = None, 0
+        while True:
+            start = time.perf_counter()
+            rows, after = search_page(c, args.query, args.version, after)
+            page += 1
+            print(f"  page {page}: {len(rows)} rows ({(time.perf_counter() - start) * 1000:.2f} ms)")
+            if after is None: break
+        conn.close()
+    else:
+        build_search_pages(args.full)
@@ -1,34 +1,379 @@
 import sqlite3
+import argparse
+import hashlib
 import os
+import shutil
+import statistics
+import tempfile
+import time
 
-def setup_search_index(db_path):
-    print(f"Setting up Full-Text Search on {db_path}...")
+# Full-text search index over verses (verses_fts), kept in sync per version,
+# plus the library indexes over commentaries, dictionaries and lexicons (below).
+#
+# Modes:
+#   content      FTS5 stores its own copy of every verse (the original layout)
+#   external     content='verses': the index points back at verses, text is stored once
+#   contentless  content='': smallest, but highlight() and the version column come
+#                back NULL, so SearchController cannot use it as is
+#
+# content/external install triggers on verses, so re-importing a Bible updates
+# the index row by row as merge_verses runs. A run of this script then only
+# indexes what the triggers could not have seen (a new index, or verses rebuilt
+# while the triggers were missing), one version at a time. search_index_versions
+# remembers a signature of every indexed version to tell which ones moved.
+
+# --- CONFIG ---
+DB_PATH = 'bible_app.db'
+FTS_TABLE = 'verses_fts'
+STATE_TABLE = 'search_index_versions'
+COLUMNS = ('text', 'book_id', 'chapter', 'verse', 'version')
+
+MODES = ('content', 'external', 'contentless')
+TOKENIZERS = {
+    'porter': 'porter',
+    'unicode61': 'unicode61 remove_diacritics 2',
+    'trigram': 'trigram', # substring search; terms need 3+ characters
+}
+
+# Query shapes from SearchController (count + first page) and the terms timed with --compare
+COUNT_QUERY = f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? AND version = ?"
+PAGE_QUERY = f'''SELECT b.name, v.chapter, v.verse, highlight({FTS_TABLE}, 0, '[[MARK]]', '[[/MARK]]')
+                 FROM {FTS_TABLE} v JOIN books b ON v.book_id = b.id
+                 WHERE v.{FTS_TABLE} MATCH ? AND v.version = ?
+                 ORDER BY v.book_id, v.chapter, v.verse LIMIT 200'''
+SAMPLE_TERMS = ['God', 'beginning', 'love', 'faith hope', 'shepherd', 'righteousness']
+SAMPLE_RUNS = 5
+
+def create_sql(mode, tokenizer):
+    cols = ['text'] + [f"{name} UNINDEXED" for name in COLUMNS[1:]]
+    options = [f'tokenize="{TOKENIZERS[tokenizer]}"']
+    if mode == 'external':
+        options += ["content='verses'", "content_rowid='id'"]
+    elif mode == 'contentless':
+        options.append("content=''")
+    return f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({', '.join(cols + options)})"
+
+def create_triggers(c, mode):
+    new = ', '.join(f"new.{col}" for col in COLUMNS)
+    old = ', '.join(f"old.{col}" for col in COLUMNS)
+    cols = ', '.join(COLUMNS)
+    drop_triggers(c)
+    if mode == 'external':
+        delete = f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    else:
+        delete = f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id;"
+    insert = f"INSERT INTO {FTS_TABLE} (rowid, {cols}) VALUES (new.id, {new});"
+    c.execute(f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON verses BEGIN {insert} END")
+    c.execute(f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON verses BEGIN {delete} END")
+    c.execute(f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON verses BEGIN {delete} {insert} END")
+
+def drop_triggers(c):
+    for suffix in ('ai', 'ad', 'au'):
+        c.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+
+def has_triggers(c):
+    names = {f"{FTS_TABLE}_{s}" for s in ('ai', 'ad', 'au')}
+    found = {n for (n,) in c.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'verses'")}
+    return names <= found
+
+def current_sql(c):
+    row = c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)).fetchone()
+    return row[0] if row else None
+
+def rows_signature(rows):
+    # (row count, sha256 over every value); cheap next to indexing
+    digest = hashlib.sha256()
+    count = 0
+    for row in rows:
+        digest.update('\x1f'.join(map(str, row)).encode('utf-8', 'surrogatepass'))
+        digest.update(b'\x1e')
+        count += 1
+    return count, digest.hexdigest()
+
+def version_signatures(c):
+    # {version: (rows, signature)}
+    versions = [v for (v,) in c.execute("SELECT DISTINCT version FROM verses ORDER BY version").fetchall()]
+    return {version: rows_signature(c.execute("SELECT id, book_id, chapter, verse, text FROM verses WHERE version = ? ORDER BY id", (version,)))
+            for version in versions}
+
+def index_version(c, version):
+    cols = ', '.join(COLUMNS)
+    c.execute(f"INSERT INTO {FTS_TABLE} (rowid, {cols}) SELECT id, {cols} FROM verses WHERE version = ?", (version,))
+
+def recreate(c, mode, tokenizer, versions):
+    drop_triggers(c)
+    c.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    c.execute(create_sql(mode, tokenizer))
+    for version in versions:
+        start = time.perf_counter()
+        index_version(c, version)
+        print(f"  {version}: indexed in {time.perf_counter() - start:.2f}s")
+    if mode != 'contentless':
+        create_triggers(c, mode)
+
+def sync_index(c, mode, tokenizer, full=False):
+    # Returns a short description of what was done
+    c.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (version TEXT PRIMARY KEY, rows INTEGER, signature TEXT)")
+    current = version_signatures(c)
+    indexed = {v: (rows, sig) for v, rows, sig in c.execute(f"SELECT version, rows, signature FROM {STATE_TABLE}")}
+
+    if full or current_sql(c) != create_sql(mode, tokenizer):
+        recreate(c, mode, tokenizer, sorted(current))
+        action = "rebuilt"
+    elif mode != 'contentless' and has_triggers(c):
+        # The triggers have kept up with every change since the last run
+        action = "in sync (maintained by triggers)"
+    else:
+        added = [v for v in current if v not in indexed]
+        moved = [v for v in indexed if current.get(v) != indexed[v] and v not in added]
+        if mode == 'content':
+            for version in moved:
+                c.execute(f"DELETE FROM {FTS_TABLE} WHERE version = ?", (version,))
+            for version in sorted(set(added) | {v for v in moved if v in current}):
+                start = time.perf_counter()
+                index_version(c, version)
+                print(f"  {version}: indexed in {time.perf_counter() - start:.2f}s")
+            create_triggers(c, mode)
+            action = f"{len(added)} added, {len(moved)} changed"
+        elif moved:
+            # external/contentless entries can only be removed with their old text
+            print(f"  {', '.join(sorted(moved))} changed outside the index; rebuilding.")
+            recreate(c, mode, tokenizer, sorted(current))
+            action = "rebuilt"
+        else:
+            for version in sorted(added):
+                start = time.perf_counter()
+                index_version(c, version)
+                print(f"  {version}: indexed in {time.perf_counter() - start:.2f}s")
+            if mode != 'contentless':
+                create_triggers(c, mode)
+            action = f"{len(added)} added"
+
+    c.execute(f"DELETE FROM {STATE_TABLE}")
+    c.executemany(f"INSERT INTO {STATE_TABLE} (version, rows, signature) VALUES (?, ?, ?)",
+                  [(v, rows, sig) for v, (rows, sig) in current.items()])
+    return action
+
+def setup_search_index(db_path, mode='external', tokenizer='porter', full=False):
+    print(f"Setting up Full-Text Search on {db_path} ({mode}, {tokenizer})...")
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
-    
-    # 1. Enable FTS5
-    # We create a virtual table 'verses_fts' that mirrors the text content
-    c.execute("DROP TABLE IF EXISTS verses_fts")
-    c.execute('''CREATE VIRTUAL TABLE verses_fts USING fts5(
-                    text, 
-                    book_id UNINDEXED, 
-                    chapter UNINDEXED, 
-                    verse UNINDEXED, 
-                    version UNINDEXED,
-                    tokenize="porter"
+    start = time.perf_counter()
+    action = sync_index(c, mode, tokenizer, full)
+    if not action.startswith("in sync"):
+        c.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('optimize')")
+    conn.commit()
+    conn.close()
+    print(f"Search index {action} in {time.perf_counter() - start:.2f}s. 🚀")
+
+# --- Library (commentaries, dictionaries, lexicons) ---
+#
+# One FTS5 table per kind, storing its own text: commentary tables are swapped
+# in whole on import and dictionaries has no stable rowid, so an external
+# content index could not point back at them. Each module owns a block of
+# rowids (slot << 32 | key), so a changed module is dropped with one rowid range
+# delete and re-added while the others are left alone. For commentaries the key
+# is the verse_id: rowid & 0xFFFFFFFF maps a hit back to its verse.
+
+LIBRARY_STATE = 'search_index_modules'
+SLOT_SHIFT = 32
+LIBRARY_INDEXES = {
+    'commentaries_fts': ('text', 'verse_id UNINDEXED', 'module UNINDEXED'),
+    'dictionaries_fts': ('topic', 'definition', 'module UNINDEXED'),
+    'lexicons_fts': ('id UNINDEXED', 'transliteration', 'definition'),
+}
+
+# Library-wide search; same markers as SearchController so TextService can swap in <mark>
+LIBRARY_QUERIES = {
+    'commentaries_fts': '''SELECT module, verse_id, snippet(commentaries_fts, 0, '[[MARK]]', '[[/MARK]]', '...', 24)
+                           FROM commentaries_fts WHERE commentaries_fts MATCH ? ORDER BY rank LIMIT ?''',
+    'dictionaries_fts': '''SELECT module, highlight(dictionaries_fts, 0, '[[MARK]]', '[[/MARK]]'),
+                                  snippet(dictionaries_fts, 1, '[[MARK]]', '[[/MARK]]', '...', 24)
+                           FROM dictionaries_fts WHERE dictionaries_fts MATCH ? ORDER BY rank LIMIT ?''',
+    'lexicons_fts': '''SELECT id, highlight(lexicons_fts, 1, '[[MARK]]', '[[/MARK]]'),
+                              snippet(lexicons_fts, 2, '[[MARK]]', '[[/MARK]]', '...', 24)
+                       FROM lexicons_fts WHERE lexicons_fts MATCH ? ORDER BY rank LIMIT ?''',
+}
+
+def library_create_sql(index, tokenizer):
+    return f'CREATE VIRTUAL TABLE {index} USING fts5({", ".join(LIBRARY_INDEXES[index])}, tokenize="{TOKENIZERS[tokenizer]}")'
+
+def library_sources(c):
+    # {index: {module: (sql, params)}}; each query yields (key, *columns) with key < 2**32
+    tables = {name for (name,) in c.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    sources = {index: {} for index in LIBRARY_INDEXES}
+    for table in sorted(tables):
+        if table.startswith('commentary_'):
+            module = table[len('commentary_'):].upper()
+            sources['commentaries_fts'][module] = (f"SELECT verse_id, text, verse_id, ? FROM {table} ORDER BY verse_id", (module,))
+    if 'dictionaries' in tables:
+        for (module,) in c.execute("SELECT DISTINCT module FROM dictionaries ORDER BY module").fetchall():
+            sources['dictionaries_fts'][module] = ('''SELECT row_number() OVER (ORDER BY rowid), topic, definition, module
+                                                      FROM dictionaries WHERE module = ? ORDER BY rowid''', (module,))
+    if 'lexicons' in tables:
+        # transliteration only exists once import_transliterations has run
+        translit = 'transliteration' if any(row[1] == 'transliteration' for row in c.execute("PRAGMA table_info(lexicons)")) else 'NULL'
+        sources['lexicons_fts']['LEXICONS'] = (f"SELECT row_number() OVER (ORDER BY id), id, {translit}, definition FROM lexicons ORDER BY id", ())
+    return sources
+
+def slot_range(slot):
+    return slot << SLOT_SHIFT, ((slot + 1) << SLOT_SHIFT) - 1
+
+def sync_library_index(c, index, tokenizer, modules, full=False):
+    # modules: {module: (sql, params)}. Returns [added, changed, removed]
+    row = c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (index,)).fetchone()
+    if full or row is None or row[0] != library_create_sql(index, tokenizer):
+        c.execute(f"DROP TABLE IF EXISTS {index}")
+        c.execute(library_create_sql(index, tokenizer))
+        c.execute(f"DELETE FROM {LIBRARY_STATE} WHERE index_name = ?", (index,))
+    indexed = {module: (slot, rows, sig) for module, slot, rows, sig in
+               c.execute(f"SELECT module, slot, rows, signature FROM {LIBRARY_STATE} WHERE index_name = ?", (index,)).fetchall()}
+
+    counts = [0, 0, 0]
+    for module in sorted(set(indexed) - set(modules)):
+        c.execute(f"DELETE FROM {index} WHERE rowid BETWEEN ? AND ?", slot_range(indexed[module][0]))
+        c.execute(f"DELETE FROM {LIBRARY_STATE} WHERE index_name = ? AND module = ?", (index, module))
+        counts[2] += 1
+
+    names = [col.split()[0] for col in LIBRARY_INDEXES[index]]
+    insert = f"INSERT INTO {index} (rowid, {', '.join(names)}) VALUES ({', '.join('?' * (len(names) + 1))})"
+    used = {slot for slot, _, _ in indexed.values()}
+    rc = c.connection.cursor() # c is busy with the inserts
+    for module, (sql, params) in sorted(modules.items()):
+        rows, sig = rows_signature(rc.execute(sql, params))
+        if module in indexed:
+            slot = indexed[module][0]
+            if indexed[module][1:] == (rows, sig): continue
+            c.execute(f"DELETE FROM {index} WHERE rowid BETWEEN ? AND ?", slot_range(slot))
+            counts[1] += 1
+        else:
+            slot = min(set(range(len(used) + 1)) - used)
+            used.add(slot)
+            counts[0] += 1
+        start = time.perf_counter()
+        base = slot << SLOT_SHIFT
+        c.executemany(insert, ((base + row[0],) + row[1:] for row in rc.execute(sql, params)))
+        c.execute(f"INSERT OR REPLACE INTO {LIBRARY_STATE} (index_name, module, slot, rows, signature) VALUES (?, ?, ?, ?, ?)",
+                  (index, module, slot, rows, sig))
+        print(f"  {index} {module}: {rows} rows in {time.perf_counter() - start:.2f}s")
+    return counts
+
+def setup_library_index(db_path, tokenizer='porter', full=False):
+    print(f"Setting up library search on {db_path} ({tokenizer})...")
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute(f'''CREATE TABLE IF NOT EXISTS {LIBRARY_STATE} (
+                    index_name TEXT,
+                    module TEXT,
+                    slot INTEGER,
+                    rows INTEGER,
+                    signature TEXT,
+                    PRIMARY KEY (index_name, module)
                 )''')
-    
-    # 2. Populate FTS Index
-    print("Indexing verses... this might take a moment.")
-    c.execute('''INSERT INTO verses_fts (rowid, text, book_id, chapter, verse, version)
-                 SELECT id, text, book_id, chapter, verse, version FROM verses''')
-                 
-    # 3. Optimize
-    c.execute("INSERT INTO verses_fts(verses_fts) VALUES('optimize')")
-    
+    start = time.perf_counter()
+    for index, modules in library_sources(c).items():
+        added, changed, removed = sync_library_index(c, index, tokenizer, modules, full)
+        if added or changed or removed:
+            c.execute(f"INSERT INTO {index}({index}) VALUES('optimize')")
+            print(f"  {index}: {added} added, {changed} changed, {removed} removed")
     conn.commit()
     conn.close()
-    print("Search Index Ready! 🚀")
+    print(f"Library search ready in {time.perf_counter() - start:.2f}s. 📚")
+
+def search_library(c, query, limit=20):
+    # {index: rows} across every library index present
+    results = {}
+    for index, sql in LIBRARY_QUERIES.items():
+        if c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (index,)).fetchone():
+            results[index] = c.execute(sql, (query, limit)).fetchall()
+    return results
+
+# --- Comparison ---
+
+def database_size(c):
+    return c.execute("PRAGMA page_count").fetchone()[0] * c.execute("PRAGMA page_size").fetchone()[0]
+
+def time_queries(c, version, runs=SAMPLE_RUNS):
+    # Median milliseconds for count + first page over the sample terms
+    timings = []
+    for term in SAMPLE_TERMS:
+        for _ in range(runs):
+            start = time.perf_counter()
+            c.execute(COUNT_QUERY, (term, version)).fetchone()
+            c.execute(PAGE_QUERY, (term, version)).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings)
+
+def compare_options(db_path, version='KJV'):
+    # Builds every mode/tokenizer pair on a scratch copy of verses + books and
+    # prints index size, build time and query latency for each
+    workdir = tempfile.mkdtemp(prefix='fts_compare_')
+    results = []
+    try:
+        base = os.path.join(workdir, 'base.db')
+        conn = sqlite3.connect(base)
+        conn.execute("ATTACH DATABASE ? AS src", (db_path,))
+        for table in ('verses', 'books'): # Same schema, so verses.id stays the rowid
+            conn.execute(conn.execute("SELECT sql FROM src.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0])
+            conn.execute(f"INSERT INTO main.{table} SELECT * FROM src.{table}")
+        conn.commit()
+        conn.execute("DETACH DATABASE src")
+        conn.execute("VACUUM")
+        conn.close()
+
+        for mode in MODES:
+            for tokenizer in TOKENIZERS:
+                path = os.path.join(workdir, f"{mode}_{tokenizer}.db")
+                shutil.copy(base, path)
+                conn = sqlite3.connect(path)
+                c = conn.cursor()
+                before = database_size(c)
+                start = time.perf_counter()
+                c.execute(create_sql(mode, tokenizer))
+                for (v,) in c.execute("SELECT DISTINCT version FROM verses").fetchall():
+                    index_version(c, v)
+                c.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('optimize')")
+                conn.commit()
+                build = time.perf_counter() - start
+                size = database_size(c) - before
+                if mode == 'contentless':
+                    latency = None # SearchController's version filter and highlight() need stored content
+                else:
+                    latency = time_queries(c, version)
+                conn.close()
+                os.remove(path)
+                results.append((mode, tokenizer, size, build, latency))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'mode':<12} {'tokenizer':<10} {'index MB':>9} {'build s':>8} {'query p50 ms':>13} {'max ms':>8}")
+    for mode, tokenizer, size, build, latency in results:
+        p50, worst = (f"{latency[0]:.2f}", f"{latency[1]:.2f}") if latency else ('n/a', 'n/a')
+        print(f"{mode:<12} {tokenizer:<10} {size / 1024 / 1024:>9.1f} {build:>8.2f} {p50:>13} {worst:>8}")
+    return results
 
 if __name__ == "__main__":
-    setup_search_index('bible_app.db')
+    parser = argparse.ArgumentParser(description="Build or update the full-text indexes (verses_fts and the library indexes)")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--mode', choices=MODES, default='external', help="Where FTS5 reads verse text from (default external)")
+    parser.add_argument('--tokenizer', choices=sorted(TOKENIZERS), default='porter')
+    parser.add_argument('--full', action='store_true', help="Drop and rebuild the indexes")
+    parser.add_argument('--compare', action='store_true', help="Report size, build time and latency for every mode/tokenizer (scratch copy)")
+    parser.add_argument('--query', help="Run a library-wide search and print the hits with timing")
+    args = parser.parse_args()
+    if args.compare:
+        compare_options(args.db)
+    elif args.query:
+        conn = sqlite3.connect(args.db)
+        start = time.perf_counter()
+        results = search_library(conn.cursor(), args.query)
+        elapsed = (time.perf_counter() - start) * 1000
+        for index, rows in results.items():
+            print(f"{index}: {len(rows)} hit(s)")
+            for row in rows[:5]:
+                print("  " + " | ".join(str(v) for v in row))
+        print(f"Searched {len(results)} indexes in {elapsed:.1f} ms")
+        conn.close()
+    else:
+        setup_search_index(args.db, args.mode, args.tokenizer, args.full)
+        setup_library_index(args.db, args.tokenizer, args.full)
@@ -0,0 +1,338 @@
+import sqlite3
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+
+from setup_search import rows_signature
+
+# Row-level delta patches between two builds of a shard (build_shards.py).
+#
+#   python shard_delta.py diff old/commentaries.db new/commentaries.db commentaries.lumd
+#   python shard_delta.py apply commentaries.db commentaries.lumd
+#
+# A patch is zlib-compressed JSON lines, one record each, in the order the
+# applier replays them:
+#
+#   {"format", "base", "target"}          header; base/target are logical signatures
+#   ["table", name, columns, key, sql]    following rows belong to this table;
+#                                         sql is set when the table is (re)created
+#   ["-", [key values]]                   delete one row
+#   ["+", [row values]]                   insert or replace one row
+#   ["drop", name] / ["index", name, sql] schema changes (sql None drops the index)
+#   ["end", {table: [upserts, deletes]}]
+#
+# Rows are compared on their primary key (rowid for INTEGER PRIMARY KEY
+# tables), so only changed rows travel: one corrected commentary module costs
+# its changed entries, not the shard. Tables without a key (sqlite_stat1,
+# sqlite_sequence) are sent whole when they differ. External-content FTS
+# indexes are not diffed; the applier updates them row by row from the
+# content table's changes. Blobs are {"b": base64}.
+#
+# The signature is a hash over every diffed table's schema and rows, not the
+# file bytes, which VACUUM and page layout change. apply checks the database
+# against the patch's base first and against its target before committing,
+# all in one transaction.
+
+# --- CONFIG ---
+DELTA_FORMAT = 1
+COMPRESS_LEVEL = 9
+FTS_SHADOWS = ('data', 'idx', 'docsize', 'config', 'content')
+FTS_OPTION = re.compile(r"(\w+)\s*=\s*('[^']*'|\"[^\"]*\"|\w+)")
+
+# --- Schema ---
+
+def fts_options(sql):
+    # CREATE VIRTUAL TABLE x USING fts5(col, col UNINDEXED, content='t', ...) -> (columns, {option: value})
+    body = sql[sql.index('(') + 1:sql.rindex(')')]
+    columns, options = [], {}
+    for part in re.findall(r"(?:[^,'\"]|'[^']*'|\"[^\"]*\")+", body):
+        part = part.strip()
+        m = FTS_OPTION.fullmatch(part)
+        if m:
+            options[m.group(1).lower()] = m.group(2).strip('\'"')
+        elif part:
+            columns.append(part.split()[0])
+    return columns, options
+
+def schema(c, db='main'):
+    # -> (tables {name: sql}, indexes {name: (table, sql)}, external FTS {fts: (content, rowid column, columns)})
+    rows = c.execute(f"SELECT type, name, tbl_name, sql FROM {db}.sqlite_master WHERE sql IS NOT NULL ORDER BY name").fetchall()
+    tables, indexes, external = {}, {}, {}
+    fts = {name for kind, name, _, sql in rows if kind == 'table' and re.search(r'USING\s+fts5', sql, re.I)}
+    shadows = {f"{name}_{suffix}" for name in fts for suffix in FTS_SHADOWS}
+    for kind, name, table, sql in rows:
+        if kind == 'index':
+            indexes[name] = (table, sql)
+        elif kind == 'table' and name not in shadows:
+            if name in fts:
+                columns, options = fts_options(sql)
+                if options.get('content'):
+                    external[name] = (options['content'], options.get('content_rowid', 'rowid'), columns)
+                    continue
+            tables[name] = sql
+    for name in ('sqlite_stat1', 'sqlite_sequence'):
+        if c.execute(f"SELECT 1 FROM {db}.sqlite_master WHERE name = ?", (name,)).fetchone():
+            tables[name] = None # created by SQLite itself
+    return tables, indexes, external
+
+def table_key(c, table, db='main'):
+    # -> (columns, key columns); [] when rows have no key to match on (sqlite_stat1, sqlite_sequence)
+    info = c.execute(f"PRAGMA {db}.table_info({table})").fetchall()
+    columns = [row[1] for row in info]
+    pk = [row[1] for row in sorted(info, key=lambda r: r[5]) if row[5]]
+    if table.startswith('sqlite_'):
+        return columns, []
+    sql = c.execute(f"SELECT sql FROM {db}.sqlite_master WHERE name = ?", (table,)).fetchone()[0] or ''
+    if sql.upper().startswith('CREATE VIRTUAL'):
+        return ['rowid'] + columns, ['rowid']
+    if len(pk) == 1 and 'WITHOUT ROWID' not in sql.upper() and any(r[1] == pk[0] and r[2].upper() == 'INTEGER' for r in info):
+        return columns, pk # the column is the rowid
+    if pk:
+        return columns, pk
+    return columns, []
+
+def _select(table, columns, key, db):
+    cols = ', '.join(columns)
+    order = ', '.join(key or columns)
+    return f"SELECT {cols} FROM {db}.{table} ORDER BY {order}"
+
+def signature(c, db='main'):
+    # Logical fingerprint of a shard: schema plus every diffed table's rows in key order
+    tables, indexes, external = schema(c, db)
+    digest = hashlib.sha256()
+    for name in sorted(tables):
+        columns, key = table_key(c, name, db)
+        rows, sig = rows_signature(c.execute(_select(name, columns, key, db)))
+        digest.update(f"{name}\x1f{tables[name]}\x1f{rows}\x1f{sig}\x1e".encode('utf-8'))
+    for name in sorted(indexes):
+        digest.update(f"{name}\x1f{indexes[name][1]}\x1e".encode('utf-8'))
+    for name in sorted(external):
+        digest.update(f"{name}\x1f{external[name]}\x1e".encode('utf-8'))
+    return digest.hexdigest()
+
+# --- Encoding ---
+
+def _encode(value):
+    return {'b': base64.b64encode(value).decode('ascii')} if isinstance(value, bytes) else value
+
+def _decode(value):
+    return base64.b64decode(value['b']) if isinstance(value, dict) else value
+
+class DeltaWriter:
+    def __init__(self, path):
+        self.f = open(path, 'wb')
+        self.z = zlib.compressobj(COMPRESS_LEVEL)
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        self.f.write(self.z.compress(line.encode('utf-8')))
+
+    def close(self):
+        self.f.write(self.z.flush())
+        self.f.close()
+
+def read_delta(path):
+    # Yields the records of a patch, decompressing as it goes
+    z = zlib.decompressobj()
+    pending = b''
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            pending += z.decompress(chunk)
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                yield json.loads(line)
+    pending += z.flush()
+    for line in pending.split(b'\n'):
+        if line: yield json.loads(line)
+
+# --- Diff ---
+
+def diff_table(c, out, name, sql, recreate):
+    # Writes the table's records; returns (upserts, deletes)
+    columns, key = table_key(c, name)
+    cols = ', '.join(columns)
+    out.write(['table', name, columns, key, sql if recreate else None])
+    if recreate:
+        upserts = 0
+        for row in c.execute(_select(name, columns, key, 'main')):
+            out.write(['+', [_encode(v) for v in row]])
+            upserts += 1
+        return upserts, 0
+    old_columns, old_key = table_key(c, name, 'old')
+    if not key or old_columns != columns or old_key != key:
+        # No key to match rows on: send the table whole if anything differs
+        changed = any(c.execute(f"SELECT 1 FROM (SELECT {cols} FROM {a}.{name} EXCEPT SELECT {cols} FROM {b}.{name}) LIMIT 1").fetchone()
+                      for a, b in (('main', 'old'), ('old', 'main')))
+        if not changed:
+            return 0, 0
+        out.write(['-', None]) # clear the table
+        upserts = 0
+        for row in c.execute(_select(name, columns, key, 'main')):
+            out.write(['+', [_encode(v) for v in row]])
+            upserts += 1
+        return upserts, 1
+    keys = ', '.join(key)
+    deletes = 0
+    for row in c.execute(f"SELECT {keys} FROM old.{name} EXCEPT SELECT {keys} FROM main.{name} ORDER BY {keys}"):
+        out.write(['-', [_encode(v) for v in row]])
+        deletes += 1
+    upserts = 0
+    for row in c.execute(f"SELECT {cols} FROM main.{name} EXCEPT SELECT {cols} FROM old.{name} ORDER BY {keys}"):
+        out.write(['+', [_encode(v) for v in row]])
+        upserts += 1
+    return upserts, deletes
+
+def diff(old_path, new_path, out_path):
+    start = time.perf_counter()
+    conn = sqlite3.connect(f"file:{os.path.abspath(new_path)}?mode=ro", uri=True)
+    c = conn.cursor()
+    c.execute("ATTACH DATABASE ? AS old", (f"file:{os.path.abspath(old_path)}?mode=ro",))
+    new_tables, new_indexes, new_external = schema(c, 'main')
+    old_tables, old_indexes, old_external = schema(c, 'old')
+
+    out = DeltaWriter(out_path)
+    out.write({'format': DELTA_FORMAT, 'base': signature(c, 'old'), 'target': signature(c, 'main')})
+    stats = {}
+    recreated = set()
+    for name in sorted(set(old_tables) - set(new_tables)) + sorted(set(old_external) - set(new_external)):
+        out.write(['drop', name])
+    for name in sorted(set(old_indexes) - set(new_indexes)):
+        out.write(['index', name, None])
+    for name, sql in new_tables.items():
+        recreate = name not in old_tables or old_tables[name] != sql
+        if recreate: recreated.add(name)
+        stats[name] = diff_table(c, out, name, sql, recreate)
+    # External-content FTS: the applier keeps them in step with their content tables
+    for name, spec in new_external.items():
+        if old_external.get(name) != spec:
+            sql = c.execute("SELECT sql FROM main.sqlite_master WHERE name = ?", (name,)).fetchone()[0]
+            out.write(['fts', name, sql])
+    # A recreated table lost its indexes along with the old copy
+    for name, (table, sql) in new_indexes.items():
+        if old_indexes.get(name) != (table, sql) or table in recreated:
+            out.write(['index', name, sql])
+    stats = {name: list(counts) for name, counts in stats.items() if any(counts)}
+    out.write(['end', stats])
+    out.close()
+    conn.close()
+
+    print(f"{os.path.basename(out_path)}: {os.path.getsize(out_path) / 1024:.1f} KB in {time.perf_counter() - start:.1f}s")
+    for name, (upserts, deletes) in stats.items():
+        print(f"  {name}: {upserts} upserts, {deletes} deletes")
+    return stats
+
+# --- Apply ---
+
+class FtsSync:
+    # Row-by-row upkeep of external-content FTS indexes whose content table is being patched
+    def __init__(self, c, external):
+        self.c = c
+        self.by_content = {}
+        for name, (content, rowid, columns) in external.items():
+            self.by_content.setdefault(content, []).append((name, rowid, columns))
+
+    def clear(self, table):
+        for name, _, _ in self.by_content.get(table, []):
+            self.c.execute(f"INSERT INTO {name}({name}) VALUES('delete-all')")
+
+    def remove(self, table, where, params):
+        for name, rowid, columns in self.by_content.get(table, []):
+            cols = ', '.join(columns)
+            for row in self.c.execute(f"SELECT {rowid}, {cols} FROM main.{table} WHERE {where}", params).fetchall():
+                self.c.execute(f"INSERT INTO {name}({name}, rowid, {cols}) VALUES ('delete', {', '.join('?' * len(row))})", row)
+
+    def add(self, table, where, params):
+        for name, rowid, columns in self.by_content.get(table, []):
+            cols = ', '.join(columns)
+            self.c.execute(f"INSERT INTO {name}(rowid, {cols}) SELECT {rowid}, {cols} FROM main.{table} WHERE {where}", params)
+
+def apply_delta(db_path, delta_path, verify=True):
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    c = conn.cursor()
+    records = read_delta(delta_path)
+    header = next(records)
+    if header.get('format') != DELTA_FORMAT:
+        raise ValueError(f"Unsupported delta format {header.get('format')}")
+
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        if verify and signature(c) != header['base']:
+            raise ValueError(f"{db_path} is not the build this patch was made from")
+        fts = FtsSync(c, schema(c)[2])
+        table = columns = key = None
+        fresh = False # table was just (re)created: nothing to replace
+        stats = {}
+        for record in records:
+            op = record[0]
+            if op == 'table':
+                _, table, columns, key, sql = record
+                fresh = bool(sql)
+                if fresh:
+                    fts.clear(table)
+                    c.execute(f"DROP TABLE IF EXISTS main.{table}")
+                    c.execute(sql)
+                insert = f"INSERT INTO main.{table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+                match = ' AND '.join(f"{k} = ?" for k in key)
+            elif op == '-':
+                if record[1] is None:
+                    fts.clear(table)
+                    c.execute(f"DELETE FROM main.{table}")
+                else:
+                    params = [_decode(v) for v in record[1]]
+                    fts.remove(table, match, params)
+                    c.execute(f"DELETE FROM main.{table} WHERE {match}", params)
+            elif op == '+':
+                row = [_decode(v) for v in record[1]]
+                params = [row[columns.index(k)] for k in key]
+                if key and not fresh:
+                    fts.remove(table, match, params)
+                    c.execute(f"DELETE FROM main.{table} WHERE {match}", params)
+                c.execute(insert, row)
+                if key:
+                    fts.add(table, match, params)
+            elif op == 'drop':
+                c.execute(f"DROP TABLE IF EXISTS main.{record[1]}")
+            elif op == 'index':
+                c.execute(f"DROP INDEX IF EXISTS main.{record[1]}")
+                if record[2]: c.execute(record[2])
+            elif op == 'fts':
+                c.execute(f"DROP TABLE IF EXISTS main.{record[1]}")
+                c.execute(record[2])
+                c.execute(f"INSERT INTO {record[1]}({record[1]}) VALUES('rebuild')")
+                fts = FtsSync(c, schema(c)[2])
+            elif op == 'end':
+                stats = record[1]
+        if verify and signature(c) != header['target']:
+            raise ValueError("Patched database does not match the patch's target build")
+        c.execute("COMMIT")
+    except BaseException:
+        c.execute("ROLLBACK")
+        conn.close()
+        raise
+    conn.close()
+    changed = sum(sum(counts) for counts in stats.values())
+    print(f"Applied {os.path.basename(delta_path)} to {db_path}: {changed} row changes in {time.perf_counter() - start:.1f}s. ✅")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Row-level delta patches between two builds of a shard")
+    sub = parser.add_subparsers(dest='command', required=True)
+    d = sub.add_parser('diff', help="Write the patch that turns OLD into NEW")
+    d.add_argument('old')
+    d.add_argument('new')
+    d.add_argument('out')
+    a = sub.add_parser('apply', help="Replay a patch onto a database in one transaction")
+    a.add_argument('db')
+    a.add_argument('delta')
+    a.add_argument('--no-verify', action='store_true', help="Skip the base/target signature checks")
+    args = parser.parse_args()
+    if args.command == 'diff':
+        diff(args.old, args.new, args.out)
+    else:
+        apply_delta(args.db, args.delta, not args.no_verify)
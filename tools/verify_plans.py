@@ -0,0 +1,229 @@
+import sqlite3
+import argparse
+import os
+import sys
+
+# Post-build check: refresh planner statistics, then make sure every query the
+# app runs is answered through an index.
+#
+#   python verify_plans.py                          (bible_app.db and the shards in ../assets/data)
+#   python verify_plans.py --shards out --only core extras --no-analyze
+#
+# Each database gets ANALYZE and PRAGMA optimize first, so the planner sees the
+# statistics it will see in the app. Then every query shape that
+# BibleController, StudyController and SearchController send (as Laravel's
+# query builder writes them) runs under EXPLAIN QUERY PLAN. The queries that
+# tools/ runs against bible_app.db get the same treatment. A query fails if
+# its plan SCANs a base table, or if it does not use the index listed next to
+# it. Any failure gives a non-zero exit code, so a schema change cannot quietly
+# turn a chapter load into a full table read.
+#
+# Scans of verses_fts (a virtual table: the FTS index does the lookup) and temp
+# B-trees for ORDER BY (they sort only the rows already found) are fine.
+
+# --- CONFIG ---
+DB_PATH = 'bible_app.db'
+SHARD_DIR = '../assets/data'
+SHARDS = ('core', 'versions', 'commentaries', 'extras')
+
+# Sample parameters; EXPLAIN QUERY PLAN only needs the right types
+BOOK, BOOK_ID, CHAPTER, VERSE, VERSE_ID = 'John', 43, 3, 16, 26137
+TOPIC, MODULE, STRONGS = 'Aaron', 'EASTON', 'G25'
+SEARCH = 'love'
+SLOT_END = (1 << 24) - 1 # rowid bounds of search slot 0
+
+ANY_SCAN = 'scan' # expect value: reads every row on purpose
+
+# (label, sql, params, expected index), one list per shard. The core
+# connection has versions.db attached as "versions", like the search query
+# assumes.
+SHARD_QUERIES = {
+    'core': [
+        ('Book by name', 'select * from "books" where "name" = ? limit 1', (BOOK,), None), # UNIQUE or books_name_index
+        ('KJV chapter', 'select * from "verses" where "book_id" = ? and "chapter" = ? and "version" = ?',
+         (BOOK_ID, CHAPTER, 'KJV'), 'verses_book_id_chapter_verse_index'),
+        ('KJV verse range', 'select * from "verses" where "book_id" = ? and "chapter" = ? and "version" = ? and "verse" between ? and ? order by "verse" asc',
+         (BOOK_ID, CHAPTER, 'KJV', VERSE, VERSE + 2), 'verses_book_id_chapter_verse_index'),
+        ('KJV verse ID', 'select "id" from "verses" where "book_id" = ? and "chapter" = ? and "verse" = ? limit 1',
+         (BOOK_ID, CHAPTER, VERSE), 'verses_book_id_chapter_verse_index'),
+        ('Cross-reference target', 'select * from "verses" where "verses"."id" = ? limit 1', (VERSE_ID,), 'PRIMARY KEY'),
+        ('Cross-reference target book', 'select * from "books" where "books"."id" in (?)', (BOOK_ID,), 'PRIMARY KEY'),
+        ('Version list', 'select distinct "version" from "verses"', (), ANY_SCAN), # getVersions: one pass by design
+        ('KJV search slot', 'SELECT slot FROM main.search_key_versions WHERE version = ?', ('KJV',), 'sqlite_autoindex_search_key_versions_1'),
+        ('KJV search term count', 'SELECT docs FROM main.search_terms WHERE version = ? AND term = ?', ('KJV', SEARCH), 'PRIMARY KEY'),
+        ('KJV search count', 'SELECT COUNT(*) as total FROM main.verses_fts_keys WHERE verses_fts_keys MATCH ? AND rowid > ? AND rowid <= ?',
+         (SEARCH, -1, SLOT_END), None),
+        ('KJV search page', '''SELECT v.rowid as search_key, b.name as book_name, v.chapter, v.verse, highlight(verses_fts_keys, 0, '[[MARK]]', '[[/MARK]]') as text
+                               FROM main.verses_fts_keys v JOIN main.books b ON v.book_id = b.id
+                               WHERE v.verses_fts_keys MATCH ? AND v.rowid > ? AND v.rowid <= ?
+                               ORDER BY v.rowid LIMIT 200 OFFSET ?''', (SEARCH, -1, SLOT_END, 0), None),
+        ('KJV chapter cache', 'select "payload" from "chapter_cache" where "version" = ? and "book_id" = ? and "chapter" = ? and "format" = ? limit 1',
+         ('KJV', BOOK_ID, CHAPTER, 3), 'PRIMARY KEY'),
+        ('Version search slot', 'SELECT slot FROM versions.search_key_versions WHERE version = ?', ('ASV',), 'sqlite_autoindex_search_key_versions_1'),
+        ('Version search term count', 'SELECT docs FROM versions.search_terms WHERE version = ? AND term = ?', ('ASV', SEARCH), 'PRIMARY KEY'),
+        ('Version search count', 'SELECT COUNT(*) as total FROM versions.verses_fts_keys WHERE verses_fts_keys MATCH ? AND rowid > ? AND rowid <= ?',
+         (SEARCH, -1, SLOT_END), None),
+        ('Version search page', '''SELECT v.rowid as search_key, b.name as book_name, v.chapter, v.verse, highlight(verses_fts_keys, 0, '[[MARK]]', '[[/MARK]]') as text
+                                   FROM versions.verses_fts_keys v JOIN main.books b ON v.book_id = b.id
+                                   WHERE v.verses_fts_keys MATCH ? AND v.rowid > ? AND v.rowid <= ?
+                                   ORDER BY v.rowid LIMIT 200 OFFSET ?''', (SEARCH, -1, SLOT_END, 0), None),
+    ],
+    'versions': [
+        ('Version chapter', 'select * from "verses" where "book_id" = ? and "chapter" = ? and "version" = ?',
+         (BOOK_ID, CHAPTER, 'ASV'), 'verses_version_book_id_chapter_verse_index'),
+        ('Version verse range', 'select * from "verses" where "book_id" = ? and "chapter" = ? and "version" = ? and "verse" between ? and ? order by "verse" asc',
+         (BOOK_ID, CHAPTER, 'ASV', VERSE, VERSE + 2), 'verses_version_book_id_chapter_verse_index'),
+        ('Version list', 'select distinct "version" from "verses"', (), ANY_SCAN),
+        ('Version chapter cache', 'select "payload" from "chapter_cache" where "version" = ? and "book_id" = ? and "chapter" = ? and "format" = ? limit 1',
+         ('ASV', BOOK_ID, CHAPTER, 3), 'PRIMARY KEY'),
+    ],
+    'commentaries': [
+        ('Modules for a verse', 'select "c"."abbreviation" from "commentary_entries" as "ce" inner join "commentaries" as "c" on "ce"."commentary_id" = "c"."id" where "ce"."verse_id" = ?',
+         (VERSE_ID,), 'commentary_entries_verse_id_index'),
+        ('Commentary entry', 'select * from "commentary_entries" where "verse_id" = ? and exists (select * from "commentaries" where "commentary_entries"."commentary_id" = "commentaries"."id" and "abbreviation" = ?) limit 1',
+         (VERSE_ID, 'mhc'), 'commentary_entries_verse_id_index'),
+        ('Commentary list', 'select "abbreviation" from "commentaries"', (), ANY_SCAN), # one row per module
+        ('Module ids', 'select "abbreviation", "id" from "commentaries" order by "id" asc', (), ANY_SCAN),
+        ('Chapter module masks', 'select "mask", "verse_id" from "verse_modules" where "verse_id" in (?, ?, ?)',
+         (VERSE_ID, VERSE_ID + 1, VERSE_ID + 2), 'PRIMARY KEY'),
+    ],
+    'extras': [
+        ('Cross-references', 'select * from "cross_references" where "from_verse_id" = ?', (VERSE_ID,),
+         'cross_references_from_verse_id_to_verse_id_index'),
+        ('Interlinear words', 'select * from "verse_words" as "vw" left join "lexicon" as "l" on "vw"."strongs_id" = "l"."id" where "vw"."verse_id" = ? order by "vw"."position" asc',
+         (VERSE_ID,), 'PRIMARY KEY'),
+        ('Lexicon entry', 'select "definition" from "lexicon" where "id" = ? limit 1', (STRONGS,), 'sqlite_autoindex_lexicon_1'),
+        ('Dictionary entry', 'select "definition" from "dictionaries" where "topic" = ? and "module" = ? limit 1',
+         (TOPIC, MODULE), 'dictionaries_topic_module_index'),
+    ],
+}
+
+# The same lookups against the staging database (chapter_bundles, search_pages,
+# xref_graph and the importers). {commentary} is the first commentary_<module> table.
+STAGING_QUERIES = [
+    ('Chapter', 'SELECT verse, coalesce(text, \'\') FROM verses WHERE version = ? AND book_id = ? AND chapter = ? ORDER BY verse',
+     ('KJV', BOOK_ID, CHAPTER), 'idx_version_loc'),
+    ('Verse ID', 'SELECT id FROM verses WHERE version = ? AND book_id = ? AND chapter = ? AND verse = ?',
+     ('KJV', BOOK_ID, CHAPTER, VERSE), 'idx_version_loc'),
+    ('Cross-references', 'SELECT to_start, to_end FROM cross_references WHERE from_id = ?', (VERSE_ID,), 'idx_xref_from'),
+    ('Dictionary entry', 'SELECT definition FROM dictionaries WHERE topic = ? AND module = ?', (TOPIC, MODULE), 'idx_dict_topic'),
+    ('Lexicon entry', 'SELECT definition FROM lexicons WHERE id = ?', (STRONGS,), 'sqlite_autoindex_lexicons_1'),
+    ('Commentary entry', 'SELECT html FROM {commentary} WHERE verse_id = ?', (VERSE_ID,), 'PRIMARY KEY'),
+]
+
+# --- Plans ---
+
+def query_plan(c, sql, params=()):
+    # EXPLAIN QUERY PLAN detail lines, e.g. 'SEARCH verses USING INDEX idx_version_loc (version=? AND ...)'
+    return [row[3] for row in c.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+def full_scans(plan):
+    # 'SCAN verses', 'SCAN ce USING COVERING INDEX ...'; not virtual tables or constant rows
+    return [step for step in plan
+            if step.startswith('SCAN ') and 'VIRTUAL TABLE' not in step and step != 'SCAN CONSTANT ROW']
+
+def check_query(c, label, sql, params, expect):
+    # -> (ok, plan, problem)
+    try:
+        plan = query_plan(c, sql, params)
+    except sqlite3.OperationalError as e:
+        return False, [], str(e)
+    if expect == ANY_SCAN:
+        return True, plan, None
+    scans = full_scans(plan)
+    if scans:
+        return False, plan, f"full scan ({'; '.join(scans)})"
+    if expect and not any(expect in step for step in plan):
+        return False, plan, f"{expect} not used"
+    return True, plan, None
+
+def analyze(conn):
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    conn.commit()
+
+def run_checks(conn, name, queries, verbose=False):
+    # Prints one line per query; returns the number that failed
+    c = conn.cursor()
+    failed = 0
+    for label, sql, params, expect in queries:
+        ok, plan, problem = check_query(c, label, sql, params, expect)
+        mark = 'ok' if ok else 'FAIL'
+        note = ' (reads every row by design)' if expect == ANY_SCAN else ''
+        print(f"  [{mark}] {name}: {label}{note}" + (f" -> {problem}" if problem else ''))
+        if verbose or not ok:
+            for step in plan:
+                print(f"         {step}")
+        failed += not ok
+    return failed
+
+# --- Databases ---
+
+def table_exists(c, name):
+    return c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+def verify_staging(db_path=DB_PATH, analyze_first=True, verbose=False):
+    if not os.path.exists(db_path):
+        print(f"  {db_path} not found, skipping.")
+        return 0
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    if analyze_first:
+        analyze(conn)
+    commentary = c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'commentary\\_%' ESCAPE '\\' "
+                           "AND name NOT IN ('commentary_fts') ORDER BY name LIMIT 1").fetchone()
+    queries = []
+    for label, sql, params, expect in STAGING_QUERIES:
+        if '{commentary}' in sql:
+            if not commentary: continue
+            sql = sql.format(commentary=commentary[0])
+        table = sql.split(' FROM ', 1)[1].split()[0]
+        if table_exists(c, table):
+            queries.append((label, sql, params, expect))
+        else:
+            print(f"  [skip] {os.path.basename(db_path)}: {label} (no {table} table)")
+    failed = run_checks(conn, os.path.basename(db_path), queries, verbose)
+    conn.close()
+    return failed
+
+def verify_shards(names=SHARDS, shard_dir=SHARD_DIR, analyze_first=True, verbose=False):
+    failed = 0
+    for name in names:
+        path = os.path.join(shard_dir, f"{name}.db")
+        if not os.path.exists(path):
+            print(f"  {name}.db not found in {shard_dir}, skipping.")
+            continue
+        conn = sqlite3.connect(path)
+        if analyze_first:
+            analyze(conn)
+        queries = SHARD_QUERIES[name]
+        if name == 'core':
+            versions = os.path.join(shard_dir, 'versions.db')
+            if os.path.exists(versions):
+                conn.execute("ATTACH DATABASE ? AS versions", (f"file:{os.path.abspath(versions)}?mode=ro",))
+            else:
+                queries = [q for q in queries if 'versions.' not in q[1]]
+        failed += run_checks(conn, f"{name}.db", queries, verbose)
+        conn.close()
+    return failed
+
+def verify(db_path=DB_PATH, shard_dir=SHARD_DIR, names=SHARDS, staging=True, analyze_first=True, verbose=False):
+    print("Checking query plans" + (" (after ANALYZE)..." if analyze_first else "..."))
+    failed = verify_staging(db_path, analyze_first, verbose) if staging else 0
+    failed += verify_shards(names, shard_dir, analyze_first, verbose)
+    if failed:
+        print(f"{failed} queries no longer use an index. ❌")
+    else:
+        print("Every query uses an index. ✅")
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ANALYZE the built databases and fail if an app query plan scans a table")
+    parser.add_argument('--db', default=DB_PATH, help=f"Staging database (default {DB_PATH})")
+    parser.add_argument('--shards', default=SHARD_DIR, help=f"Shard directory (default {SHARD_DIR})")
+    parser.add_argument('--only', nargs='+', choices=list(SHARDS), default=list(SHARDS), help="Shards to check")
+    parser.add_argument('--no-staging', action='store_true', help="Check the shards only")
+    parser.add_argument('--no-analyze', action='store_true', help="Use the statistics already in each file")
+    parser.add_argument('--verbose', action='store_true', help="Print every plan, not just failing ones")
+    args = parser.parse_args()
+    sys.exit(1 if verify(args.db, args.shards, args.only, not args.no_staging, not args.no_analyze, args.verbose) else 0)
@@ -0,0 +1,171 @@
+import sqlite3
+import sys
+import time
+import heapq
+from array import array
+from collections import Counter
+
+from versification import KJV
+
+# Precomputed cross-reference graph (CSR adjacency), built by parse_cross_refs.
+#
+# cross_references keeps one row per range; here every range is expanded to
+# verse-level edges, deduplicated and packed into four uint32 arrays:
+#
+#   out_offsets[v] .. out_offsets[v + 1]  -> slice of out_targets (verses v points to)
+#   in_offsets[v]  .. in_offsets[v + 1]   -> slice of in_sources  (verses pointing to v)
+#
+# Offsets are indexed by verse ID (1-based, slot 0 unused), so a lookup is two
+# array reads. The arrays are stored little-endian as blobs in
+# cross_reference_graph; cross_reference_degree holds per-verse degrees for
+# SQL-side ranking (ORDER BY in_degree DESC uses idx_xref_in_degree).
+
+DB_PATH = 'bible_app.db'
+GRAPH_TABLE = 'cross_reference_graph'
+DEGREE_TABLE = 'cross_reference_degree'
+ARRAYS = ('out_offsets', 'out_targets', 'in_offsets', 'in_sources')
+
+def _to_blob(arr):
+    if sys.byteorder == 'big':
+        arr = array('I', arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+def _from_blob(blob):
+    arr = array('I')
+    arr.frombytes(blob)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+def _pack(lists):
+    # [[targets of 0], [targets of 1], ...] -> (offsets, flat)
+    offsets = array('I', [0])
+    flat = array('I')
+    for items in lists:
+        flat.extend(items)
+        offsets.append(len(flat))
+    return offsets, flat
+
+class XrefGraph:
+    def __init__(self, out_offsets, out_targets, in_offsets, in_sources):
+        self.out_offsets = out_offsets
+        self.out_targets = out_targets
+        self.in_offsets = in_offsets
+        self.in_sources = in_sources
+
+    @classmethod
+    def from_ranges(cls, rows, total=KJV.total):
+        # rows: (from_id, to_start, to_end) as stored in cross_references
+        out_sets = [set() for _ in range(total + 1)]
+        for from_id, to_start, to_end in rows:
+            out_sets[from_id].update(range(to_start, to_end + 1))
+        in_lists = [[] for _ in range(total + 1)]
+        out_lists = []
+        for verse_id, targets in enumerate(out_sets):
+            targets = sorted(targets)
+            out_lists.append(targets)
+            for t in targets:
+                in_lists[t].append(verse_id) # verse_id ascending, so already sorted
+        return cls(*_pack(out_lists), *_pack(in_lists))
+
+    @classmethod
+    def load(cls, c):
+        blobs = dict(c.execute(f"SELECT name, data FROM {GRAPH_TABLE}").fetchall())
+        return cls(*(_from_blob(blobs[name]) for name in ARRAYS))
+
+    def save(self, c):
+        c.execute(f"DROP TABLE IF EXISTS {GRAPH_TABLE}")
+        c.execute(f"CREATE TABLE {GRAPH_TABLE} (name TEXT PRIMARY KEY, data BLOB)")
+        c.executemany(f"INSERT INTO {GRAPH_TABLE} (name, data) VALUES (?, ?)",
+                      [(name, _to_blob(getattr(self, name))) for name in ARRAYS])
+        c.execute(f"DROP TABLE IF EXISTS {DEGREE_TABLE}")
+        c.execute(f'''CREATE TABLE {DEGREE_TABLE} (
+                        verse_id INTEGER PRIMARY KEY,
+                        out_degree INTEGER,
+                        in_degree INTEGER
+                    )''')
+        c.executemany(f"INSERT INTO {DEGREE_TABLE} (verse_id, out_degree, in_degree) VALUES (?, ?, ?)",
+                      ((v, self.out_degree(v), self.in_degree(v)) for v in range(1, self.total + 1)
+                       if self.out_degree(v) or self.in_degree(v)))
+        c.execute(f"CREATE INDEX idx_xref_in_degree ON {DEGREE_TABLE} (in_degree)")
+
+    @property
+    def total(self):
+        return len(self.out_offsets) - 2
+
+    @property
+    def edge_count(self):
+        return len(self.out_targets)
+
+    def _valid(self, verse_id):
+        return 0 < verse_id <= self.total
+
+    # --- Lookups ---
+
+    def targets(self, verse_id):
+        # Verses this one points to
+        if not self._valid(verse_id): return array('I')
+        return self.out_targets[self.out_offsets[verse_id]:self.out_offsets[verse_id + 1]]
+
+    def sources(self, verse_id):
+        # Verses pointing to this one (the reverse index)
+        if not self._valid(verse_id): return array('I')
+        return self.in_sources[self.in_offsets[verse_id]:self.in_offsets[verse_id + 1]]
+
+    def neighbours(self, verse_id, direction='both'):
+        if direction == 'out': return set(self.targets(verse_id))
+        if direction == 'in': return set(self.sources(verse_id))
+        return set(self.targets(verse_id)) | set(self.sources(verse_id))
+
+    def out_degree(self, verse_id):
+        if not self._valid(verse_id): return 0
+        return self.out_offsets[verse_id + 1] - self.out_offsets[verse_id]
+
+    def in_degree(self, verse_id):
+        if not self._valid(verse_id): return 0
+        return self.in_offsets[verse_id + 1] - self.in_offsets[verse_id]
+
+    def most_referenced(self, limit=20):
+        # [(verse_id, in_degree), ...] highest first
+        offsets = self.in_offsets
+        degrees = ((v, offsets[v + 1] - offsets[v]) for v in range(1, self.total + 1))
+        return heapq.nlargest(limit, degrees, key=lambda item: item[1])
+
+    def two_hop(self, verse_id, direction='both', limit=20):
+        # Related passages: verses two steps away that are not already direct
+        # neighbours, ranked by how many paths lead there
+        direct = self.neighbours(verse_id, direction)
+        paths = Counter()
+        for mid in direct:
+            paths.update(self.neighbours(mid, direction))
+        for v in direct | {verse_id}:
+            paths.pop(v, None)
+        return paths.most_common(limit)
+
+def build_graph(c, total=KJV.total):
+    rows = c.execute("SELECT from_id, to_start, to_end FROM cross_references")
+    graph = XrefGraph.from_ranges(rows, total)
+    graph.save(c)
+    return graph
+
+if __name__ == "__main__":
+    # python xref_graph.py [verse_id]  -- quick look at the graph in bible_app.db
+    conn = sqlite3.connect(DB_PATH)
+    start = time.perf_counter()
+    graph = XrefGraph.load(conn.cursor())
+    print(f"Loaded {graph.edge_count} edges in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    print("Most referenced verses:")
+    for verse_id, degree in graph.most_referenced(10):
+        print(f"  {KJV.label(verse_id)}: {degree}")
+
+    if len(sys.argv) > 1:
+        verse_id = int(sys.argv[1])
+        start = time.perf_counter()
+        related = graph.two_hop(verse_id)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"Related to {KJV.label(verse_id)} ({elapsed:.2f}ms):")
+        for other, paths in related:
+            print(f"  {KJV.label(other)} ({paths} paths)")
+    conn.close()